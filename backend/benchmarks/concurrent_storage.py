@@ -0,0 +1,124 @@
+"""
+Benchmark of concurrent reads through the blocking (pymongo inside
+"async def") and the non-blocking (Motor) storage access.
+
+The benchmark seeds a scratch collection with result-like documents and
+fires a burst of concurrent summary fetches and status polls, the request
+mix of the results page. For each mode it reports the throughput and the
+maximum event loop lag, i.e. how long other requests would have been
+blocked.
+
+Usage:
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/concurrent_storage.py
+"""
+import argparse
+import asyncio
+import os
+import time
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+
+DATABASE = "caturanga_benchmark"
+COLLECTION = "simulations_results"
+
+
+def seed(collection, documents, days):
+    collection.drop()
+    collection.insert_many([
+        {"name": f"result {i}",
+         "simulation_id": str(ObjectId()),
+         "simsettings_id": str(ObjectId()),
+         "status": "done",
+         "data": [{"Day": day, "Date": "2023-01-01", "Kobo sim": day}
+                  for day in range(days)]}
+        for i in range(documents)])
+    return [document["_id"] for document in collection.find({}, {"_id": 1})]
+
+
+async def blocking_requests(collection, ids, concurrency):
+    async def summary():
+        return list(collection.find({}, {"_id": 1, "name": 1, "status": 1}))
+
+    async def poll(object_id):
+        return collection.find_one({"_id": object_id}, {"status": 1})
+
+    await run_burst(summary, poll, ids, concurrency)
+
+
+async def motor_requests(collection, ids, concurrency):
+    async def summary():
+        cursor = collection.find({}, {"_id": 1, "name": 1, "status": 1})
+        return await cursor.to_list(None)
+
+    async def poll(object_id):
+        return await collection.find_one({"_id": object_id}, {"status": 1})
+
+    await run_burst(summary, poll, ids, concurrency)
+
+
+async def run_burst(summary, poll, ids, concurrency):
+    tasks = []
+    for i in range(concurrency):
+        if i % 10 == 0:
+            tasks.append(summary())
+        else:
+            tasks.append(poll(ids[i % len(ids)]))
+    await asyncio.gather(*tasks)
+
+
+async def measure(name, burst, concurrency):
+    lag = {"max": 0.0}
+    running = True
+
+    async def monitor_loop_lag():
+        while running:
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lag["max"] = max(lag["max"],
+                             time.perf_counter() - started - 0.001)
+
+    monitor = asyncio.ensure_future(monitor_loop_lag())
+    started = time.perf_counter()
+    await burst()
+    elapsed = time.perf_counter() - started
+    running = False
+    await monitor
+
+    print(f"{name:>10}: {concurrency / elapsed:10.1f} requests/s, "
+          f"max event loop lag {lag['max'] * 1000:8.1f} ms")
+
+
+async def main(arguments):
+    uri = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+    client = MongoClient(uri, maxPoolSize=arguments.pool_size)
+    ids = seed(client[DATABASE][COLLECTION],
+               arguments.documents, arguments.days)
+
+    motor_client = AsyncIOMotorClient(uri, maxPoolSize=arguments.pool_size)
+    motor_collection = motor_client[DATABASE][COLLECTION]
+    blocking_collection = client[DATABASE][COLLECTION]
+
+    for _ in range(arguments.rounds):
+        await measure("blocking",
+                      lambda: blocking_requests(blocking_collection, ids,
+                                                arguments.concurrency),
+                      arguments.concurrency)
+        await measure("motor",
+                      lambda: motor_requests(motor_collection, ids,
+                                             arguments.concurrency),
+                      arguments.concurrency)
+
+    client[DATABASE].drop_collection(COLLECTION)
+    client.close()
+    motor_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
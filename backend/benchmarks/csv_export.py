@@ -0,0 +1,162 @@
+"""
+Benchmark of the .csv exporters of CsvTransformer on large synthetic
+simulations, compared to the former row-by-row writers.
+
+The synthetic simulation has a conflict matrix of days x zones, one
+location per zone, routes between neighbouring zones and a few closures.
+For every file the benchmark checks that both writers produce the same
+bytes and reports the time of each.
+
+Usage:
+    python benchmarks/csv_export.py --days 1825 --zones 500
+"""
+import argparse
+import csv
+import random
+import sys
+import time
+from io import StringIO
+from pathlib import Path
+
+# add backend directory to PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from controller.handler.csv_transformer import CsvTransformer  # noqa: E402
+
+
+def synthetic_simulation(days, zones):
+    rng = random.Random(0)
+    names = [f"zone {zone}" for zone in range(zones)]
+    conflicts = []
+    for day in range(days):
+        row = {"Day": day}
+        row.update((name, rng.choice((0, 0, 0, 1))) for name in names)
+        conflicts.append(row)
+    locations = [{"name": name,
+                  "region": f"region {zone % 20}",
+                  "country": "Nigeria",
+                  "latitude": rng.uniform(4, 14),
+                  "longitude": rng.uniform(3, 15),
+                  "location_type": rng.choice(("conflict_zone", "camp",
+                                               "town")),
+                  "conflict_date": rng.randrange(days),
+                  "population": rng.randrange(1000, 10 ** 6)}
+                 for zone, name in enumerate(names)]
+    routes = [{"from": names[zone],
+               "to": names[(zone + step) % zones],
+               "distance": rng.uniform(0, 300),
+               "forced_redirection": rng.choice((None, 0.0, 1.0))}
+              for zone in range(zones) for step in (1, 7, 31)]
+    closures = [{"closure_type": "location",
+                 "name1": names[zone],
+                 "name2": names[(zone + 1) % zones],
+                 "closure_start": float(rng.randrange(days)),
+                 "closure_end": -1}
+                for zone in range(0, zones, 10)]
+    return {"conflicts": conflicts, "locations": locations,
+            "routes": routes, "closures": closures}
+
+
+def legacy_closures(csv_file, data):
+    writer = csv.writer(csv_file)
+    writer.writerow(['#closure_type', 'name1', 'name2', 'closure_start',
+                     'closure_end'])
+    for row in data:
+        writer.writerow([
+            int(value) if value and isinstance(value, (int, float))
+            else value
+            for value in row.values()])
+
+
+def legacy_conflicts(csv_file, data, fieldnames):
+    csv_buffer = StringIO()
+    writer = csv.DictWriter(csv_buffer, fieldnames=fieldnames)
+    writer.writeheader()
+    processed_rows = []
+    for row in data:
+        adjusted_row = {key: value if value != '' else None
+                        for key, value in row.items()}
+        processed_rows.append(adjusted_row)
+        writer.writerow(adjusted_row)
+    csv_file.write(csv_buffer.getvalue().strip())
+
+
+def legacy_locations(csv_file, data, fieldnames):
+    writer = csv.writer(csv_file, quoting=csv.QUOTE_NONNUMERIC)
+    writer.writerow(['#' + field if field == 'name' else field
+                     for field in fieldnames])
+    for row in data:
+        if any(value == '' for value in row.values()):
+            continue
+        writer.writerow(
+            [str(value) if value and not isinstance(value, (int, float))
+             else value for value in row.values()])
+
+
+def legacy_routes(csv_file, data):
+    writer = csv.writer(csv_file)
+    writer.writerow(['#name1', 'name2', 'distance', 'forced_redirection'])
+    for row in data:
+        writer.writerow([
+            int(value) if value and isinstance(value, (int, float))
+            and value != '0.0'
+            else value if not (value == 0.0 or value == '0.0')
+            else None
+            for value in row.values()])
+
+
+def measure(write, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        csv_buffer = StringIO(newline='')
+        started = time.perf_counter()
+        write(csv_buffer)
+        best = min(best, time.perf_counter() - started)
+    return best, csv_buffer.getvalue()
+
+
+def main(arguments):
+    simulation = synthetic_simulation(arguments.days, arguments.zones)
+    transformer = CsvTransformer(None)
+    fieldnames = simulation["conflicts"][0].keys()
+    location_fields = ["name", "region", "country", "latitude", "longitude",
+                       "location_type", "conflict_date", "population"]
+
+    files = [
+        ("closures.csv",
+         lambda file: legacy_closures(file, simulation["closures"]),
+         lambda file: transformer.write_closures_csv(
+             file, simulation["closures"])),
+        ("conflicts.csv",
+         lambda file: legacy_conflicts(file, simulation["conflicts"],
+                                       fieldnames),
+         lambda file: transformer.write_conflicts_csv(
+             file, simulation["conflicts"], fieldnames)),
+        ("locations.csv",
+         lambda file: legacy_locations(file, simulation["locations"],
+                                       location_fields),
+         lambda file: transformer.write_locations_csv(
+             file, simulation["locations"], location_fields)),
+        ("routes.csv",
+         lambda file: legacy_routes(file, simulation["routes"]),
+         lambda file: transformer.write_routes_csv(
+             file, simulation["routes"], None)),
+    ]
+
+    for file_name, legacy, columnar in files:
+        legacy_time, expected = measure(legacy, arguments.rounds)
+        columnar_time, content = measure(columnar, arguments.rounds)
+        if content != expected:
+            raise SystemExit(f"{file_name}: output differs")
+        print(f"{file_name:>14}: {len(content) / 2 ** 20:7.2f} MB, "
+              f"row by row {legacy_time * 1000:8.1f} ms, "
+              f"columnar {columnar_time * 1000:8.1f} ms "
+              f"({legacy_time / columnar_time:4.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=1825)
+    parser.add_argument("--zones", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,111 @@
+"""
+Benchmark of the response serialization of a large synthetic simulation
+result, compared to FastAPI's default path (jsonable_encoder and the json
+module, as in JSONResponse).
+
+The synthetic result has a row per day with the date and the population
+of every location, as returned by GET /simulation_results/{id}, and the
+same values as columns, as returned by the series endpoint. For every
+format the benchmark reports size and time; the JSON bodies are checked to
+decode to the same values as the default path.
+
+Usage:
+    python benchmarks/response_serialization.py --days 1825 --locations 50
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+# add backend directory to PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from controller import serialization  # noqa: E402
+from controller.handler import result_codec  # noqa: E402
+
+
+def synthetic_result(days, locations):
+    rng = random.Random(0)
+    start = date(2023, 1, 1)
+    names = [f"location {index}" for index in range(locations)]
+    rows = []
+    for day in range(days):
+        row = {"Day": day,
+               "Date": (start + timedelta(days=day)).isoformat()}
+        row.update((name, rng.uniform(0, 10 ** 5)) for name in names)
+        rows.append(row)
+    return {"_id": str(ObjectId()),
+            "name": "benchmark",
+            "status": "done",
+            "created_at": datetime(2024, 1, 1, 12),
+            "data": rows}
+
+
+def default_json(content):
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False,
+                      allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def measure(serialize, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        body = serialize()
+        best = min(best, time.perf_counter() - started)
+    return best, body
+
+
+def report(name, baseline_time, serialize_time, body):
+    print(f"{name:>24}: {len(body) / 2 ** 20:7.2f} MB, "
+          f"{serialize_time * 1000:8.1f} ms "
+          f"({baseline_time / serialize_time:5.1f}x)")
+
+
+def main(arguments):
+    document = synthetic_result(arguments.days, arguments.locations)
+    columns = result_codec.decode_columns(result_codec.encode_result(
+        document["data"]))
+
+    baseline_time, expected = measure(lambda: default_json(document),
+                                      arguments.rounds)
+    report("document, default JSON", baseline_time, baseline_time, expected)
+
+    for format_name in serialization.available_formats():
+        serialize_time, body = measure(
+            lambda: serialization.dumps(document, format_name),
+            arguments.rounds)
+        if format_name == "json" and json.loads(body) != json.loads(expected):
+            raise SystemExit("document: JSON differs")
+        report(f"document, {format_name}", baseline_time, serialize_time,
+               body)
+
+    series = {"length": arguments.days,
+              "days": list(range(arguments.days))}
+    baseline_time, expected = measure(
+        lambda: default_json(dict(
+            series, columns=result_codec.columns_to_lists(columns))),
+        arguments.rounds)
+    report("series, default JSON", baseline_time, baseline_time, expected)
+
+    for format_name in serialization.available_formats(tabular=True):
+        serialize_time, body = measure(
+            lambda: serialization.dumps_table(columns, format_name, series),
+            arguments.rounds)
+        if format_name == "json" and json.loads(body) != json.loads(expected):
+            raise SystemExit("series: JSON differs")
+        report(f"series, {format_name}", baseline_time, serialize_time,
+               body)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=1825)
+    parser.add_argument("--locations", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,96 @@
+"""
+Stores the conflict matrix of a simulation input as intervals per zone.
+
+conflicts.csv of FLEE has one row per day and one column per conflict zone.
+The matrix consists of few long runs of conflict days, such that the runs
+of every zone are stored instead of one document per day:
+
+    {"day_column": "Day",
+     "days": 731,
+     "zones": {"Maiduguri": [[0, 731]], "Bama": [[10, 40], [90, 95, 2]]}}
+
+An interval [start, stop] covers the days start <= day < stop with the
+value 1, an interval [start, stop, value] the days with another value
+(None for an empty field). All other days are 0. The dense matrix is only
+built when the input files of FLEE are materialized (see conflict_matrix).
+"""
+from itertools import groupby
+import numpy as np
+
+
+def is_intervals(conflicts):
+    """
+    Returns whether conflicts are stored as intervals, not as dense matrix
+    (a list with one dict per day).
+    """
+    return isinstance(conflicts, dict)
+
+
+def encode_conflicts(rows: list):
+    """
+    Encodes a dense conflict matrix as intervals.
+
+    Parameters:
+    - rows (list): One dict per day, the day column first.
+
+    Returns:
+    - dict: The intervals, None if the matrix can not be encoded without
+      loss, i.e. the rows have different columns, the day column does not
+      count the days from 0 or a value is no int (or None).
+    """
+    if not rows or not rows[0]:
+        return None
+    columns = list(rows[0])
+    day_column = columns[0]
+    for day, row in enumerate(rows):
+        if list(row) != columns or type(row[day_column]) is not int \
+                or row[day_column] != day:
+            return None
+
+    zones = {}
+    for zone in columns[1:]:
+        values = [row[zone] for row in rows]
+        if not set(map(type, values)) <= {int, type(None)}:
+            return None
+        zones[zone] = _intervals(values)
+
+    return {"day_column": day_column, "days": len(rows), "zones": zones}
+
+
+def conflict_matrix(conflicts: dict):
+    """
+    Expands intervals to the dense conflict matrix.
+
+    Parameters:
+    - conflicts (dict): The intervals (see encode_conflicts).
+
+    Returns:
+    - list: The column names, the day column first.
+    - numpy.ndarray: The values of every day, int64 unless some fields are
+      empty (then of dtype object with None for empty fields).
+    """
+    zones = conflicts["zones"]
+    empty = any(len(interval) > 2 and interval[2] is None
+                for intervals in zones.values() for interval in intervals)
+    matrix = np.zeros((conflicts["days"], len(zones) + 1),
+                      dtype=object if empty else np.int64)
+    matrix[:, 0] = np.arange(conflicts["days"]).tolist()
+    for column, intervals in enumerate(zones.values(), start=1):
+        for interval in intervals:
+            value = interval[2] if len(interval) > 2 else 1
+            matrix[interval[0]:interval[1], column] = value
+
+    return [conflicts["day_column"]] + list(zones), matrix
+
+
+def _intervals(values: list):
+    intervals = []
+    start = 0
+    for value, days in groupby(values):
+        stop = start + sum(1 for _ in days)
+        if value == 1:
+            intervals.append([start, stop])
+        elif value is None or value != 0:
+            intervals.append([start, stop, value])
+        start = stop
+    return intervals
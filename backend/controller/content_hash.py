@@ -0,0 +1,77 @@
+from datetime import date, datetime
+from bson import ObjectId
+import bson
+import hashlib
+import json
+
+# Top-level keys that identify or label a document but do not change its
+# content (parent_id: the resolved fields of an input overlay are hashed
+# instead). Nested keys of the same name, e.g. the name of a location, are
+# content and always hashed.
+VOLATILE_KEYS = ("_id", "name", "sweep_id", "parent_id")
+
+
+def canonical(value, ignore_keys=VOLATILE_KEYS):
+    """
+    Converts a document into a canonical form: dict keys sorted, volatile
+    top-level keys removed and BSON/datetime values converted to strings,
+    such that equal content always serializes to the same JSON.
+
+    Parameters:
+    - value: The document or value.
+    - ignore_keys (tuple): Top-level keys to leave out.
+
+    Returns:
+    - The canonical value.
+    """
+    if isinstance(value, dict):
+        return {str(key): canonical(value[key], ())
+                for key in sorted(value, key=str)
+                if key not in ignore_keys}
+    if isinstance(value, (list, tuple)):
+        return [canonical(item, ()) for item in value]
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    return value
+
+
+def content_hash(*documents, ignore_keys=VOLATILE_KEYS):
+    """
+    Returns the SHA-256 hash of the canonical content of the documents.
+
+    Parameters:
+    - documents: The documents to hash together.
+    - ignore_keys (tuple): Top-level keys that do not contribute to the
+      hash.
+
+    Returns:
+    - str: The hex digest.
+    """
+    serialized = json.dumps([canonical(document, ignore_keys)
+                             for document in documents],
+                            separators=(",", ":"),
+                            ensure_ascii=False,
+                            allow_nan=True)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+def entity_tag(*values):
+    """
+    Returns a short hash of values that can be stored in MongoDB (e.g. a
+    stored document and the requested fields), which changes with any
+    change of the values. Unlike content_hash, the hash is not canonical
+    (key order and volatile keys count), but it is computed from the BSON
+    encoding, which is much faster than the canonical JSON.
+
+    Parameters:
+    - values: The values to hash together.
+
+    Returns:
+    - str: The first 32 hex digits of the SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    for value in values:
+        digest.update(bson.encode({"value": value}))
+    return digest.hexdigest()[:32]
@@ -0,0 +1,135 @@
+import numpy as np
+
+METHODS = ("lttb", "minmax")
+
+
+def downsample(days, columns: dict, points: int, method: str = "lttb"):
+    """
+    Reduces the time series of several columns to about the given number
+    of points while keeping their shape and peaks. All columns are
+    processed together as one (days x columns) matrix.
+
+    Parameters:
+    - days (sequence): The day of every value.
+    - columns (dict): Column names mapped to their numeric values.
+    - points (int): The target number of points per column.
+    - method (str): "lttb" (Largest-Triangle-Three-Buckets) or "minmax"
+      (minimum and maximum of every bucket).
+
+    Returns:
+    - dict: Column names mapped to {"days": [...], "values": [...]}.
+
+    Raises:
+    - ValueError: If the method is unknown or a column is not numeric.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    if not columns:
+        return {}
+
+    names = list(columns.keys())
+    x = np.asarray(days, dtype=np.float64)
+    try:
+        y = np.column_stack([np.asarray(columns[name], dtype=np.float64)
+                             for name in names])
+    except (TypeError, ValueError):
+        raise ValueError("Only numeric columns can be downsampled.")
+
+    if method == "lttb":
+        indices = lttb_indices(x, y, points)
+    else:
+        indices = minmax_indices(y, points)
+
+    days = np.asarray(days)
+    result = {}
+    for column, name in enumerate(names):
+        selected = indices[column]
+        result[name] = {"days": days[selected].tolist(),
+                        "values": np.asarray(columns[name])[selected].tolist()}
+    return result
+
+
+def lttb_indices(x, y, points: int):
+    """
+    Selects points with the Largest-Triangle-Three-Buckets algorithm
+    (Steinarsson, 2013). The first and last point are always kept, every
+    bucket in between contributes the point spanning the largest triangle
+    with the previously selected point and the average of the next bucket.
+
+    Parameters:
+    - x (numpy.ndarray): The x values, shape (n,).
+    - y (numpy.ndarray): The y values of all columns, shape (n, k).
+    - points (int): The number of points to select (at least 3).
+
+    Returns:
+    - list: The selected row indices of every column.
+    """
+    n, k = y.shape
+    if points >= n or points < 3:
+        return [np.arange(n)] * k
+
+    selected = np.empty((points, k), dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    every = (n - 2) / (points - 2)
+    columns = np.arange(k)
+    previous = np.zeros(k, dtype=np.int64)
+
+    for bucket in range(points - 2):
+        start = int(bucket * every) + 1
+        end = int((bucket + 1) * every) + 1
+
+        # average of the next bucket (the last point for the last bucket)
+        next_start = end
+        next_end = min(int((bucket + 2) * every) + 1, n)
+        if next_start >= next_end:
+            next_start, next_end = n - 1, n
+        average_x = x[next_start:next_end].mean()
+        average_y = y[next_start:next_end].mean(axis=0)
+
+        previous_x = x[previous]
+        previous_y = y[previous, columns]
+        area = np.abs(
+            (previous_x - average_x) * (y[start:end] - previous_y)
+            - (previous_x - x[start:end, None]) * (average_y - previous_y))
+        previous = start + np.argmax(np.nan_to_num(area), axis=0)
+        selected[bucket + 1] = previous
+
+    return [selected[:, column] for column in range(k)]
+
+
+def minmax_indices(y, points: int):
+    """
+    Selects the minimum and maximum of every bucket, plus the first and
+    last point, such that no peak gets lost.
+
+    Parameters:
+    - y (numpy.ndarray): The y values of all columns, shape (n, k).
+    - points (int): The target number of points.
+
+    Returns:
+    - list: The selected row indices of every column, in time order.
+    """
+    n, k = y.shape
+    buckets = max((points - 2) // 2, 1)
+    if points >= n:
+        return [np.arange(n)] * k
+
+    size = -(-n // buckets)
+    padded = np.full((buckets * size, k), np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size, k)
+
+    # all-NaN buckets (padding, missing values) fall back to their start
+    valid = ~np.all(np.isnan(padded), axis=1)
+    filled_min = np.where(np.isnan(padded), np.inf, padded)
+    filled_max = np.where(np.isnan(padded), -np.inf, padded)
+    offsets = (np.arange(buckets) * size)[:, None]
+    minima = np.where(valid, offsets + np.argmin(filled_min, axis=1), 0)
+    maxima = np.where(valid, offsets + np.argmax(filled_max, axis=1), 0)
+
+    indices = np.concatenate([np.zeros((1, k), dtype=np.int64),
+                              minima, maxima,
+                              np.full((1, k), n - 1, dtype=np.int64)])
+    return [np.unique(np.clip(indices[:, column], 0, n - 1))
+            for column in range(k)]
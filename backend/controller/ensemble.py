@@ -0,0 +1,334 @@
+from controller.handler import result_codec
+import io
+import json
+import numpy as np
+
+# the percentiles reported for every location and day
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+# columns that label the days and are taken from the first replicate
+LABEL_COLUMNS = ("Day", "Date")
+
+# the number of replicates with exact quantiles, estimated beyond
+EXACT_REPLICATES = 16
+
+
+class P2Quantile:
+    """
+    Estimates a quantile of many streams at once with the P² algorithm
+    (Jain and Chlamtac, 1985). Every stream, e.g. the refugees of one
+    camp on one day, keeps five markers whatever the number of
+    observations, so replicates are folded in without storing them.
+    """
+
+    def __init__(self, p: float, heights: np.ndarray, positions: np.ndarray,
+                 count: int):
+        """
+        Parameters:
+        - p (float): The quantile, between 0 and 1.
+        - heights (numpy.ndarray): The marker heights, 5 x streams.
+        - positions (numpy.ndarray): The (1-based) ranks of the markers.
+        - count (int): The number of observations per stream.
+        """
+        self.p = p
+        self.heights = heights
+        self.positions = positions
+        self.count = count
+        self._increments = np.array([0, p / 2, p, (1 + p) / 2, 1])
+
+    @classmethod
+    def from_sample(cls, p: float, sample: np.ndarray):
+        """
+        Starts the estimation from the first observations: the markers are
+        placed on the order statistics closest to their desired ranks.
+
+        Parameters:
+        - p (float): The quantile, between 0 and 1.
+        - sample (numpy.ndarray): At least 5 observations per stream,
+          sorted along the first axis.
+        """
+        count = len(sample)
+        desired = 1 + (count - 1) * np.array([0, p / 2, p, (1 + p) / 2, 1])
+        # the ranks must stay strictly increasing
+        ranks = [1]
+        for i in (1, 2, 3):
+            ranks.append(int(min(max(round(desired[i]), ranks[-1] + 1),
+                                 count - 4 + i)))
+        ranks.append(count)
+        heights = sample[[rank - 1 for rank in ranks]].astype(np.float64)
+        positions = np.tile(np.array(ranks, dtype=np.float64)[:, None],
+                            (1, sample.shape[1]))
+        return cls(p, heights, positions, count)
+
+    def add(self, values: np.ndarray):
+        """
+        Adds one observation to every stream.
+
+        Parameters:
+        - values (numpy.ndarray): The observations, one per stream.
+        """
+        q, n = self.heights, self.positions
+        np.minimum(q[0], values, out=q[0])
+        np.maximum(q[4], values, out=q[4])
+        # the cell k with q[k] <= x < q[k + 1], 0 to 3
+        cell = (values >= q[1]).astype(int) + (values >= q[2]) + \
+            (values >= q[3])
+        n[1:] += np.arange(1, 5)[:, None] > cell
+        self.count += 1
+        desired = 1 + (self.count - 1) * self._increments
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for i in (1, 2, 3):
+                offset = desired[i] - n[i]
+                up = (offset >= 1) & (n[i + 1] - n[i] > 1)
+                down = (offset <= -1) & (n[i - 1] - n[i] < -1)
+                move = up | down
+                if not move.any():
+                    continue
+                d = np.where(up, 1.0, -1.0)
+                parabolic = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i])
+                    / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1])
+                    / (n[i] - n[i - 1]))
+                neighbour = np.where(up, q[i + 1], q[i - 1])
+                linear = q[i] + d * (neighbour - q[i]) / \
+                    (np.where(up, n[i + 1], n[i - 1]) - n[i])
+                inside = (q[i - 1] < parabolic) & (parabolic < q[i + 1])
+                q[i] = np.where(move,
+                                np.where(inside, parabolic, linear),
+                                q[i])
+                n[i] += np.where(move, d, 0.0)
+
+    def estimate(self):
+        """
+        Returns the estimated quantile of every stream. The middle marker
+        may lag behind its desired rank while there are few observations,
+        therefore the markers are interpolated linearly at that rank.
+        """
+        q, n = self.heights, self.positions
+        rank = 1 + (self.count - 1) * self.p
+        # the segment [n[k], n[k + 1]] containing the rank, 0 to 3
+        k = np.minimum((n[1:4] <= rank).sum(axis=0), 3)
+        streams = np.arange(q.shape[1])
+        lower, upper = n[k, streams], n[k + 1, streams]
+        weight = (rank - lower) / (upper - lower)
+        return q[k, streams] + weight * (q[k + 1, streams] - q[k, streams])
+
+
+class EnsembleAccumulator:
+    """
+    Aggregates the replicates of a scenario into per-day statistics of
+    every location: mean and standard deviation (Welford's online
+    algorithm) and the QUANTILES. Replicates are added one at a time.
+
+    The first EXACT_REPLICATES replicates are kept and their quantiles are
+    exact. Afterwards they seed one P2Quantile per quantile and are
+    dropped, from then on memory and state size do not depend on the
+    number of replicates.
+
+    The state is serialized with to_bytes, such that replicates finishing
+    in different processes are folded into the same ensemble.
+    """
+
+    def __init__(self,
+                 quantiles: tuple = QUANTILES,
+                 exact_replicates: int = EXACT_REPLICATES):
+        """
+        Parameters:
+        - quantiles (tuple): The quantiles to estimate, between 0 and 1.
+        - exact_replicates (int): The number of replicates kept for exact
+          quantiles, at least 5.
+        """
+        if exact_replicates < 5:
+            raise ValueError("exact_replicates must be at least 5.")
+        self.quantiles = tuple(quantiles)
+        self.exact_replicates = exact_replicates
+        self.count = 0
+        self.names = None
+        self.labels = {}
+        self.mean = None
+        self.m2 = None
+        # the first replicates (replicates x cells) until the sketches
+        # take over
+        self.sample = None
+        self.sketches = []
+
+    def add(self, columns: dict):
+        """
+        Folds a replicate into the statistics.
+
+        Parameters:
+        - columns (dict): The columns of the replicate, numeric columns as
+          numpy arrays or lists of numbers (see columns_from_rows and
+          result_codec.decode_columns).
+
+        Raises:
+        - ValueError: If the replicate has other columns or another number
+          of days than the first one.
+        """
+        names = [name for name, values in columns.items()
+                 if name not in LABEL_COLUMNS and is_numeric(values)]
+        if self.names is None:
+            self._setup(columns, names)
+        elif names != self.names or \
+                any(len(columns[name]) != self.length for name in names):
+            raise ValueError("The replicate does not match the ensemble.")
+
+        values = np.stack([np.asarray(columns[name], dtype=np.float64)
+                           for name in names], axis=1) \
+            if names else np.zeros((self.length, 0))
+        self.count += 1
+        delta = values - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (values - self.mean)
+
+        flat = values.ravel()
+        if self.sketches:
+            for sketch in self.sketches:
+                sketch.add(flat)
+        elif self.count <= self.exact_replicates:
+            self.sample = flat[None] if self.sample is None \
+                else np.vstack([self.sample, flat[None]])
+        else:
+            sample = np.sort(np.vstack([self.sample, flat[None]]), axis=0)
+            self.sketches = [P2Quantile.from_sample(p, sample)
+                             for p in self.quantiles]
+            self.sample = None
+
+    def statistics(self):
+        """
+        Returns the statistics as columns: the label columns of the first
+        replicate, followed by "<column> mean", "<column> std" (sample
+        standard deviation, 0 for a single replicate) and one column per
+        quantile, e.g. "<column> p5", for every column of the replicates.
+
+        Returns:
+        - dict: The column names mapped to their values, None if no
+          replicate has been added.
+        """
+        if self.count == 0:
+            return None
+        std = np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 \
+            else np.zeros_like(self.m2)
+        if self.sketches:
+            estimates = [sketch.estimate() for sketch in self.sketches]
+        else:
+            estimates = list(np.quantile(self.sample, self.quantiles,
+                                         axis=0))
+        estimates = [estimate.reshape(self.mean.shape)
+                     for estimate in estimates]
+
+        columns = dict(self.labels)
+        for index, name in enumerate(self.names):
+            columns[f"{name} mean"] = self.mean[:, index].copy()
+            columns[f"{name} std"] = std[:, index]
+            for p, estimate in zip(self.quantiles, estimates):
+                columns[f"{name} {quantile_label(p)}"] = estimate[:, index]
+        return columns
+
+    @property
+    def length(self):
+        return 0 if self.mean is None else self.mean.shape[0]
+
+    def to_bytes(self):
+        """
+        Serializes the state as a compressed numpy archive.
+        """
+        meta = {"quantiles": self.quantiles,
+                "exact_replicates": self.exact_replicates,
+                "count": self.count,
+                "names": self.names,
+                "labels": self.labels}
+        arrays = {"meta": np.frombuffer(json.dumps(meta).encode("utf-8"),
+                                        dtype=np.uint8)}
+        if self.mean is not None:
+            arrays.update(mean=self.mean, m2=self.m2)
+        if self.sample is not None:
+            arrays["sample"] = self.sample
+        for index, sketch in enumerate(self.sketches):
+            arrays[f"heights{index}"] = sketch.heights
+            arrays[f"positions{index}"] = sketch.positions
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        """
+        Restores an accumulator serialized with to_bytes.
+        """
+        with np.load(io.BytesIO(data)) as archive:
+            meta = json.loads(archive["meta"].tobytes().decode("utf-8"))
+            accumulator = cls(meta["quantiles"], meta["exact_replicates"])
+            accumulator.count = meta["count"]
+            accumulator.names = meta["names"]
+            accumulator.labels = meta["labels"]
+            if "mean" in archive:
+                accumulator.mean = archive["mean"]
+                accumulator.m2 = archive["m2"]
+            if "sample" in archive:
+                accumulator.sample = archive["sample"]
+            if "heights0" in archive:
+                accumulator.sketches = [
+                    P2Quantile(p,
+                               archive[f"heights{index}"],
+                               archive[f"positions{index}"],
+                               accumulator.count)
+                    for index, p in enumerate(accumulator.quantiles)]
+        return accumulator
+
+    def _setup(self, columns: dict, names: list):
+        self.names = names
+        length = len(next(iter(columns.values()))) if columns else 0
+        self.labels = {name: list(columns[name].tolist()
+                                  if isinstance(columns[name], np.ndarray)
+                                  else columns[name])
+                       for name in LABEL_COLUMNS if name in columns}
+        self.mean = np.zeros((length, len(names)))
+        self.m2 = np.zeros((length, len(names)))
+
+
+def quantile_label(p: float):
+    """
+    Returns the column suffix of a quantile, e.g. 0.05 -> "p5".
+    """
+    return f"p{round(p * 100, 6):g}"
+
+
+def is_numeric(values):
+    """
+    Returns whether a column holds numbers only: a numpy array, or a list
+    of ints and floats, which result_codec stores as JSON.
+    """
+    if isinstance(values, np.ndarray):
+        return True
+    return all(type(value) in (int, float) for value in values)
+
+
+def columns_from_rows(rows: list):
+    """
+    Converts the per-day rows of a FLEE result into columns, numeric
+    columns as numpy arrays and all others as lists, like
+    result_codec.decode_columns.
+
+    Parameters:
+    - rows (list): The rows, dicts with the same keys.
+
+    Returns:
+    - dict: The column names mapped to their values.
+    """
+    names = list(rows[0].keys()) if rows else []
+    columns = {}
+    for name in names:
+        values = [row.get(name) for row in rows]
+        dtype = result_codec.column_dtype(values)
+        if dtype in result_codec.NUMPY_DTYPES:
+            columns[name] = np.asarray(values,
+                                       dtype=result_codec.NUMPY_DTYPES[dtype])
+        elif is_numeric(values):
+            # ints and floats, folded as floats anyway
+            columns[name] = np.asarray(values, dtype=np.float64)
+        else:
+            columns[name] = values
+    return columns
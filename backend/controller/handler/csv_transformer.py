@@ -1,7 +1,11 @@
 import csv
 from datetime import datetime
 from io import StringIO
+from itertools import chain
+from operator import itemgetter
 import os
+import numpy as np
+from controller.conflict_intervals import conflict_matrix, is_intervals
 
 
 class CsvTransformer:
@@ -32,39 +36,67 @@ class CsvTransformer:
             simulation_dir = self.backend_root_dir / "flee_stored_files" / "conflict_input" / simulation["_id"]
             os.makedirs(simulation_dir, exist_ok=True)
 
-            # Cretae csv files using helper function export-csv (filename, data, fieldnames):
-            # Closures.csv file:
-            self.export_closures_csv(os.path.join(simulation_dir, "closures.csv"),
-                                                    simulation["closures"])
-
-            # conflicts.csv file:
-            self.export_conflicts_csv(os.path.join(simulation_dir, "conflicts.csv"),
-                                                        simulation["conflicts"],
-                                                        simulation["conflicts"][
-                                                            0].keys())
-
-            # locations.csv file:
-            self.export_locations_csv(os.path.join(simulation_dir, "locations.csv"),
-                                                        simulation["locations"],
-                                                        ["name", "region", "country", "latitude", "longitude",
-                                                        "location_type",
-                                                        "conflict_date",
-                                                        "population"])
-
-            # routes.csv file:
-            self.export_routes_csv(os.path.join(simulation_dir, "routes.csv"),
-                                                    simulation["routes"],
-                                                    ["from", "to", "distance",
-                                                    "forced_redirection"])
-
-            # sim_period.csv file (values are single data points, not directories themselves -> unnested function):
-            self.export_sim_period_csv(os.path.join(simulation_dir, "sim_period.csv"),
-                                                        simulation["sim_period"])
+            # Create csv files using the writer of every file:
+            for file_name, write in self.simulation_csv_writers(simulation):
+                with open(os.path.join(simulation_dir, file_name), mode='w',
+                          newline='', encoding='utf-8') as csv_file:
+                    write(csv_file)
 
             return "All files written with csvTransformer"
         except Exception as e:
             raise e
 
+    def render_simulation_csv(self, simulation):
+        """
+        Renders the .csv files of a simulation in memory instead of writing
+        them to the filesystem, with the same content as
+        convert_simulation_to_csv.
+
+        :param simulation: The simulation document
+        :return: The file names (e.g. "locations.csv") mapped to their content
+        """
+        files = {}
+        for file_name, write in self.simulation_csv_writers(simulation):
+            csv_buffer = StringIO(newline='')
+            write(csv_buffer)
+            files[file_name] = csv_buffer.getvalue()
+        return files
+
+    def simulation_csv_writers(self, simulation):
+        """
+        Returns the .csv files required by FLEE (closures, conflicts, locations,
+        routes, sim_period) together with the function writing each of them.
+
+        :param simulation: The simulation document
+        :return: A list of (file name, function taking the open file) pairs
+        """
+        # fieldnames are determined right away, such that missing data raises
+        # (conflicts stored as intervals are only expanded while writing conflicts.csv)
+        conflicts = simulation["conflicts"]
+        conflict_fieldnames = None if is_intervals(conflicts) else conflicts[0].keys()
+
+        return [
+            ("closures.csv",
+             lambda csv_file: self.write_closures_csv(csv_file, simulation["closures"])),
+            ("conflicts.csv",
+             lambda csv_file: self.write_conflict_intervals_csv(csv_file, conflicts)
+             if conflict_fieldnames is None
+             else self.write_conflicts_csv(csv_file, conflicts, conflict_fieldnames)),
+            ("locations.csv",
+             lambda csv_file: self.write_locations_csv(csv_file, simulation["locations"],
+                                                       ["name", "region", "country", "latitude", "longitude",
+                                                        "location_type",
+                                                        "conflict_date",
+                                                        "population"])),
+            ("routes.csv",
+             lambda csv_file: self.write_routes_csv(csv_file, simulation["routes"],
+                                                    ["from", "to", "distance",
+                                                     "forced_redirection"])),
+            # values are single data points, not directories themselves -> unnested function
+            ("sim_period.csv",
+             lambda csv_file: self.write_sim_period_csv(csv_file, simulation["sim_period"])),
+        ]
+
     # Helper Function to create closures.csv file from filename, data and fieldnames:
     def export_closures_csv(self, file_name, data):
 
@@ -76,20 +108,31 @@ class CsvTransformer:
 
         try:
             with open(file_name, mode='w', newline='') as csv_file:
-                fieldnames = ['#closure_type', 'name1', 'name2', 'closure_start', 'closure_end']
-                writer = csv.writer(csv_file)
+                return self.write_closures_csv(csv_file, data)
 
-                # Write header:
-                writer.writerow(fieldnames)
+        except Exception as e:
+            return e
 
-                # Write data & Skip rows with empty keys
-                for row in data:
-                    writer.writerow([
-                        int(value) if value and isinstance(value, (int, float)) else value
-                        for value in row.values()
-                    ])
+    # Helper Function to write the closures.csv content to an open file:
+    def write_closures_csv(self, csv_file, data):
 
-                return "File created succesfully"
+        """
+        :param csv_file: File (or in-memory buffer) opened with newline=''
+        :param data: Row data
+        :return: Returns nothing, only writes the rows
+        """
+
+        try:
+            fieldnames = ['#closure_type', 'name1', 'name2', 'closure_start', 'closure_end']
+            writer = csv.writer(csv_file)
+
+            # Write header:
+            writer.writerow(fieldnames)
+
+            # Write data column by column, numbers truncated to int:
+            writer.writerows(_convert_columns(map(dict.values, data), _closure_column))
+
+            return "File created succesfully"
 
         except Exception as e:
             return e
@@ -104,24 +147,79 @@ class CsvTransformer:
         :return: Returns a message indicating success or an error message
         """
 
+        try:
+            with open(file_name, 'w', newline='') as file:
+                return self.write_conflicts_csv(file, data, fieldnames)
+
+        except Exception as e:
+            return str(e)
+
+    # Helper function to write the conflicts.csv content to an open file
+    def write_conflicts_csv(self, file, data, fieldnames):
+        """
+        :param file: File (or in-memory buffer) opened with newline=''
+        :param data: Row data
+        :param fieldnames: Name of columns in .csv files
+        :return: Returns a message indicating success or an error message
+        """
+
         try:
             # Use an in-memory buffer for writing
             csv_buffer = StringIO()
-            writer = csv.DictWriter(csv_buffer, fieldnames=fieldnames)
+
+            keys = set(fieldnames)
+            if all(row.keys() == keys for row in data):
+                # Every row has exactly the columns of the header: the values are picked in header
+                # order and written at once, empty strings and None are both written as empty fields
+                writer = csv.writer(csv_buffer)
+                writer.writerow(fieldnames)
+                values = itemgetter(*fieldnames) if len(fieldnames) > 1 else lambda row: [row[key] for key in fieldnames]
+                rows = list(map(values, data))
+                lines = _integer_lines(rows)
+                if lines is not None:
+                    csv_buffer.write(lines)
+                else:
+                    writer.writerows(rows)
+            else:
+                # Rows with missing or additional columns are handled (and rejected) by the DictWriter
+                writer = csv.DictWriter(csv_buffer, fieldnames=fieldnames)
+                writer.writeheader()
+                for row in data:
+                    writer.writerow({key: value if value != '' else None for key, value in row.items()})
+
+            # Write the processed data back to the file without trailing commas
+            file.write(csv_buffer.getvalue().strip())
+
+            return "File created and trailing commas removed successfully"
+
+        except Exception as e:
+            return str(e)
+
+    # Helper function to write the conflicts.csv content of conflicts stored as intervals to an open file
+    def write_conflict_intervals_csv(self, file, conflicts):
+        """
+        Writes the same content as write_conflicts_csv for the dense matrix of the intervals.
+        :param file: File (or in-memory buffer) opened with newline=''
+        :param conflicts: Conflict intervals (see conflict_intervals)
+        :return: Returns a message indicating success or an error message
+        """
+
+        try:
+            fieldnames, matrix = conflict_matrix(conflicts)
+            csv_buffer = StringIO()
+            writer = csv.writer(csv_buffer)
 
             # Write header:
-            writer.writeheader()
+            writer.writerow(fieldnames)
 
-            # Adjust data & Skip rows with empty keys and remove trailing commas
-            processed_rows = []
-            for row in data:
-                adjusted_row = {key: value if value != '' else None for key, value in row.items()}
-                processed_rows.append(adjusted_row)
-                writer.writerow(adjusted_row)
+            # Write the matrix with numpy unless fields are empty
+            if matrix.dtype == np.int64:
+                csv_buffer.write(_integer_matrix_lines(matrix))
+            else:
+                writer.writerows(matrix.tolist())
 
-            # Write the processed data back to the file without trailing commas
-            with open(file_name, 'w', newline='') as file:
-                file.write(csv_buffer.getvalue().strip())
+            # Write the data to the file without trailing line break
+            file.write(csv_buffer.getvalue().strip())
 
             return "File created and trailing commas removed successfully"
 
@@ -140,20 +238,32 @@ class CsvTransformer:
 
         try:
             with open(file_name, mode='w', newline='', encoding='utf-8') as csv_file:
-                writer = csv.writer(csv_file, quoting=csv.QUOTE_NONNUMERIC)
+                return self.write_locations_csv(csv_file, data, fieldnames)
 
-                # Write header:
-                writer.writerow(['#' + field if field == 'name' else field for field in fieldnames])
+        except Exception as e:
+            return e
 
-                # Write data & Skip rows with empty keys
-                for row in data:
-                    if any(value == '' for value in row.values()):
-                        continue
-                    writer.writerow(
-                        [str(value) if value and not isinstance(value, (int, float)) else value for value in
-                         row.values()])
+    # Helper Function to write the locations.csv content to an open file:
+    def write_locations_csv(self, csv_file, data, fieldnames):
 
-                return "File created successfully"
+        """
+        :param csv_file: File (or in-memory buffer) opened with newline=''
+        :param data: Row data
+        :param fieldnames: Name of columns in .csv files
+        :return: Returns nothing, only writes the rows
+        """
+
+        try:
+            writer = csv.writer(csv_file, quoting=csv.QUOTE_NONNUMERIC)
+
+            # Write header:
+            writer.writerow(['#' + field if field == 'name' else field for field in fieldnames])
+
+            # Write data column by column & Skip rows with empty keys
+            rows = [values for values in map(dict.values, data) if '' not in values]
+            writer.writerows(_convert_columns(rows, _location_column))
+
+            return "File created successfully"
 
         except Exception as e:
             return e
@@ -194,20 +304,30 @@ class CsvTransformer:
 
         try:
             with open(file_name, mode='w', newline='') as csv_file:
-                fieldnames = ['#name1', 'name2', 'distance', 'forced_redirection']
-                writer = csv.writer(csv_file)
+                return self.write_routes_csv(csv_file, data, fieldnames)
 
-                # Write header:
-                writer.writerow(fieldnames)
+        except Exception as e:
+            return e
 
-                # Write data & Skip rows with empty keys
-                for row in data:
-                    writer.writerow([
-                        int(value) if value and isinstance(value, (int, float)) and value != '0.0'
-                        else value if not (value == 0.0 or value == '0.0')
-                        else None
-                        for value in row.values()
-                    ])
+    # Helper Function to write the routes.csv content to an open file:
+    def write_routes_csv(self, csv_file, data, fieldnames):
+
+        """
+        :param csv_file: File (or in-memory buffer) opened with newline=''
+        :param data: Row data
+        :param fieldnames: Name of columns in .csv files
+        :return: Returns nothing, only writes the rows
+        """
+
+        try:
+            fieldnames = ['#name1', 'name2', 'distance', 'forced_redirection']
+            writer = csv.writer(csv_file)
+
+            # Write header:
+            writer.writerow(fieldnames)
+
+            # Write data column by column, numbers truncated to int and zeros left empty:
+            writer.writerows(_convert_columns(map(dict.values, data), _route_column))
 
         except Exception as e:
             return e
@@ -221,26 +341,39 @@ class CsvTransformer:
         :return: Returns nothing, only creates and stores files
         """
 
-        print(data)
-
         try:
             with open(file_name, mode='w', newline='') as csv_file:
-                writer = csv.writer(csv_file)
+                return self.write_sim_period_csv(csv_file, data)
+
+        except Exception as e:
+            return str(e)
+
+    # Helper function to write the sim_period.csv content to an open file
+    def write_sim_period_csv(self, csv_file, data):
 
-                # Write data:
-                for key, value in data.items():
-                    if key == "date":
-                        if isinstance(value, datetime):
-                            formatted_date = value.strftime('%Y-%m-%d')
-                            writer.writerow(["StartDate", formatted_date])
-                        elif isinstance(value, str):
-                            writer.writerow(["StartDate", value[:10]])
-                        else:
-                            writer.writerow(["StartDate", value])
+        """
+        :param csv_file: File (or in-memory buffer) opened with newline=''
+        :param data: Row data
+        :return: Returns nothing, only writes the rows
+        """
+
+        try:
+            writer = csv.writer(csv_file)
+
+            # Write data:
+            for key, value in data.items():
+                if key == "date":
+                    if isinstance(value, datetime):
+                        formatted_date = value.strftime('%Y-%m-%d')
+                        writer.writerow(["StartDate", formatted_date])
+                    elif isinstance(value, str):
+                        writer.writerow(["StartDate", value[:10]])
                     else:
-                        writer.writerow([key, value])
+                        writer.writerow(["StartDate", value])
+                else:
+                    writer.writerow([key, value])
 
-                return "File created successfully"
+            return "File created successfully"
 
         except Exception as e:
             return str(e)
@@ -250,3 +383,142 @@ class CsvTransformer:
 class SimulationNotFoundError(Exception):
     pass
 
+
+# Helper function converting the row values of a .csv file column by column
+def _convert_columns(rows, convert_column):
+
+    """
+    :param rows: Values of every row (e.g. row.values() of the row data)
+    :param convert_column: Function returning the values of a column as written to the .csv file
+    :return: The converted rows, to be written with writerows
+    """
+
+    rows = [tuple(values) for values in rows]
+    lengths = set(map(len, rows))
+    if len(lengths) == 1 and 0 not in lengths:
+        return zip(*map(convert_column, zip(*rows)))
+
+    # Rows of different lengths can not be split into columns, their values are converted one by one
+    return [[convert_column((value,))[0] for value in row] for row in rows]
+
+
+# Helper function formatting a matrix of ints (e.g. the conflict matrix) with numpy
+def _integer_lines(rows):
+
+    """
+    :param rows: Values of every row
+    :return: The lines csv.writer writes for the rows, or None if the values are not all of type int
+    """
+
+    if not rows or set(map(type, chain.from_iterable(rows))) != {int}:
+        return None
+    row_count, column_count = len(rows), len(rows[0])
+    try:
+        matrix = np.fromiter(chain.from_iterable(rows), dtype=np.int64,
+                             count=row_count * column_count).reshape(row_count, column_count)
+    except (OverflowError, ValueError):
+        # ints out of the int64 range or rows of different lengths
+        return None
+
+    return _integer_matrix_lines(matrix)
+
+
+# Helper function formatting the rows of an int64 matrix like csv.writer
+def _integer_matrix_lines(matrix):
+
+    """
+    :param matrix: 2d int64 array
+    :return: The lines csv.writer writes for the rows of the matrix
+    """
+
+    row_count, column_count = matrix.shape
+    # Columns of single digits (conflict flags) are written as characters of a byte matrix, runs of them
+    # become one segment of the line, every other column is a segment of its own
+    single_digits = ((matrix >= 0) & (matrix <= 9)).all(axis=0)
+    segments = []
+    column = 0
+    while column < column_count:
+        if not single_digits[column]:
+            segments.append(list(map(str, matrix[:, column].tolist())))
+            column += 1
+            continue
+
+        stop = column
+        while stop < column_count and single_digits[stop]:
+            stop += 1
+        characters = np.full((row_count, 2 * (stop - column) - 1), ord(','), dtype=np.uint8)
+        characters[:, 0::2] = matrix[:, column:stop] + ord('0')
+        text = characters.tobytes().decode('ascii')
+        width = characters.shape[1]
+        segments.append([text[start:start + width] for start in range(0, len(text), width)])
+        column = stop
+
+    return "".join(",".join(segment) + "\r\n" for segment in zip(*segments))
+
+
+# Helper function truncating a column of floats to int with numpy
+def _truncate_floats(column):
+
+    """
+    :param column: Values of a column
+    :return: int(value) of every float with None kept, and the indices of the values equal to 0 - or None if
+             the column contains other values than floats and None, or floats int() would reject
+    """
+
+    if not set(map(type, column)) <= {float, type(None)}:
+        return None
+
+    values = np.asarray(column, dtype=float)
+    missing = np.isnan(values)
+    # NaN that are not None, infinity and floats out of the int64 range are left to int()
+    if missing.sum() != column.count(None) or not (np.abs(values[~missing]) < 2 ** 63).all():
+        return None
+
+    integers = np.trunc(np.where(missing, 0, values)).astype(np.int64).tolist()
+    for index in np.flatnonzero(missing):
+        integers[index] = None
+    return integers, np.flatnonzero(values == 0)
+
+
+# Column conversion of closures.csv: numbers are truncated to int, except for 0
+def _closure_column(column):
+    if set(map(type, column)) <= {str, int, type(None)}:
+        return column
+
+    truncated = _truncate_floats(column)
+    if truncated is not None:
+        integers, zeros = truncated
+        for index in zeros:
+            integers[index] = column[index]
+        return integers
+
+    return [int(value) if value and isinstance(value, (int, float)) else value for value in column]
+
+
+# Column conversion of locations.csv: values which are no numbers are written as strings
+def _location_column(column):
+    if set(map(type, column)) <= {str, int, float, bool, type(None)}:
+        return column
+
+    return [str(value) if value and not isinstance(value, (int, float)) else value for value in column]
+
+
+# Column conversion of routes.csv: numbers are truncated to int, 0 and '0.0' are left empty
+def _route_column(column):
+    if set(map(type, column)) <= {str, type(None)} and '0.0' not in column:
+        return column
+
+    truncated = _truncate_floats(column)
+    if truncated is not None:
+        integers, zeros = truncated
+        for index in zeros:
+            integers[index] = None
+        return integers
+
+    return [
+        int(value) if value and isinstance(value, (int, float)) and value != '0.0'
+        else value if not (value == 0.0 or value == '0.0')
+        else None
+        for value in column
+    ]
+
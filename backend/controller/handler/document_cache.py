@@ -0,0 +1,150 @@
+from collections import OrderedDict
+import copy
+import os
+import threading
+import time
+
+# collections whose documents are only inserted and deleted by the API
+CACHED_COLLECTIONS = ("simulations", "simsettings")
+
+# key of the summaries of a collection instead of a document ID
+SUMMARIES = "summaries"
+
+
+def cache_options():
+    """
+    Reads the cache configuration from the environment.
+
+    Environment variables:
+    - DOCUMENT_CACHE_SIZE: Maximum number of cached documents and summary
+      lists (default 256, 0 disables the cache).
+    - DOCUMENT_CACHE_TTL_SECONDS: Age after which an entry is read from the
+      database again (default 300). This bounds how long writes of other
+      API instances may go unnoticed if change streams are not available.
+
+    Returns:
+    - dict: Keyword arguments for the DocumentCache.
+    """
+    return {"max_entries": int(os.getenv("DOCUMENT_CACHE_SIZE", "256")),
+            "ttl_seconds": float(os.getenv("DOCUMENT_CACHE_TTL_SECONDS",
+                                           "300"))}
+
+
+class DocumentCache:
+    """
+    In-process read-through cache of the documents and summaries read by
+    the DatabaseHandler, keyed by collection, document ID and projection.
+
+    The least recently used entries are evicted beyond max_entries. Entries
+    are invalidated by the writes of the DatabaseHandler and, where the
+    database supports change streams, by the writes of other processes
+    (see DatabaseHandler.watch_changes). Values are returned as deep
+    copies, such that callers can modify them.
+    """
+
+    def __init__(self,
+                 max_entries: int = 256,
+                 ttl_seconds: float = 300,
+                 clock=time.monotonic):
+        """
+        Parameters:
+        - max_entries (int): The maximum number of entries.
+        - ttl_seconds (float): The age after which an entry expires.
+        - clock (callable): Returns the current time in seconds.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(collection_name: str, object_id: str, fields: list = None):
+        """
+        Returns the key of a document, or of the summaries of a collection
+        if object_id is SUMMARIES.
+        """
+        return (collection_name, object_id,
+                tuple(sorted(fields)) if fields else None)
+
+    async def read_through(self, key: tuple, load):
+        """
+        Returns the cached value of a key, or the value of load, which is
+        cached unless it is None.
+
+        Parameters:
+        - key (tuple): The key (see key).
+        - load (callable): Returns a coroutine reading the value from the
+          database.
+
+        Returns:
+        - The value.
+        """
+        if key[0] not in CACHED_COLLECTIONS or self.max_entries <= 0:
+            return await load()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and \
+                    self.clock() - entry[0] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            self.misses += 1
+            generation = self.invalidations
+
+        value = await load()
+        if value is None:
+            return value
+        with self._lock:
+            # a write invalidated the cache while loading: the value may be
+            # outdated already
+            if generation == self.invalidations:
+                self._entries[key] = (self.clock(), copy.deepcopy(value))
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, collection_name: str, object_id: str = None):
+        """
+        Removes the entries of a written document and the summaries of its
+        collection.
+
+        Parameters:
+        - collection_name (str): The name of the collection.
+        - object_id (str, optional): The ID of the document, all documents
+          of the collection if None.
+        """
+        with self._lock:
+            self.invalidations += 1
+            for key in list(self._entries):
+                if key[0] == collection_name and (
+                        object_id is None
+                        or key[1] in (str(object_id), SUMMARIES)):
+                    del self._entries[key]
+
+    def clear(self):
+        """
+        Removes all entries.
+        """
+        with self._lock:
+            self.invalidations += 1
+            self._entries.clear()
+
+    def as_dict(self):
+        """
+        Returns the size and the hit and miss counters of the cache.
+        """
+        with self._lock:
+            requests = self.hits + self.misses
+            return {"entries": len(self._entries),
+                    "max_entries": self.max_entries,
+                    "ttl_seconds": self.ttl_seconds,
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "hit_ratio": self.hits / requests if requests else None,
+                    "invalidations": self.invalidations}
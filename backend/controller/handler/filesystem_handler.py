@@ -1,6 +1,13 @@
 import yaml
+import os
+import shutil
+import socket
+import tempfile
+import uuid
 from pathlib import Path
+from controller.content_hash import content_hash
 from controller.handler.csv_transformer import CsvTransformer
+from controller.handler.input_cache import InputCache
 
 
 class FileSystemHandler:
@@ -8,65 +15,194 @@ class FileSystemHandler:
     def __init__(self):
         self.backend_root_dir = Path(__file__).resolve().parent.parent.parent
         self.csv_transformer = CsvTransformer(self.backend_root_dir)
+        # Input directories are reused by all runs with the same content:
+        self.input_cache = InputCache(
+            self.backend_root_dir / "flee_stored_files" / "input_cache",
+            int(os.getenv("INPUT_CACHE_MAX_MB", "256")) * 2**20)
+        # Every run gets its own scratch directory below this directory,
+        # e.g. /dev/shm to keep it in memory:
+        self.scratch_root = Path(
+            os.getenv("SIMULATION_SCRATCH_DIR", tempfile.gettempdir())) / \
+            "caturanga-runs"
 
     async def store_simsettings_to_filesystem(
             self,
             simsettings):
 
-        # Total path to simsettings-file:
-        simsettings_dir = \
-            self.backend_root_dir / "flee_stored_files" / "simsettings"
-        filename = simsettings["_id"] + ".yml"
-        simsettings_filename = simsettings_dir / filename
-
-        # Create simsettings-directory:
-        if not simsettings_dir.exists():
-            simsettings_dir.mkdir(parents=True)
+        # The whole document is written, so the ID is part of the key:
+        key = "simsettings-" + content_hash(simsettings, ignore_keys=())
 
         # Create simsettings-file:
         try:
-            with open(simsettings_filename, 'w') as yml_file:
-                yaml.dump(simsettings, yml_file,
-                          default_flow_style=False,
-                          sort_keys=False)
+            simsettings_dir = self.input_cache.materialize(
+                key,
+                lambda: {"simsettings.yml": self.render_simsettings(
+                    simsettings)})
         except Exception as e:
             return f"Exception while storing the simsettings.yml file: {e}"
 
-        return simsettings_filename
+        return simsettings_dir / "simsettings.yml"
 
     async def store_simulation_to_filesystem(
             self,
             simulation):
 
+        # The .csv files do not depend on the ID and name of the input:
+        key = "input-" + content_hash(simulation)
+
+        # Path to simulation directory (.csv - FLEE files of simulation):
         try:
-            await self.csv_transformer.convert_simulation_to_csv(simulation)
+            simulation_dir = self.input_cache.materialize(
+                key,
+                lambda: self.csv_transformer.render_simulation_csv(
+                    simulation))
         except Exception as e:
             return f"Failed converting simulation to csv {e}"
 
-        # Path to simulation directory (.csv - FLEE files of simulation):
-        simulation_dir = \
-            self.backend_root_dir / "flee_stored_files" / "conflict_input" / \
-            simulation["_id"]
-
-        # Create simulations-directory:
-        if not simulation_dir.exists():
-            simulation_dir.mkdir(parents=True)
-
         return simulation_dir
 
     async def store_validation_to_filesystem(self):
 
-        validation_dir = \
-            self.backend_root_dir / "flee_stored_files" / "conflict_validation"
-        data_layout = validation_dir / "data_layout.csv"
-
-        if not validation_dir.exists():
-            validation_dir.mkdir(parents=True)
-
         # create an empty csv file
         try:
-            open(data_layout, 'w').close()
+            validation_dir = self.input_cache.materialize(
+                "validation", lambda: {"data_layout.csv": ""})
         except Exception as e:
             return f"Exception while creating data_layout.csv: {e}"
 
         return validation_dir
+
+    def render_simsettings(self, simsettings):
+        """
+        Returns the content of the simsettings file of FLEE.
+        """
+        return yaml.dump(simsettings, default_flow_style=False,
+                         sort_keys=False)
+
+    def create_workspace(self):
+        """
+        Creates the scratch directory of a run. The simulation runs in it
+        and may write any files to it, without affecting other runs.
+
+        Returns:
+        - Path: The directory.
+        """
+        self.scratch_root.mkdir(parents=True, exist_ok=True)
+        workspace = self.scratch_root / \
+            f"run-{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex}"
+        workspace.mkdir()
+        return workspace
+
+    def write_input_files(self, workspace, simulation, simsettings):
+        """
+        Writes the rendered input files of a run into its scratch
+        directory, such that nothing is written to flee_stored_files and
+        FLEE reads them like any other files. On a tmpfs scratch directory
+        (see SIMULATION_SCRATCH_DIR) the files never reach the disk.
+
+        Parameters:
+        - workspace (Path): The scratch directory of the run.
+        - simulation (dict): The simulation input.
+        - simsettings (dict): The simulation settings.
+
+        Returns:
+        - dict: The simsettings filename, simulation directory and
+          validation directory in the scratch directory.
+        """
+        workspace = Path(workspace)
+        paths = {"simsettings_filename": str(workspace / "simsettings.yml"),
+                 "simulation_dir": str(workspace / "input"),
+                 "validation_dir": str(workspace / "validation")}
+        # the same content as the store_*_to_filesystem methods write
+        files = {paths["simsettings_filename"]:
+                 self.render_simsettings(simsettings),
+                 os.path.join(paths["validation_dir"], "data_layout.csv"): ""}
+        for file_name, content in \
+                self.csv_transformer.render_simulation_csv(simulation).items():
+            files[os.path.join(paths["simulation_dir"], file_name)] = content
+        for path, content in files.items():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # the content has its line endings already
+            with open(path, "w", encoding="utf-8", newline="") as file:
+                file.write(content)
+        return paths
+
+    def stage_input_files(self,
+                          workspace,
+                          simulation_dir,
+                          simsettings_filename,
+                          validation_dir):
+        """
+        Copies the input files of a run from the input cache into its
+        scratch directory, such that the cached files are never changed by
+        a simulation.
+
+        Parameters:
+        - workspace (Path): The scratch directory of the run.
+        - simulation_dir (str): The directory with the .csv files.
+        - simsettings_filename (str): The simsettings file.
+        - validation_dir (str): The validation directory.
+
+        Returns:
+        - dict: The simsettings filename, simulation directory and
+          validation directory in the scratch directory.
+
+        Raises:
+        - OSError: If a file could not be copied, e.g. because it has been
+          evicted from the input cache. Nothing is left in the scratch
+          directory.
+        """
+        workspace = Path(workspace)
+        try:
+            shutil.copytree(simulation_dir, workspace / "input")
+            shutil.copytree(validation_dir, workspace / "validation")
+            shutil.copyfile(simsettings_filename,
+                            workspace / "simsettings.yml")
+        except OSError:
+            # staging can be retried in the same scratch directory
+            shutil.rmtree(workspace / "input", ignore_errors=True)
+            shutil.rmtree(workspace / "validation", ignore_errors=True)
+            (workspace / "simsettings.yml").unlink(missing_ok=True)
+            raise
+        return {"simsettings_filename": str(workspace / "simsettings.yml"),
+                "simulation_dir": str(workspace / "input"),
+                "validation_dir": str(workspace / "validation")}
+
+    def remove_workspace(self, workspace):
+        """
+        Removes the scratch directory of a finished run.
+        """
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    def remove_stale_workspaces(self):
+        """
+        Removes the scratch directories left behind by API processes of
+        this host that no longer run, e.g. after a crash.
+
+        Returns:
+        - int: The number of removed directories.
+        """
+        prefix = f"run-{socket.gethostname()}-"
+        removed = 0
+        try:
+            workspaces = list(self.scratch_root.iterdir())
+        except OSError:
+            return 0
+        for workspace in workspaces:
+            if not workspace.name.startswith(prefix):
+                continue
+            pid = workspace.name[len(prefix):].split("-")[0]
+            if pid.isdigit() and not _process_exists(int(pid)):
+                shutil.rmtree(workspace, ignore_errors=True)
+                removed += 1
+        return removed
+
+
+def _process_exists(pid: int):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
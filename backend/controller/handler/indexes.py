@@ -0,0 +1,88 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+import logging
+
+logger = logging.getLogger(__name__)
+
+# The indexes of every collection, by the queries that need them. Queries
+# by "_id" only use the default index. Listings sorted by "_id" have "_id"
+# as last key, such that the sort uses the index as well.
+INDEXES = {
+    "simulations": [
+        # overlays of an input (DatabaseHandler.detach_overlays)
+        IndexModel([("parent_id", ASCENDING)], name="parent_id"),
+    ],
+    "simsettings": [
+        # summaries exclude the simsettings of sweeps
+        IndexModel([("sweep_id", ASCENDING)], name="sweep_id"),
+    ],
+    "simulations_results": [
+        # results of an input: listing and deletion with the input
+        IndexModel([("simulation_id", ASCENDING), ("_id", ASCENDING)],
+                   name="simulation_id"),
+        # results by status: listing and reconciliation of running results
+        IndexModel([("status", ASCENDING), ("_id", ASCENDING)],
+                   name="status"),
+        # reuse of the results of identical runs (find_result_by_hash)
+        IndexModel([("input_hash", ASCENDING), ("status", ASCENDING)],
+                   name="input_hash_status"),
+        # copies of a result (DatabaseHandler.copy_result)
+        IndexModel([("source_id", ASCENDING)], name="source_id",
+                   sparse=True),
+    ],
+    "simulation_result_chunks": [
+        # partial results of a running simulation, ordered by chunk
+        IndexModel([("result_id", ASCENDING), ("index", ASCENDING)],
+                   name="result_id_index"),
+    ],
+    "simulation_ensembles": [
+        # ensembles a finished replicate belongs to
+        IndexModel([("result_ids", ASCENDING)], name="result_ids"),
+        # ensembles of a sweep
+        IndexModel([("sweep_id", ASCENDING), ("_id", ASCENDING)],
+                   name="sweep_id"),
+    ],
+    "simulation_jobs": [
+        # leasing: the queued job with the highest priority, oldest first
+        IndexModel([("status", ASCENDING), ("priority", DESCENDING),
+                    ("created_at", ASCENDING)],
+                   name="status_priority_created_at"),
+        # cancellation of the job of a result
+        IndexModel([("result_id", ASCENDING), ("status", ASCENDING)],
+                   name="result_id_status"),
+    ],
+}
+
+
+def ensure_indexes(db, indexes: dict = None):
+    """
+    Creates the indexes that do not exist yet. Existing indexes are
+    recognised by their name, so calling this at every startup (of every
+    API instance) only creates new indexes. An index that can not be
+    created (e.g. because an index with the same keys exists under another
+    name) is logged and skipped.
+
+    Parameters:
+    - db (Database): The database (blocking client).
+    - indexes (dict, optional): Lists of IndexModel by collection name,
+      INDEXES if None.
+
+    Returns:
+    - list: The created indexes as "collection.name".
+    """
+    created = []
+    for collection_name, models in (indexes or INDEXES).items():
+        collection = db[collection_name]
+        existing = collection.index_information()
+        missing = [model for model in models
+                   if model.document["name"] not in existing]
+        if not missing:
+            continue
+        try:
+            names = collection.create_indexes(missing)
+        except OperationFailure as e:
+            logger.warning("Could not create the indexes of %s: %s",
+                           collection_name, e)
+            continue
+        created.extend(f"{collection_name}.{name}" for name in names)
+    return created
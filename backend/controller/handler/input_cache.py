@@ -0,0 +1,140 @@
+from pathlib import Path
+import os
+import shutil
+import threading
+import time
+import uuid
+
+# temporary directories of writers that crashed are removed after this age
+STALE_SECONDS = 3600
+
+
+class InputCache:
+    """
+    Stores the input directories of FLEE under a key derived from their
+    content (see content_hash), such that a directory is written once and
+    reused by all runs with the same input.
+
+    A directory is written to a temporary directory first and renamed to
+    its key, so readers never see a partially written directory, also
+    when several processes materialize the same input at once. The least
+    recently used directories are removed once the cache exceeds
+    max_bytes.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        """
+        Parameters:
+        - root (Path): The directory of the cache.
+        - max_bytes (int): The size the cache is reduced to after writing
+          a new directory.
+        """
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def materialize(self, key: str, render):
+        """
+        Returns the directory of a key, written with the files returned by
+        render if it does not exist yet.
+
+        Parameters:
+        - key (str): The content key, e.g. "input-<hash>".
+        - render (callable): Returns the file names mapped to their
+          (text) content. Only called if the directory is missing.
+
+        Returns:
+        - Path: The directory.
+        """
+        directory = self.root / key
+        if self.touch(directory):
+            return directory
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        temporary = self.root / f".tmp-{key}-{uuid.uuid4().hex}"
+        temporary.mkdir()
+        try:
+            for file_name, content in render().items():
+                with open(temporary / file_name, mode='w', newline='',
+                          encoding='utf-8') as file:
+                    file.write(content)
+            os.rename(temporary, directory)
+        except OSError:
+            shutil.rmtree(temporary, ignore_errors=True)
+            # another process renamed the same content first
+            if not directory.is_dir():
+                raise
+        except BaseException:
+            shutil.rmtree(temporary, ignore_errors=True)
+            raise
+
+        self.evict(keep=directory)
+        return directory
+
+    def touch(self, directory: Path):
+        """
+        Marks a directory of the cache as used.
+
+        Returns:
+        - bool: Whether the directory exists.
+        """
+        try:
+            os.utime(directory)
+        except OSError:
+            return False
+        return True
+
+    def evict(self, keep: Path = None):
+        """
+        Removes the least recently used directories until the cache is not
+        larger than max_bytes, and temporary directories of crashed
+        writers.
+
+        Parameters:
+        - keep (Path, optional): A directory that is never removed.
+        """
+        with self._lock:
+            entries = []
+            total = 0
+            for directory in self._directories():
+                try:
+                    if directory.name.startswith(".tmp-"):
+                        if time.time() - directory.stat().st_mtime > \
+                                STALE_SECONDS:
+                            shutil.rmtree(directory, ignore_errors=True)
+                        continue
+                    size = _size(directory)
+                    entries.append((directory.stat().st_mtime, size,
+                                    directory))
+                except OSError:
+                    # renamed or removed by another process meanwhile
+                    continue
+                total += size
+
+            for _, size, directory in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if keep is not None and directory == Path(keep):
+                    continue
+                shutil.rmtree(directory, ignore_errors=True)
+                total -= size
+
+    def size(self):
+        """
+        Returns the number of directories and their total size in bytes.
+        """
+        directories = [directory for directory in self._directories()
+                       if not directory.name.startswith(".tmp-")]
+        return len(directories), sum(_size(directory)
+                                     for directory in directories)
+
+    def _directories(self):
+        try:
+            return [entry for entry in self.root.iterdir() if entry.is_dir()]
+        except OSError:
+            return []
+
+
+def _size(directory: Path):
+    return sum(file.stat().st_size for file in directory.iterdir()
+               if file.is_file())
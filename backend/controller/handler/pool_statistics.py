@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+from pymongo import monitoring
+
+
+def pool_options():
+    """
+    Reads the connection pool configuration from the environment.
+    Unset variables fall back to the pymongo defaults.
+
+    Environment variables:
+    - MONGO_MAX_POOL_SIZE: Maximum number of connections per server.
+    - MONGO_MIN_POOL_SIZE: Number of connections kept open when idle.
+    - MONGO_MAX_IDLE_TIME_MS: Idle time after which a connection is evicted.
+    - MONGO_WAIT_QUEUE_TIMEOUT_MS: Maximum wait for a free connection.
+    - MONGO_CONNECT_TIMEOUT_MS: Timeout of the TCP/TLS connect.
+    - MONGO_SOCKET_TIMEOUT_MS: Timeout of a single socket operation.
+    - MONGO_SERVER_SELECTION_TIMEOUT_MS: Timeout for finding a server.
+
+    Returns:
+    - dict: Keyword arguments for the MongoClient.
+    """
+    options = {
+        "maxPoolSize": os.getenv("MONGO_MAX_POOL_SIZE", "100"),
+        "minPoolSize": os.getenv("MONGO_MIN_POOL_SIZE", "0"),
+        "maxIdleTimeMS": os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"),
+        "waitQueueTimeoutMS": os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS"),
+        "connectTimeoutMS": os.getenv("MONGO_CONNECT_TIMEOUT_MS", "10000"),
+        "socketTimeoutMS": os.getenv("MONGO_SOCKET_TIMEOUT_MS"),
+        "serverSelectionTimeoutMS":
+            os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "10000"),
+    }
+    return {key: int(value)
+            for key, value in options.items() if value is not None}
+
+
+class PoolStatistics(monitoring.ConnectionPoolListener):
+    """
+    Collects connection pool statistics of a MongoClient.
+    The listener is registered through the event_listeners argument of
+    the client and counts checked-out connections, the time spent waiting
+    for a connection and the number of completed connection handshakes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checkout_started = threading.local()
+        self.connections_open = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.handshakes = 0
+        self.pools_cleared = 0
+
+    def as_dict(self):
+        """
+        Returns a snapshot of the statistics.
+
+        Returns:
+        - dict: The current pool statistics.
+        """
+        with self._lock:
+            average_wait_ms = \
+                self.total_wait_ms / self.checkouts if self.checkouts else 0.0
+            return {
+                "connections_open": self.connections_open,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "total_wait_ms": round(self.total_wait_ms, 3),
+                "average_wait_ms": round(average_wait_ms, 3),
+                "max_wait_ms": round(self.max_wait_ms, 3),
+                "handshakes": self.handshakes,
+                "pools_cleared": self.pools_cleared,
+            }
+
+    # Check-out events are published synchronously on the thread that
+    # requests the connection, so the start time is kept thread-local.
+
+    def connection_check_out_started(self, event):
+        self._checkout_started.value = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        wait_ms = self._elapsed_wait_ms()
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out,
+                                       self.checked_out)
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def connection_check_out_failed(self, event):
+        wait_ms = self._elapsed_wait_ms()
+        with self._lock:
+            self.checkout_failures += 1
+            self.total_wait_ms += wait_ms
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out = max(self.checked_out - 1, 0)
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_open += 1
+
+    def connection_ready(self, event):
+        # A connection is ready once the TLS and MongoDB handshakes
+        # (including authentication) have completed.
+        with self._lock:
+            self.handshakes += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_open = max(self.connections_open - 1, 0)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pools_cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def _elapsed_wait_ms(self):
+        started = getattr(self._checkout_started, "value", None)
+        if started is None:
+            return 0.0
+        self._checkout_started.value = None
+        return (time.perf_counter() - started) * 1000
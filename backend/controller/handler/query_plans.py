@@ -0,0 +1,115 @@
+import copy
+import threading
+from pymongo import monitoring
+
+# commands that can be explained, with the field holding their filter
+EXPLAINABLE = {"find": "filter",
+               "count": "query",
+               "distinct": "query",
+               "findAndModify": "query",
+               "aggregate": None,
+               "delete": None,
+               "update": None}
+
+# fields added by the driver that explain does not accept
+DRIVER_FIELDS = ("lsid", "txnNumber", "autocommit", "startTransaction",
+                 "writeConcern", "readConcern", "ordered", "$db",
+                 "$clusterTime", "$readPreference")
+
+
+class QueryRecorder(monitoring.CommandListener):
+    """
+    Records the queries a MongoClient sends, such that their query plans
+    can be checked afterwards (see collection_scans). The recorder is
+    registered through the event_listeners argument of the client, which
+    records the queries of the DatabaseHandler without changing it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.commands = []
+
+    def started(self, event):
+        if event.command_name not in EXPLAINABLE:
+            return
+        command = {key: value for key, value in event.command.items()
+                   if key not in DRIVER_FIELDS}
+        with self._lock:
+            self.commands.append(copy.deepcopy(command))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def query_filter(command: dict):
+    """
+    Returns the filter of a recorded command.
+
+    Parameters:
+    - command (dict): The command, e.g. {"find": "simulations",
+      "filter": {...}}.
+
+    Returns:
+    - dict: The filter, {} if the command reads the whole collection.
+    """
+    name = next(iter(command))
+    if name in ("delete", "update"):
+        statements = command["deletes" if name == "delete" else "updates"]
+        return statements[0].get("q") or {}
+    if name == "aggregate":
+        stages = command.get("pipeline") or [{}]
+        return stages[0].get("$match") or {}
+    return command.get(EXPLAINABLE[name]) or {}
+
+
+def plan_stages(plan):
+    """
+    Yields the stages of an explained query plan, without those of the
+    rejected plans.
+
+    Parameters:
+    - plan: The output of the explain command or a part of it.
+
+    Yields:
+    - str: The stage names, e.g. "IXSCAN" or "COLLSCAN".
+    """
+    if isinstance(plan, dict):
+        if isinstance(plan.get("stage"), str):
+            yield plan["stage"]
+        for key, value in plan.items():
+            if key != "rejectedPlans":
+                yield from plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from plan_stages(value)
+
+
+def collection_scans(db, commands: list, allowed=None):
+    """
+    Explains recorded commands and returns those that scan a whole
+    collection although they have a filter, i.e. that miss an index.
+    Commands without filter (listings of whole collections) are expected
+    to scan the collection.
+
+    Parameters:
+    - db (Database): The database the commands were sent to.
+    - commands (list): The commands of a QueryRecorder.
+    - allowed (callable, optional): Returns True for commands that may
+      scan the collection, e.g. one-time migrations.
+
+    Returns:
+    - list: The commands whose plan contains a COLLSCAN stage.
+    """
+    scans = []
+    for command in commands:
+        if not query_filter(command):
+            continue
+        if allowed is not None and allowed(command):
+            continue
+        plan = db.command("explain", command, verbosity="queryPlanner")
+        if "COLLSCAN" in plan_stages(plan):
+            scans.append(command)
+    return scans
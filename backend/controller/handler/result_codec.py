@@ -0,0 +1,352 @@
+import json
+import zlib
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zlib is used as fallback
+    zstandard = None
+
+FORMAT = "columnar"
+VERSION = 1
+
+# Typed columns are stored as little-endian numpy buffers, all other
+# columns (strings such as "Date", columns with missing values or with
+# both ints and floats) as JSON encoded lists.
+NUMPY_DTYPES = {"int64": "<i8", "float64": "<f8"}
+
+
+def compress(data: bytes, codec: str = None):
+    """
+    Compresses a buffer with zstd, or zlib if zstandard is not installed.
+
+    Parameters:
+    - data (bytes): The buffer.
+    - codec (str, optional): "zstd" or "zlib", the best available if None.
+
+    Returns:
+    - tuple: The codec name and the compressed buffer.
+    """
+    if codec is None:
+        codec = "zstd" if zstandard is not None else "zlib"
+    if codec == "zstd":
+        return codec, zstandard.ZstdCompressor(level=3).compress(data)
+    return codec, zlib.compress(data, 6)
+
+
+def decompress(data: bytes, codec: str):
+    """
+    Decompresses a buffer compressed with compress.
+
+    Parameters:
+    - data (bytes): The compressed buffer.
+    - codec (str): The codec used for compression.
+
+    Returns:
+    - bytes: The original buffer.
+    """
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read this result.")
+        # streamed columns (see concat_results) have no content size
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return zlib.decompress(data)
+
+
+def compressor(codec: str = None):
+    """
+    Creates a compressor for data that is compressed piece by piece, whose
+    output is read with decompress.
+
+    Parameters:
+    - codec (str, optional): "zstd" or "zlib", the best available if None.
+
+    Returns:
+    - tuple: The codec name and the compressor, with compress and flush.
+    """
+    if codec is None:
+        codec = "zstd" if zstandard is not None else "zlib"
+    if codec == "zstd":
+        return codec, zstandard.ZstdCompressor(level=3).compressobj()
+    return codec, zlib.compressobj(6)
+
+
+def column_dtype(values: list):
+    """
+    Determines the storage type of a column.
+
+    Parameters:
+    - values (list): The values of the column.
+
+    Returns:
+    - str: "int64", "float64" or "json".
+    """
+    # bool is a subclass of int but must keep its JSON representation
+    if all(type(value) is int for value in values):
+        if all(-2**63 <= value < 2**63 for value in values):
+            return "int64"
+        return "json"
+    # columns mixing ints and floats are stored as JSON, such that their
+    # ints are not decoded as floats
+    if all(type(value) is float for value in values):
+        return "float64"
+    return "json"
+
+
+def encode_result(rows: list, codec: str = None):
+    """
+    Encodes the per-day output rows of FLEE column by column. Every column
+    is stored once as a typed, compressed array instead of repeating the
+    column names in every row.
+
+    Parameters:
+    - rows (list): The FLEE output, a list of dicts with the same keys.
+    - codec (str, optional): The compression codec.
+
+    Returns:
+    - dict: The encoded result, None if the rows do not share their keys
+      and can therefore not be stored as columns.
+    """
+    column_names = list(rows[0].keys()) if rows else []
+    if any(list(row.keys()) != column_names for row in rows):
+        return None
+
+    columns = {}
+    for index, name in enumerate(column_names):
+        values = [row[name] for row in rows]
+        columns[column_key(index)] = encode_column(values, codec)
+
+    return {
+        "format": FORMAT,
+        "version": VERSION,
+        "length": len(rows),
+        "column_names": column_names,
+        "columns": columns,
+    }
+
+
+def concat_results(results, codec: str = None):
+    """
+    Concatenates encoded results with the same columns, e.g. the chunks of
+    a partial result, into one encoded result. The results are read one at
+    a time and every column is compressed as a stream, such that only the
+    compressed columns and a single result are held in memory.
+
+    Parameters:
+    - results (iterable): The encoded results in order, None for a part
+      that could not be encoded.
+    - codec (str, optional): The compression codec.
+
+    Returns:
+    - dict: The encoded result, None if a part is None or the parts do not
+      share their columns.
+    """
+    column_names = None
+    streams = []
+    length = 0
+    for result in results:
+        if result is None:
+            return None
+        if column_names is None:
+            column_names = result["column_names"]
+            streams = [ColumnStream(codec) for _ in column_names]
+        elif result["column_names"] != column_names:
+            return None
+        for index, stream in enumerate(streams):
+            stream.add(result["columns"][column_key(index)])
+        length += result["length"]
+
+    return {
+        "format": FORMAT,
+        "version": VERSION,
+        "length": length,
+        "column_names": column_names or [],
+        "columns": {column_key(index): stream.close()
+                    for index, stream in enumerate(streams)},
+    }
+
+
+class ColumnStream:
+    """
+    Encodes a column from consecutive encoded parts (see concat_results).
+    The column keeps the dtype of its parts, a column whose parts have
+    different dtypes is stored as JSON like any other mixed column.
+    """
+
+    def __init__(self, codec: str = None):
+        self.codec, self.compressor = compressor(codec)
+        self.dtype = None
+        self.data = []
+        self.empty = True
+
+    def add(self, column: dict):
+        """
+        Appends the values of an encoded part of the column.
+
+        Parameters:
+        - column (dict): The encoded part, see encode_column.
+        """
+        if self.dtype is None:
+            self.dtype = column["dtype"]
+            if self.dtype == "json":
+                self.data.append(self.compressor.compress(b"["))
+        elif column["dtype"] != self.dtype and self.dtype != "json":
+            self._to_json()
+
+        if self.dtype == "json":
+            values = decode_column(column)
+            if isinstance(values, np.ndarray):
+                values = values.tolist()
+            self._add_json(values)
+        else:
+            self.data.append(self.compressor.compress(
+                decompress(bytes(column["data"]), column["codec"])))
+
+    def close(self):
+        """
+        Returns the encoded column, see encode_column.
+        """
+        if self.dtype == "json":
+            self.data.append(self.compressor.compress(b"]"))
+        self.data.append(self.compressor.flush())
+        return {"dtype": self.dtype, "codec": self.codec,
+                "data": b"".join(self.data)}
+
+    def _add_json(self, values: list):
+        if not values:
+            return
+        raw = json.dumps(values, separators=(",", ":"))[1:-1]
+        if not self.empty:
+            raw = "," + raw
+        self.data.append(self.compressor.compress(raw.encode("utf-8")))
+        self.empty = False
+
+    def _to_json(self):
+        # the parts added so far are converted, only this column is held
+        self.data.append(self.compressor.flush())
+        values = np.frombuffer(decompress(b"".join(self.data), self.codec),
+                               dtype=NUMPY_DTYPES[self.dtype]).tolist()
+        self.codec, self.compressor = compressor(self.codec)
+        self.dtype = "json"
+        self.data = [self.compressor.compress(b"[")]
+        self.empty = True
+        self._add_json(values)
+
+
+def encode_column(values: list, codec: str = None):
+    """
+    Encodes the values of a single column.
+
+    Parameters:
+    - values (list): The values.
+    - codec (str, optional): The compression codec.
+
+    Returns:
+    - dict: The dtype, codec and the compressed data of the column.
+    """
+    dtype = column_dtype(values)
+    if dtype == "json":
+        raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    else:
+        raw = np.asarray(values, dtype=NUMPY_DTYPES[dtype]).tobytes()
+
+    codec, data = compress(raw, codec)
+    return {"dtype": dtype, "codec": codec, "data": data}
+
+
+def decode_column(column: dict, data: bytes = None):
+    """
+    Decodes a single column.
+
+    Parameters:
+    - column (dict): The encoded column.
+    - data (bytes, optional): The compressed data, if it is not stored in
+      the column itself (e.g. spilled to GridFS).
+
+    Returns:
+    - numpy.ndarray or list: The values, an array for typed columns.
+    """
+    if data is None:
+        data = column["data"]
+    raw = decompress(bytes(data), column["codec"])
+    if column["dtype"] == "json":
+        return json.loads(raw.decode("utf-8"))
+    return np.frombuffer(raw, dtype=NUMPY_DTYPES[column["dtype"]])
+
+
+def decode_columns(result: dict, names: list = None, spilled: dict = None):
+    """
+    Decodes the columns of an encoded result.
+
+    Parameters:
+    - result (dict): The encoded result.
+    - names (list, optional): The columns to decode, all if None.
+    - spilled (dict, optional): Compressed data of spilled columns by key.
+
+    Returns:
+    - dict: The column names mapped to their decoded values.
+    """
+    spilled = spilled or {}
+    if names is None:
+        names = result["column_names"]
+
+    keys = column_keys(result)
+    return {name: decode_column(result["columns"][keys[name]],
+                                spilled.get(keys[name]))
+            for name in names}
+
+
+def columns_to_lists(columns: dict):
+    """
+    Converts decoded columns to plain Python lists for JSON responses.
+
+    Parameters:
+    - columns (dict): The decoded columns.
+
+    Returns:
+    - dict: The columns as lists of Python scalars.
+    """
+    return {name: values.tolist() if isinstance(values, np.ndarray)
+            else values
+            for name, values in columns.items()}
+
+
+def decode_rows(result: dict, spilled: dict = None):
+    """
+    Decodes an encoded result back into the per-day rows of FLEE.
+
+    Parameters:
+    - result (dict): The encoded result.
+    - spilled (dict, optional): Compressed data of spilled columns by key.
+
+    Returns:
+    - list: The rows, a dict per day.
+    """
+    columns = columns_to_lists(decode_columns(result, spilled=spilled))
+    names = result["column_names"]
+    return [dict(zip(names, values))
+            for values in zip(*(columns[name] for name in names))]
+
+
+def column_key(index: int):
+    """
+    Returns the document key of a column. Column names are location names
+    which may contain characters that are not allowed in MongoDB keys,
+    therefore columns are keyed by their position.
+    """
+    return f"c{index}"
+
+
+def column_keys(result: dict):
+    """
+    Returns the column names of an encoded result mapped to their keys.
+    """
+    return {name: column_key(index)
+            for index, name in enumerate(result["column_names"])}
+
+
+def is_encoded(result):
+    """
+    Returns whether a stored result is in the columnar format.
+    """
+    return isinstance(result, dict) and result.get("format") == FORMAT
@@ -0,0 +1,253 @@
+from pathlib import Path
+import abc
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SecretProvider(abc.ABC):
+    """
+    Base class of the secret providers. A provider returns a secret as a
+    dictionary, e.g. {"MONGO_USER": ..., "MONGO_PASSWORD": ...}.
+    """
+
+    @abc.abstractmethod
+    def get_secret(self, secret_name: str):
+        """
+        Returns the secret with the given name.
+
+        Parameters:
+        - secret_name (str): The name of the secret.
+
+        Returns:
+        - dict: The key/value pairs of the secret.
+        """
+
+
+class EnvironmentSecretProvider(SecretProvider):
+    """
+    Reads secrets from environment variables. The keys of the secret are
+    the environment variables themselves (e.g. MONGO_USER), the name of
+    the secret is ignored.
+    """
+
+    def __init__(self, keys=("MONGO_USER", "MONGO_PASSWORD")):
+        self.keys = keys
+
+    def get_secret(self, secret_name: str):
+        missing = [key for key in self.keys if key not in os.environ]
+        if missing:
+            raise KeyError(
+                f"Secret {secret_name}: environment variables "
+                f"{', '.join(missing)} are not set.")
+        return {key: os.environ[key] for key in self.keys}
+
+
+class FileSecretProvider(SecretProvider):
+    """
+    Reads secrets from JSON files named <secret_name>.json in a directory,
+    e.g. a mounted Docker or Kubernetes secret.
+    """
+
+    def __init__(self, secrets_dir):
+        self.secrets_dir = Path(secrets_dir)
+
+    def get_secret(self, secret_name: str):
+        with open(self.secrets_dir / f"{secret_name}.json") as secret_file:
+            return json.load(secret_file)
+
+
+class AwsSecretProvider(SecretProvider):
+    """
+    Reads secrets from the AWS Secrets Manager.
+    """
+
+    def __init__(self, region_name="eu-west-1"):
+        self.region_name = region_name
+
+    def get_secret(self, secret_name: str):
+        # boto3 is only imported when AWS is actually used, which keeps it
+        # off the startup path of offline deployments.
+        import boto3
+
+        session = boto3.session.Session()
+        client = session.client(service_name="secretsmanager",
+                                region_name=self.region_name)
+
+        # For a list of exceptions thrown, see
+        # https://docs.aws.amazon.com/secretsmanager/latest/apireference/API_GetSecretValue.html
+        response = client.get_secret_value(SecretId=secret_name)
+
+        return json.loads(response["SecretString"])
+
+
+class CachedSecretProvider(SecretProvider):
+    """
+    Caches the secrets of another provider in memory for ttl seconds.
+    Before an entry expires, it is refreshed in a background thread so that
+    callers never wait for the underlying provider once a secret has been
+    resolved. If a refresh fails, the previous value is kept, the error
+    is logged and the refresh is retried after retry_seconds. Listeners
+    are notified when a secret has changed (e.g. it has been rotated),
+    such that clients built from it can be rebuilt.
+    """
+
+    def __init__(self, provider: SecretProvider, ttl: float = 3600,
+                 refresh_margin: float = 0.1, retry_seconds: float = 60,
+                 clock=time.monotonic):
+        """
+        Parameters:
+        - provider (SecretProvider): The provider of the secrets.
+        - ttl (float): The lifetime of a cached secret in seconds.
+        - refresh_margin (float): The share of the lifetime before expiry
+          in which a secret is refreshed in the background.
+        - retry_seconds (float): The time to wait before retrying a failed
+          refresh.
+        - clock (callable): Returns the current time in seconds.
+        """
+        self.provider = provider
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.retry_seconds = retry_seconds
+        self.clock = clock
+        self._cache = {}
+        self._refreshing = set()
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def get_secret(self, secret_name: str):
+        now = self.clock()
+        with self._lock:
+            entry = self._cache.get(secret_name)
+
+        if entry is None or now >= entry["expires"]:
+            return self._load(secret_name)
+
+        if now >= entry["refresh"]:
+            self._refresh_in_background(secret_name)
+
+        return entry["value"]
+
+    def get_cached_secret(self, secret_name: str):
+        """
+        Returns the cached value of a secret without ever waiting for the
+        underlying provider, also after the value expired (e.g. because
+        its refreshes failed). A due refresh is started in the background.
+
+        Parameters:
+        - secret_name (str): The name of the secret.
+
+        Returns:
+        - dict: The cached value, None if the secret was never loaded.
+        """
+        now = self.clock()
+        with self._lock:
+            entry = self._cache.get(secret_name)
+        if entry is None:
+            return None
+        if now >= entry["refresh"]:
+            self._refresh_in_background(secret_name)
+        return entry["value"]
+
+    def add_listener(self, listener):
+        """
+        Registers a function that is called with the name of a secret
+        whenever a refresh or reload returns a value different from the
+        cached one.
+
+        Parameters:
+        - listener (callable): Called with the secret name.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def invalidate(self, secret_name: str = None):
+        """
+        Removes one or all secrets from the cache.
+
+        Parameters:
+        - secret_name (str, optional): The secret to remove, all if None.
+        """
+        with self._lock:
+            if secret_name is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(secret_name, None)
+
+    def _load(self, secret_name: str):
+        value = self.provider.get_secret(secret_name)
+        now = self.clock()
+        with self._lock:
+            previous = self._cache.get(secret_name)
+            self._cache[secret_name] = {
+                "value": value,
+                "expires": now + self.ttl,
+                "refresh": now + self.ttl * (1 - self.refresh_margin),
+            }
+            listeners = list(self._listeners)
+        if previous is not None and previous["value"] != value:
+            for listener in listeners:
+                try:
+                    listener(secret_name)
+                except Exception:
+                    logger.exception("Listener of secret %s failed",
+                                     secret_name)
+        return value
+
+    def _refresh_in_background(self, secret_name: str):
+        with self._lock:
+            if secret_name in self._refreshing:
+                return None
+            self._refreshing.add(secret_name)
+
+        def refresh():
+            try:
+                self._load(secret_name)
+            except Exception:
+                # keep serving the cached value until it expires
+                logger.warning("Refreshing secret %s failed, the cached "
+                               "value is used until it expires",
+                               secret_name, exc_info=True)
+                with self._lock:
+                    entry = self._cache.get(secret_name)
+                    if entry is not None:
+                        entry["refresh"] = self.clock() + self.retry_seconds
+            finally:
+                with self._lock:
+                    self._refreshing.discard(secret_name)
+
+        thread = threading.Thread(target=refresh, daemon=True)
+        thread.start()
+        return thread
+
+
+def create_secret_provider():
+    """
+    Creates the cached secret provider configured by the environment.
+
+    Environment variables:
+    - SECRET_PROVIDER: "aws" (default), "env" or "file".
+    - SECRETS_DIR: Directory of the secret files for the "file" provider.
+    - SECRET_TTL_SECONDS: Lifetime of cached secrets (default 3600).
+
+    Returns:
+    - CachedSecretProvider: The provider.
+    """
+    provider_name = os.getenv("SECRET_PROVIDER", "aws").lower()
+
+    if provider_name == "env":
+        provider = EnvironmentSecretProvider()
+    elif provider_name == "file":
+        provider = FileSecretProvider(os.getenv("SECRETS_DIR", "/run/secrets"))
+    elif provider_name == "aws":
+        provider = AwsSecretProvider()
+    else:
+        raise ValueError(f"Unknown secret provider: {provider_name}")
+
+    return CachedSecretProvider(
+        provider,
+        ttl=float(os.getenv("SECRET_TTL_SECONDS", "3600")))
@@ -0,0 +1,105 @@
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - only gzip is offered then
+    brotli = None
+
+# Responses smaller than this are sent uncompressed.
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+
+# Levels favour speed, the bodies are compressed on every request.
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def available_encodings():
+    """
+    Returns the content codings the API can send, preferred first.
+    """
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: str):
+    """
+    Selects the content coding of a response from the Accept-Encoding
+    header of the request.
+
+    Parameters:
+    - accept_encoding (str): e.g. "gzip, deflate, br;q=0.9".
+
+    Returns:
+    - str: "br" or "gzip", None for an uncompressed response.
+    """
+    weights = {}
+    for entry in (accept_encoding or "").split(","):
+        coding, _, parameters = entry.strip().partition(";")
+        weight = 1.0
+        parameter = parameters.strip()
+        if parameter.startswith("q="):
+            try:
+                weight = float(parameter[2:])
+            except ValueError:
+                weight = 0.0
+        if coding:
+            weights[coding.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for coding in available_encodings():
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def compress(body: bytes, encoding: str):
+    """
+    Compresses a response body with a content coding of
+    available_encodings.
+    """
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def representation_tag(tag: str, encoding: str = None):
+    """
+    Returns the strong entity tag of a representation of a document, which
+    differs per content coding (e.g. "abc" and "abc-gzip").
+
+    Parameters:
+    - tag (str): The tag of the document content, without quotes.
+    - encoding (str, optional): The content coding of the body.
+    """
+    if encoding is None:
+        return f'"{tag}"'
+    return f'"{tag}-{encoding}"'
+
+
+def requested_tags(if_none_match: str):
+    """
+    Returns the document tags listed in an If-None-Match header,
+    independent of the content coding they were sent with.
+
+    Parameters:
+    - if_none_match (str): e.g. '"abc-gzip", W/"def"'.
+
+    Returns:
+    - set: The tags without quotes and coding suffix, "*" for any.
+    """
+    tags = set()
+    for entry in (if_none_match or "").split(","):
+        entry = entry.strip()
+        if entry == "*":
+            tags.add("*")
+            continue
+        if entry.startswith("W/"):
+            entry = entry[2:]
+        tag = entry.strip('"')
+        for coding in ("br", "gzip"):
+            if tag.endswith(f"-{coding}"):
+                tag = tag[:-len(coding) - 1]
+        if tag:
+            tags.add(tag)
+    return tags
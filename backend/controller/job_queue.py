@@ -0,0 +1,236 @@
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+
+
+class JobQueue:
+    """
+    Persistent simulation job queue stored in a MongoDB collection.
+
+    A job is "queued" until a worker leases it. A lease is valid for
+    lease_seconds and is extended by heartbeats while the job runs. Leases
+    that expire (e.g. because the process holding them crashed) are put
+    back into the queue, until a job has been attempted max_attempts
+    times, after which it is "failed". Jobs are leased by priority (high
+    first) and age (old first).
+
+    The queue uses the blocking pymongo API, since it is used by the
+    dispatcher threads of the SimulationExecutor.
+    """
+
+    def __init__(self,
+                 collection,
+                 lease_seconds: float = 60,
+                 max_attempts: int = 3,
+                 clock=datetime.utcnow):
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.clock = clock
+
+    def enqueue(self, result_id: str, payload: dict, priority: int = 0):
+        """
+        Adds a job to the queue.
+
+        Parameters:
+        - result_id (str): The ID of the simulation result of the job.
+        - payload (dict): Everything needed to run the job.
+        - priority (int): Jobs with higher priority are leased first.
+
+        Returns:
+        - ObjectId: The ID of the job.
+        """
+        job = {
+            "result_id": str(result_id),
+            "payload": payload,
+            "priority": priority,
+            "status": "queued",
+            "attempts": 0,
+            "created_at": self.clock(),
+            "lease_owner": None,
+            "lease_expires_at": None,
+            "heartbeat_at": None,
+        }
+        return self.collection.insert_one(job).inserted_id
+
+    def lease(self, owner: str):
+        """
+        Leases the next queued job.
+
+        Parameters:
+        - owner (str): The identity of the leasing worker.
+
+        Returns:
+        - dict: The leased job or None if the queue is empty.
+        """
+        now = self.clock()
+        return self.collection.find_one_and_update(
+            {"status": "queued"},
+            {"$set": {"status": "leased",
+                      "lease_owner": owner,
+                      "lease_expires_at": self._expiry(now),
+                      "heartbeat_at": now},
+             "$inc": {"attempts": 1}},
+            sort=[("priority", -1), ("created_at", 1)],
+            return_document=ReturnDocument.AFTER)
+
+    def heartbeat(self, job_id, owner: str):
+        """
+        Extends the lease of a running job.
+
+        Parameters:
+        - job_id (ObjectId): The ID of the job.
+        - owner (str): The identity of the worker holding the lease.
+
+        Returns:
+        - bool: False if the lease has been lost (expired and requeued).
+        """
+        now = self.clock()
+        updated = self.collection.update_one(
+            {"_id": job_id, "status": "leased", "lease_owner": owner},
+            {"$set": {"lease_expires_at": self._expiry(now),
+                      "heartbeat_at": now}})
+        return updated.matched_count == 1
+
+    def complete(self, job_id, owner: str):
+        """
+        Marks a leased job as done.
+
+        Returns:
+        - bool: False if the lease has been lost.
+        """
+        return self._finish(job_id, owner, {"status": "done"})
+
+    def fail(self, job_id, owner: str, error: str, status: str = "failed"):
+        """
+        Marks a leased job as failed, or as cancelled, timed out or killed
+        if another status is given.
+
+        Returns:
+        - bool: False if the lease has been lost.
+        """
+        return self._finish(job_id, owner, {"status": status,
+                                            "error": error})
+
+    def request_cancel(self, result_id: str, force: bool = False):
+        """
+        Cancels the job of a simulation result. Queued jobs are cancelled
+        right away, leased jobs are flagged such that the worker holding
+        the lease stops them (see cancel_requests).
+
+        Parameters:
+        - result_id (str): The ID of the simulation result.
+        - force (bool): Whether the worker should kill the run instead of
+          waiting for it to stop.
+
+        Returns:
+        - dict: The job after the update, None if the result has no
+          queued or leased job.
+        """
+        job = self.collection.find_one_and_update(
+            {"result_id": str(result_id), "status": "queued"},
+            {"$set": {"status": "cancelled",
+                      "error": "Simulation was cancelled.",
+                      "finished_at": self.clock()}},
+            return_document=ReturnDocument.AFTER)
+        if job is not None:
+            return job
+        return self.collection.find_one_and_update(
+            {"result_id": str(result_id), "status": "leased"},
+            {"$set": {"cancel": "force" if force else "cooperative"}},
+            return_document=ReturnDocument.AFTER)
+
+    def cancel_requests(self, owner: str):
+        """
+        Returns the jobs of a worker that should be cancelled.
+
+        Parameters:
+        - owner (str): The identity of the worker.
+
+        Returns:
+        - dict: The job IDs mapped to True if the run should be killed.
+        """
+        jobs = self.collection.find(
+            {"status": "leased", "lease_owner": owner,
+             "cancel": {"$exists": True}},
+            {"cancel": 1})
+        return {job["_id"]: job["cancel"] == "force" for job in jobs}
+
+    def requeue_expired(self):
+        """
+        Puts jobs whose lease expired back into the queue. Jobs that have
+        already been attempted max_attempts times are failed instead.
+
+        Returns:
+        - list: The jobs that have been failed.
+        """
+        now = self.clock()
+        expired = {"status": "leased", "lease_expires_at": {"$lt": now}}
+
+        failed = list(self.collection.find(
+            dict(expired, attempts={"$gte": self.max_attempts}),
+            {"result_id": 1}))
+        if failed:
+            self.collection.update_many(
+                {"_id": {"$in": [job["_id"] for job in failed]}},
+                {"$set": {"status": "failed",
+                          "error": "Lease expired too often.",
+                          "finished_at": now}})
+
+        self.collection.update_many(
+            dict(expired, attempts={"$lt": self.max_attempts}),
+            {"$set": {"status": "queued",
+                      "lease_owner": None,
+                      "lease_expires_at": None}})
+        return failed
+
+    def queue_position(self, job_id):
+        """
+        Returns the position of a queued job, 1 being the next job.
+
+        Parameters:
+        - job_id (ObjectId): The ID of the job.
+
+        Returns:
+        - int: The position, 0 if the job is not queued (anymore).
+        """
+        job = self.collection.find_one({"_id": job_id, "status": "queued"})
+        if job is None:
+            return 0
+        ahead = self.collection.count_documents({
+            "status": "queued",
+            "$or": [{"priority": {"$gt": job["priority"]}},
+                    {"priority": job["priority"],
+                     "created_at": {"$lt": job["created_at"]}},
+                    {"priority": job["priority"],
+                     "created_at": job["created_at"],
+                     "_id": {"$lt": job["_id"]}}]})
+        return ahead + 1
+
+    def count(self, status: str, min_priority: int = None):
+        """
+        Returns the number of jobs with the given status, optionally only
+        those with at least the given priority.
+        """
+        query = {"status": status}
+        if min_priority is not None:
+            query["priority"] = {"$gte": min_priority}
+        return self.collection.count_documents(query)
+
+    def active_result_ids(self):
+        """
+        Returns the result IDs of all queued and leased jobs.
+        """
+        return set(self.collection.distinct(
+            "result_id", {"status": {"$in": ["queued", "leased"]}}))
+
+    def _finish(self, job_id, owner: str, update: dict):
+        update = dict(update, finished_at=self.clock(),
+                      lease_expires_at=None)
+        updated = self.collection.update_one(
+            {"_id": job_id, "status": "leased", "lease_owner": owner},
+            {"$set": update})
+        return updated.matched_count == 1
+
+    def _expiry(self, now: datetime):
+        return now + timedelta(seconds=self.lease_seconds)
+
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+
+
+class ProgressBroker:
+    """
+    Forwards progress events of running simulations to subscribers in the
+    API process, without going through the database. Events are published
+    from any thread and delivered on the event loop of the subscribers.
+
+    Subscribers that do not keep up lose their oldest events, since every
+    progress event describes the full state of the run.
+    """
+
+    def __init__(self, max_pending: int = 16):
+        self.max_pending = max_pending
+        self._subscribers = {}
+        self._latest = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, result_id: str):
+        """
+        Registers a subscriber for the events of a simulation result. Must
+        be called on the event loop that consumes the events.
+
+        Parameters:
+        - result_id (str): The ID of the simulation result.
+
+        Returns:
+        - asyncio.Queue: The queue the events are put into.
+        """
+        queue = asyncio.Queue(maxsize=self.max_pending)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._subscribers.setdefault(result_id, []).append((loop, queue))
+        return queue
+
+    def unsubscribe(self, result_id: str, queue: asyncio.Queue):
+        """
+        Removes a subscriber registered with subscribe.
+        """
+        with self._lock:
+            subscribers = [subscriber for subscriber
+                           in self._subscribers.get(result_id, [])
+                           if subscriber[1] is not queue]
+            if subscribers:
+                self._subscribers[result_id] = subscribers
+            else:
+                self._subscribers.pop(result_id, None)
+
+    def publish(self, result_id: str, event: dict):
+        """
+        Sends an event to all subscribers of a simulation result. The last
+        progress event is kept for subscribers that join later, a status
+        event ends the run and discards it.
+
+        Parameters:
+        - result_id (str): The ID of the simulation result.
+        - event (dict): The event, with its type in "event".
+        """
+        with self._lock:
+            if event["event"] == "status":
+                self._latest.pop(result_id, None)
+            elif event["event"] == "progress":
+                self._latest[result_id] = event
+            subscribers = list(self._subscribers.get(result_id, []))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_put_latest, queue, event)
+            except RuntimeError:
+                # the loop of the subscriber is closed
+                pass
+
+    def latest(self, result_id: str):
+        """
+        Returns the last progress event of a running simulation result, or
+        None if the result is not running in this process.
+        """
+        with self._lock:
+            return self._latest.get(result_id)
+
+
+def _put_latest(queue: asyncio.Queue, event: dict):
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
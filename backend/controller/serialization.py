@@ -0,0 +1,164 @@
+from datetime import date, datetime
+import json
+import numpy as np
+from bson import ObjectId
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - the json module is used instead
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - MessagePack is not offered then
+    msgpack = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # pragma: no cover - Arrow is not offered then
+    pyarrow = None
+
+# media types of the response formats
+MEDIA_TYPES = {"json": "application/json",
+               "msgpack": "application/msgpack",
+               "arrow": "application/vnd.apache.arrow.stream"}
+
+# media types clients commonly send for MessagePack
+MEDIA_TYPE_ALIASES = {"application/x-msgpack": "msgpack",
+                      "application/vnd.msgpack": "msgpack"}
+
+
+def available_formats(tabular: bool = False):
+    """
+    Returns the formats a response can be sent in, preferred first.
+
+    Parameters:
+    - tabular (bool): Whether the response is a table of columns, which
+      is the only content that can be sent as Arrow.
+    """
+    formats = ["json"]
+    if msgpack is not None:
+        formats.append("msgpack")
+    if tabular and pyarrow is not None:
+        formats.append("arrow")
+    return formats
+
+
+def negotiate_format(accept: str, tabular: bool = False):
+    """
+    Selects the format of a response from the Accept header of the
+    request. JSON is sent unless the client prefers an available binary
+    format, also if it accepts none of the available formats.
+
+    Parameters:
+    - accept (str): e.g. "application/msgpack, application/json;q=0.5".
+    - tabular (bool): Whether the response can be sent as Arrow.
+
+    Returns:
+    - str: A key of MEDIA_TYPES.
+    """
+    formats = {media_type: name for name, media_type in MEDIA_TYPES.items()}
+    formats.update(MEDIA_TYPE_ALIASES)
+    available = available_formats(tabular)
+
+    best, best_weight = "json", 0.0
+    for entry in (accept or "").split(","):
+        media_type, _, parameters = entry.strip().partition(";")
+        name = formats.get(media_type.strip().lower())
+        if name not in available:
+            continue
+        weight = 1.0
+        parameter = parameters.strip()
+        if parameter.startswith("q="):
+            try:
+                weight = float(parameter[2:])
+            except ValueError:
+                weight = 0.0
+        if weight > best_weight:
+            best, best_weight = name, weight
+    return best
+
+
+def _default(value):
+    """
+    Converts the values that neither JSON nor MessagePack support.
+    """
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    raise TypeError(f"Type is not serializable: {type(value).__name__}")
+
+
+def dumps_json(content):
+    """
+    Serializes content to JSON with orjson, or with the json module if
+    orjson is not installed. Unlike FastAPI's jsonable_encoder, orjson
+    does not copy the content first and serializes numpy arrays directly.
+    orjson serializes NaN and infinity as null, the json module rejects
+    them.
+
+    Parameters:
+    - content: The documents, as read from the database.
+
+    Returns:
+    - bytes: The UTF-8 encoded JSON.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY
+                            | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False,
+                      separators=(",", ":"),
+                      allow_nan=False).encode("utf-8")
+
+
+def dumps(content, media_format: str = "json"):
+    """
+    Serializes content to JSON or MessagePack.
+
+    Parameters:
+    - content: The documents, as read from the database.
+    - media_format (str): "json" or "msgpack".
+
+    Returns:
+    - bytes: The serialized content.
+    """
+    if media_format == "msgpack":
+        return msgpack.packb(content, default=_default)
+    return dumps_json(content)
+
+
+def dumps_table(columns: dict, media_format: str = "json",
+                metadata: dict = None):
+    """
+    Serializes a table of equally long columns. As Arrow, the numpy
+    columns are written without conversion to Python values.
+
+    Parameters:
+    - columns (dict): The columns by name, numpy arrays or lists.
+    - media_format (str): A key of MEDIA_TYPES.
+    - metadata (dict, optional): Further values of the response, sent as
+      schema metadata in Arrow and next to "columns" otherwise.
+
+    Returns:
+    - bytes: The serialized table.
+    """
+    if media_format != "arrow":
+        return dumps(dict(metadata or {}, columns=columns), media_format)
+
+    table = pyarrow.table(
+        {name: pyarrow.array(values) for name, values in columns.items()},
+        metadata={key: json.dumps(value, default=_default)
+                  for key, value in (metadata or {}).items()})
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
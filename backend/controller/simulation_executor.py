@@ -1,32 +1,137 @@
-from flee_adapter.adapter import Adapter
+from concurrent.futures import ThreadPoolExecutor
 from controller.handler.filesystem_handler import FileSystemHandler
+from controller.content_hash import content_hash
+from controller import ensemble
+from controller import sweep
+from controller.job_queue import JobQueue
+from controller.progress_broker import ProgressBroker
+from controller.simulation_worker import SimulationProcess
+from bson import ObjectId
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# The paths of the input files of a run in the files input mode.
+INPUT_PATHS = ("simsettings_filename", "simulation_dir", "validation_dir")
+# The number of attempts to stage the input files of a run, see
+# SimulationExecutor._stage_input.
+STAGE_ATTEMPTS = 3
 
 
 class SimulationExecutor:
     """
     The SimulationExecutor class is responsible for initializing and running
     simulations. It interacts with the FleeAdapter to execute the simulations.
+
+    Submitted simulations are stored as jobs in the simulation_jobs
+    collection (see JobQueue), such that they survive restarts of the API.
+    A dispatcher thread leases jobs and runs each in its own worker
+    process, at most SIMULATION_WORKERS (default: number of CPUs) at once.
+    A heartbeat thread keeps the leases of running jobs alive. At most
+    SIMULATION_QUEUE_SIZE jobs wait for a worker, more are rejected.
+
+    A supervisor thread stops runs that are cancelled, run longer than
+    SIMULATION_TIMEOUT_SECONDS or use more memory (RSS) than
+    SIMULATION_MAX_RSS_MB (both unlimited if 0). Cancelled runs get
+    SIMULATION_CANCEL_GRACE_SECONDS (default 10) to stop by themselves
+    before they are killed.
+
+    The progress of local runs is published to the progress broker. Their
+    rows are stored every RESULT_CHUNK_DAYS (default 10) days while they
+    run, the result is built from the stored rows when they finish.
+
+    With SIMULATION_INPUT_MODE "memory" (default), the input files are
+    rendered from the stored documents when a run starts and written to
+    its scratch directory only. With "files", they are written to the
+    input cache of flee_stored_files when the simulation is submitted,
+    see InputCache.
+
+    Every run works in its own scratch directory below
+    SIMULATION_SCRATCH_DIR (default: the temporary directory, a tmpfs
+    such as /dev/shm keeps the files in memory), which is removed when
+    the run ends. In the files input mode, its input files are copied
+    there from the input cache.
+
+    The replicates of every combination of a sweep form an ensemble. Each
+    replicate is folded into the statistics of its ensemble as soon as it
+    finishes, see ensemble.EnsembleAccumulator.
     """
 
     def __init__(self, database_handler):
         self.database_handler = database_handler
-        self.flee_adapter = Adapter()
         self.file_system_handler = FileSystemHandler()
+        self.progress = ProgressBroker()
+        self.max_workers = int(os.getenv("SIMULATION_WORKERS",
+                                         str(os.cpu_count() or 1)))
+        self.max_queued = int(os.getenv("SIMULATION_QUEUE_SIZE", "10"))
+        self.max_sweep_runs = int(os.getenv("SWEEP_MAX_RUNS", "100"))
+        self.lease_seconds = float(os.getenv("SIMULATION_LEASE_SECONDS",
+                                             "60"))
+        self.max_attempts = int(os.getenv("SIMULATION_MAX_ATTEMPTS", "3"))
+        self.timeout_seconds = float(os.getenv("SIMULATION_TIMEOUT_SECONDS",
+                                               "0"))
+        self.max_rss = int(os.getenv("SIMULATION_MAX_RSS_MB", "0")) * 2**20
+        self.cancel_grace_seconds = float(
+            os.getenv("SIMULATION_CANCEL_GRACE_SECONDS", "10"))
+        self.chunk_days = int(os.getenv("RESULT_CHUNK_DAYS", "10"))
+        self.input_mode = os.getenv("SIMULATION_INPUT_MODE", "memory")
+        self.poll_seconds = 2
+        self.supervise_seconds = 0.2
+        self.worker_id = \
+            f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._job_queue = None
+        # spawn instead of fork: the API process holds threads and
+        # database connections that must not be copied into workers
+        self._context = multiprocessing.get_context("spawn")
+        self._store_pool = ThreadPoolExecutor(max_workers=2)
+        # partial results are stored in order, one chunk at a time
+        self._chunk_pool = ThreadPoolExecutor(max_workers=1)
+        self._loop = None
+        # job ID -> {"job", "process", "cancel_at", "force", "chunks",
+        # "last_chunk", "workspace"}
+        self._running = {}
+        self._running_lock = threading.Lock()
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        # one lock per input hash, such that identical submissions arriving
+        # at the same time are coalesced onto one run
+        self._hash_locks = {}
 
     async def initialize_simulation(
             self,
-            simulation_config):
+            simulation_config,
+            admit: bool = False):
         """
         Initializes a simulation by storing the input directory, simsettings,
         validation directory to the filesystem, and returns the object ID,
         simsettings filename, simulation directory, and validation directory.
 
+        If a run with identical input and simsettings content (see
+        content_hash) already finished or is still running, its result is
+        copied under the IDs and name of this run instead and nothing is
+        prepared ("cached" is True).
+
         Parameters:
         simulation_config (JSONStructure, optional) containing:
         - input_id (str): The ID of the simulation input.
         - input_name (str): The name of the simulation input.
         - simsettings_id (str): The ID of the simulation settings.
         - simsettings_name (str): The name of the simulation settings.
+        - seed (int, optional): The random seed of the run.
+        admit (bool): Whether a new run has to be admitted by
+        check_capacity first. Cached runs are always admitted.
 
         Returns:
             dict: A dictionary containing the name of the result,
@@ -40,21 +145,86 @@ class SimulationExecutor:
             simulation_config["input"]["input_name"] + "(" + \
             simulation_config["settings"]["simsettings_name"] + ")"
 
-        objectid = await self.database_handler.store_dummy_simulation(
-            simulation_id,
-            simsettings_id,
-            name)
-
         simsetting = await self.database_handler.get("simsettings",
                                                      simsettings_id)
+        simulation = await self.database_handler.get("simulations",
+                                                     simulation_id)
+        seed = simulation_config.get("seed")
+        if seed is None:
+            input_hash = content_hash(simulation, simsetting)
+        else:
+            input_hash = content_hash(simulation, simsetting, {"seed": seed})
+
+        entry = self._hash_locks.setdefault(input_hash,
+                                            {"lock": asyncio.Lock(),
+                                             "waiting": 0})
+        entry["waiting"] += 1
+        try:
+            async with entry["lock"]:
+                existing = await self.database_handler.find_result_by_hash(
+                    input_hash)
+                if existing is not None:
+                    objectid = await self.database_handler.copy_result(
+                        existing["_id"],
+                        simulation_id,
+                        simsettings_id,
+                        name,
+                        input_hash)
+                else:
+                    if admit:
+                        await self.check_capacity()
+                    objectid = \
+                        await self.database_handler.store_dummy_simulation(
+                            simulation_id,
+                            simsettings_id,
+                            name,
+                            input_hash)
+        finally:
+            entry["waiting"] -= 1
+            if entry["waiting"] == 0:
+                del self._hash_locks[input_hash]
+
+        if existing is not None:
+            return {"name": name,
+                    "simulation_id": simulation_id,
+                    "simsettings_id": simsettings_id,
+                    "objectid": objectid,
+                    "status": existing["status"],
+                    "cached": True}
+
+        paths = await self.materialize(simulation, simsetting)
+
+        return {"name": name,
+                "simulation_id": simulation_id,
+                "simsettings_id": simsettings_id,
+                "objectid": objectid,
+                "cached": False,
+                "seed": seed,
+                **paths}
+
+    async def materialize(self, simulation: dict, simsetting: dict):
+        """
+        Stores the input directory, simsettings and validation directory
+        of a simulation to the filesystem. In the memory input mode nothing
+        is stored, the files are written into the scratch directory of the
+        run when it starts (see FileSystemHandler.write_input_files).
+
+        Parameters:
+        - simulation (dict): The simulation input.
+        - simsetting (dict): The simulation settings.
+
+        Returns:
+        - dict: The simsettings filename, simulation directory and
+          validation directory, empty in the memory input mode.
+        """
+        if self.input_mode == "memory":
+            return {}
+
         simsettings_filename = \
             await self.file_system_handler.store_simsettings_to_filesystem(
                 simsetting
                 )
 
-        simulation = await self.database_handler.get("simulations",
-                                                     simulation_id)
-
         simulation_dir = \
             await self.file_system_handler.store_simulation_to_filesystem(
                 simulation
@@ -63,43 +233,805 @@ class SimulationExecutor:
         validation_dir = \
             await self.file_system_handler.store_validation_to_filesystem()
 
-        return {"name": name,
-                "simulation_id": simulation_id,
-                "simsettings_id": simsettings_id,
-                "objectid": objectid,
-                "simsettings_filename": simsettings_filename,
+        return {"simsettings_filename": simsettings_filename,
                 "simulation_dir": simulation_dir,
                 "validation_dir": validation_dir}
 
-    def run_simulation(
-            self,
-            name: str,
-            simulation_id: str,
-            simsettings_id: str,
-            object_id: str,
-            simsettings_filename: str,
-            simulation_dir: str,
-            validation_dir: str):
-
-        """
-        Runs a simulation with custom simsettings and input stored in the
-        database using the provided simsettings_id and simulation_id.
-        Stores the simulation results in the database associated with the
-        simsettings_id and the simulation_id.
-
-        :param simulation_id: String of location name e.g. 'burundi'
-        :param simsettings_id: Simulation Settings ID in DB
-        :return: Returns simulation results
-        """
-
-        sim = self.flee_adapter.run_simulation_config(
-            simulation_dir,
-            simsettings_filename,
-            validation_dir)
-
-        self.database_handler.store_simulation(
-            sim,
-            object_id=object_id,
-            simulation_id=simulation_id,
-            simsettings_id=simsettings_id,
-            name=name)
+    async def check_capacity(self):
+        """
+        Admits a new simulation if the queue is not full. Called by
+        initialize_simulation before a new run is prepared.
+
+        Raises:
+            QueueFullError: If SIMULATION_QUEUE_SIZE single runs are
+            waiting.
+        """
+        # sweeps (negative priority) do not take the place of single runs
+        queued = await asyncio.to_thread(self._get_job_queue().count,
+                                         "queued",
+                                         0)
+        if queued >= self.max_queued:
+            raise QueueFullError(queued + 1, self.max_queued)
+
+    async def queue_status(self):
+        """
+        Returns the utilization of the simulation queue.
+
+        Returns:
+            dict: Number of local workers, running (leased) and queued
+            jobs of all API instances and the maximum queue length.
+        """
+        queue = self._get_job_queue()
+        running = await asyncio.to_thread(queue.count, "leased")
+        queued = await asyncio.to_thread(queue.count, "queued")
+        return {"workers": self.max_workers,
+                "running": running,
+                "queued": queued,
+                "max_queued": self.max_queued}
+
+    async def submit(self, data: dict, priority: int = 0):
+        """
+        Adds an initialized simulation to the job queue. It is run as soon
+        as a worker is free and its result is stored once it is finished.
+
+        Parameters:
+            data (dict): The simulation as returned by initialize_simulation.
+            priority (int): Jobs with higher priority are run first.
+
+        Returns:
+            int: The queue position of the simulation.
+        """
+        self.start()
+        payload = {"objectid": str(data["objectid"]),
+                   "name": data["name"],
+                   "simulation_id": data["simulation_id"],
+                   "simsettings_id": data["simsettings_id"],
+                   "seed": data.get("seed")}
+        payload.update((path, str(data[path])) for path in INPUT_PATHS
+                       if path in data)
+        queue = self._get_job_queue()
+        job_id = await asyncio.to_thread(queue.enqueue,
+                                         payload["objectid"],
+                                         payload,
+                                         priority)
+        self._wake.set()
+        return await asyncio.to_thread(queue.queue_position, job_id)
+
+    async def submit_sweep(self, sweep_config):
+        """
+        Runs a parameter sweep: the base simsettings are varied over the
+        grid of all parameter values, and every combination is run
+        replicates times with different random seeds. Every run gets its
+        own simsettings (hidden from the simsettings lists) and job; the
+        jobs have a lower priority than single runs. Runs identical to
+        earlier ones reuse their results.
+
+        Parameters:
+        sweep_config (JSONStructure) containing:
+        - input (dict): input_id and input_name, as for single runs.
+        - settings (dict): simsettings_id and simsettings_name of the base
+          simsettings.
+        - parameters (dict): Parameter names (e.g. "conflict_weight" or
+          "move_rules.camp_weight") mapped to a list of values or to
+          {start, stop, step}.
+        - replicates (int, optional): The runs per combination.
+        - seed (int, optional): The seed of the first replicate.
+
+        Returns:
+            dict: The ID of the sweep, the number of runs and of reused
+            results.
+
+        Raises:
+            ValueError: If the sweep is invalid or has more than
+            SWEEP_MAX_RUNS runs.
+        """
+        runs = sweep.expand_sweep(sweep_config.get("parameters") or {},
+                                  sweep_config.get("replicates", 1),
+                                  sweep_config.get("seed", 0))
+        if len(runs) > self.max_sweep_runs:
+            raise ValueError(f"The sweep has {len(runs)} runs, at most "
+                             f"{self.max_sweep_runs} are allowed.")
+
+        base_id = sweep_config["settings"]["simsettings_id"]
+        base_name = sweep_config["settings"]["simsettings_name"]
+        base = await self.database_handler.get("simsettings", base_id)
+        if base is None:
+            raise ValueError("Simulation settings not found.")
+
+        sweep_id = ObjectId()
+        variants = []
+        for run in runs:
+            variant = sweep.apply_values(base, run["values"])
+            del variant["_id"]
+            variant["name"] = sweep.variant_name(base_name, run["values"],
+                                                 run["seed"])
+            variant["sweep_id"] = str(sweep_id)
+            variants.append(variant)
+        variant_ids = await self.database_handler.insert_many("simsettings",
+                                                             variants)
+
+        for run, variant, variant_id in zip(runs, variants, variant_ids):
+            data = await self.initialize_simulation({
+                "input": sweep_config["input"],
+                "settings": {"simsettings_id": variant_id,
+                             "simsettings_name": variant["name"]},
+                "seed": run["seed"]})
+            if not data["cached"]:
+                await self.submit(data, priority=-1)
+            # parameter names may contain dots, which are no valid keys
+            run.update(values=[{"name": name, "value": value}
+                               for name, value in run["values"].items()],
+                       simsettings_id=variant_id,
+                       result_id=str(data["objectid"]),
+                       cached=data["cached"])
+
+        name = sweep_config["input"]["input_name"] + "(" + base_name + ")"
+        parameters = [{"name": parameter, "range": spec} for parameter, spec
+                      in (sweep_config.get("parameters") or {}).items()]
+        await self.database_handler.insert_many("simulation_sweeps", [{
+            "_id": sweep_id,
+            "name": name,
+            "simulation_id": sweep_config["input"]["input_id"],
+            "simsettings_id": base_id,
+            "parameters": parameters,
+            "replicates": sweep_config.get("replicates", 1),
+            "created_at": datetime.utcnow(),
+            "runs": runs}])
+        await self._create_ensembles(sweep_id, runs)
+        return {"sweep_id": str(sweep_id),
+                "runs": len(runs),
+                "cached": sum(run["cached"] for run in runs)}
+
+    async def sweep_status(self, sweep_id: str):
+        """
+        Returns a sweep with the status of its runs and its aggregate
+        progress: the share of finished runs, where runs of this API
+        instance count with the share of their simulated days.
+
+        Parameters:
+        - sweep_id (str): The ID of the sweep.
+
+        Returns:
+            dict: The sweep, None if it does not exist.
+        """
+        document = await self.database_handler.get("simulation_sweeps",
+                                                   sweep_id)
+        if document is None:
+            return None
+
+        result_ids = [ObjectId(run["result_id"]) for run in document["runs"]]
+        results = await self.database_handler.get_all(
+            "simulations_results",
+            {"_id": {"$in": result_ids}},
+            ["status"])
+        statuses = {result["_id"]: result["status"] for result in results}
+
+        finished = 0.0
+        for run in document["runs"]:
+            run["status"] = statuses.get(run["result_id"], "deleted")
+            if run["status"] != "running":
+                finished += 1
+                continue
+            progress = self.progress.latest(run["result_id"])
+            if progress is not None and progress["total_days"]:
+                finished += progress["day"] / progress["total_days"]
+
+        counts = Counter(run["status"] for run in document["runs"])
+        document["counts"] = dict(counts)
+        document["status"] = "running" if counts["running"] else "done"
+        document["progress"] = finished / max(len(document["runs"]), 1)
+        return document
+
+    async def _create_ensembles(self, sweep_id: ObjectId, runs: list):
+        """
+        Creates an ensemble for every parameter combination of a sweep with
+        more than one replicate. Results reused from earlier runs are
+        folded in right away, the others when they finish.
+        """
+        combinations = {}
+        for run in runs:
+            key = repr(run["values"])
+            combinations.setdefault(key, {"values": run["values"],
+                                          "result_ids": []})
+            combinations[key]["result_ids"].append(run["result_id"])
+
+        ensembles = [dict(combination,
+                          sweep_id=str(sweep_id),
+                          folded=[],
+                          skipped=[],
+                          count=0,
+                          version=0,
+                          status="running",
+                          created_at=datetime.utcnow())
+                     for combination in combinations.values()
+                     if len(combination["result_ids"]) > 1]
+        if not ensembles:
+            return
+        await self.database_handler.insert_many("simulation_ensembles",
+                                                ensembles)
+        for run in runs:
+            if run["cached"]:
+                self._store_pool.submit(self._fold_stored_result,
+                                        run["result_id"])
+
+    async def ensemble_statistics(self,
+                                  ensemble_id: str,
+                                  names: list = None):
+        """
+        Returns an ensemble with the statistics of its replicates so far.
+
+        Parameters:
+        - ensemble_id (str): The ID of the ensemble.
+        - names (list, optional): The statistics columns to return, all if
+          None.
+
+        Returns:
+        - dict: The ensemble with "length" (days) and "columns", see
+          ensemble.EnsembleAccumulator.statistics. None if the ensemble
+          does not exist.
+
+        Raises:
+        - KeyError: If one of the requested columns does not exist.
+        """
+        document, state = \
+            await self.database_handler.get_ensemble_state(ensemble_id)
+        if document is None:
+            return None
+
+        def statistics():
+            if state is None:
+                return {}
+            return ensemble.EnsembleAccumulator.from_bytes(
+                state).statistics()
+
+        columns = await asyncio.to_thread(statistics)
+        if names is not None:
+            unknown = [name for name in names if name not in columns]
+            if unknown:
+                raise KeyError(", ".join(unknown))
+            columns = {name: columns[name] for name in names}
+        document["_id"] = str(document["_id"])
+        document.pop("state_id", None)
+        document["length"] = len(next(iter(columns.values()), []))
+        document["columns"] = columns
+        return document
+
+    def start(self):
+        """
+        Starts the dispatcher and heartbeat threads, if not yet running.
+        Must be called from the event loop of the API, which is used to
+        prepare the input files of jobs that are resumed.
+        """
+        with self._start_lock:
+            if self._threads:
+                return
+            self._loop = asyncio.get_running_loop()
+            self._stopping.clear()
+            self._threads = [
+                threading.Thread(target=self._dispatch_loop,
+                                 name="simulation-dispatcher",
+                                 daemon=True),
+                threading.Thread(target=self._heartbeat_loop,
+                                 name="simulation-heartbeat",
+                                 daemon=True),
+                threading.Thread(target=self._supervise_loop,
+                                 name="simulation-supervisor",
+                                 daemon=True),
+                threading.Thread(target=self._maintain_database,
+                                 name="simulation-maintenance",
+                                 daemon=True)]
+            for thread in self._threads:
+                thread.start()
+
+    async def cancel(self, result_id: str, force: bool = False):
+        """
+        Cancels the simulation of a result. Queued simulations are removed
+        from the queue, running ones are stopped by the API instance that
+        runs them, after the current simulated day or, if force is set,
+        immediately.
+
+        Parameters:
+        - result_id (str): The ID of the simulation result.
+        - force (bool): Whether to kill the run without waiting for it.
+
+        Returns:
+        - str: "cancelled" if the simulation was queued, "cancelling" if
+          it is running, None if it is neither.
+        """
+        job = await asyncio.to_thread(self._get_job_queue().request_cancel,
+                                      result_id,
+                                      force)
+        if job is None:
+            return None
+        if job["status"] == "cancelled":
+            await asyncio.to_thread(self.database_handler.fail_simulations,
+                                    [result_id],
+                                    job["error"],
+                                    "cancelled")
+            self.progress.publish(result_id, {"event": "status",
+                                              "status": "cancelled"})
+            return "cancelled"
+        # runs of other API instances are cancelled by their supervisor
+        self._request_cancel(job["_id"], force)
+        return "cancelling"
+
+    def runs_locally(self, result_id: str):
+        """
+        Returns whether the simulation of a result runs in this API
+        instance, such that its progress is published here.
+        """
+        with self._running_lock:
+            return any(run["job"]["result_id"] == result_id
+                       for run in self._running.values())
+
+    def reconcile(self):
+        """
+        Recovers the job queue at startup of the dispatcher: jobs whose lease
+        expired (their API instance crashed or was restarted) are queued
+        again and resumed by the dispatcher, jobs that failed too often and
+        running results without a job (e.g. started before the job queue
+        existed) are marked as failed.
+
+        Returns:
+            dict: The IDs of the results that have been failed.
+        """
+        queue = self._get_job_queue()
+        failed = [job["result_id"] for job in queue.requeue_expired()]
+        # results created just now may not have their job yet
+        created_before = datetime.utcnow() - \
+            timedelta(seconds=self.lease_seconds)
+        active = queue.active_result_ids()
+        orphaned = [result_id for result_id in
+                    self.database_handler.get_running_result_ids(
+                        created_before)
+                    if result_id not in active]
+        self.database_handler.fail_simulations(failed + orphaned,
+                                               "Simulation was interrupted.")
+        return {"failed": failed, "orphaned": orphaned}
+
+    def shutdown(self):
+        """
+        Stops the dispatcher and the worker processes. Called at shutdown
+        of the API. Leases of running jobs are not given back, the jobs are
+        resumed once their lease expired.
+        """
+        self._stopping.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout=self.poll_seconds)
+        self._threads = []
+        with self._running_lock:
+            runs = list(self._running.values())
+        for run in runs:
+            if run["process"] is not None:
+                run["process"].kill()
+            if run["workspace"] is not None:
+                self.file_system_handler.remove_workspace(run["workspace"])
+        self._store_pool.shutdown(wait=False)
+        self._chunk_pool.shutdown(wait=False)
+
+    def _get_job_queue(self):
+        db = self.database_handler.get_db()
+        # the database client is rebuilt when the credentials are rotated
+        if self._job_queue is None or \
+                self._job_queue.collection.database is not db:
+            self._job_queue = JobQueue(
+                db["simulation_jobs"],
+                lease_seconds=self.lease_seconds,
+                max_attempts=self.max_attempts)
+        return self._job_queue
+
+    def _dispatch_loop(self):
+        """
+        Reconciles the queue once, then leases jobs while workers are free
+        and requeues expired leases of other API instances every half lease
+        period.
+        """
+        reconciled = False
+        next_sweep = 0
+        while not self._stopping.is_set():
+            self._wake.clear()
+            try:
+                queue = self._get_job_queue()
+                if not reconciled:
+                    self.reconcile()
+                    self.file_system_handler.remove_stale_workspaces()
+                    reconciled = True
+                    next_sweep = time.monotonic() + self.lease_seconds / 2
+                elif time.monotonic() >= next_sweep:
+                    next_sweep = time.monotonic() + self.lease_seconds / 2
+                    failed = queue.requeue_expired()
+                    self.database_handler.fail_simulations(
+                        [job["result_id"] for job in failed],
+                        "Simulation was interrupted.")
+                with self._running_lock:
+                    free = len(self._running) < self.max_workers
+                if free:
+                    job = queue.lease(self.worker_id)
+                    if job is not None:
+                        self._run_job(job)
+                        continue
+            except Exception:
+                logger.exception("Simulation dispatcher failed.")
+            self._wake.wait(self.poll_seconds)
+
+    def _maintain_database(self):
+        """
+        Creates missing indexes (see DatabaseHandler.ensure_indexes) and
+        migrates the stored conflicts (see
+        DatabaseHandler.migrate_conflict_intervals) once at startup. Runs
+        in its own thread, such that slow or failing steps never hold up
+        the leasing of jobs. Each step is run even if the other failed.
+        """
+        try:
+            created = self.database_handler.ensure_indexes()
+            if created:
+                logger.info("Created the indexes %s.", ", ".join(created))
+        except Exception:
+            logger.exception("Creating the indexes failed.")
+        try:
+            migrated = self.database_handler.migrate_conflict_intervals()
+        except Exception:
+            logger.exception("Migrating the stored conflicts failed.")
+            return
+        if migrated:
+            logger.info("Stored the conflicts of %d simulation inputs as "
+                        "intervals.", migrated)
+
+    def _heartbeat_loop(self):
+        """
+        Extends the leases of the running jobs every third lease period.
+        """
+        while not self._stopping.wait(self.lease_seconds / 3):
+            with self._running_lock:
+                job_ids = list(self._running)
+            for job_id in job_ids:
+                try:
+                    self._get_job_queue().heartbeat(job_id, self.worker_id)
+                except Exception:
+                    logger.exception("Simulation heartbeat of job %s "
+                                     "failed.", job_id)
+
+    def _run_job(self, job: dict):
+        """
+        Starts a worker process for a leased job.
+        """
+        run = {"job": job, "process": None, "cancel_at": None, "force": False,
+               "chunks": 0, "last_chunk": None, "workspace": None}
+        with self._running_lock:
+            self._running[job["_id"]] = run
+        try:
+            run["workspace"] = self.file_system_handler.create_workspace()
+            if self.input_mode == "memory":
+                payload = self._prepare_input(job["payload"])
+                payload = dict(payload,
+                               **self.file_system_handler.write_input_files(
+                                   run["workspace"],
+                                   payload["simulation"],
+                                   payload["simsetting"]))
+            else:
+                payload = self._stage_input(job["payload"], run["workspace"])
+            run["process"] = SimulationProcess(
+                self._context,
+                payload["simulation_dir"],
+                payload["simsettings_filename"],
+                payload["validation_dir"],
+                lambda progress: self.progress.publish(
+                    job["result_id"], dict(progress, event="progress")),
+                lambda rows: self._store_rows(run, rows),
+                self.chunk_days,
+                payload.get("seed"),
+                str(run["workspace"]))
+        except Exception as e:
+            self._finish(run, {"error": "{}".format(e)})
+
+    def _prepare_input(self, payload: dict):
+        """
+        Loads the input and simsettings of a job in the memory input mode,
+        their files are rendered into the scratch directory of the run. In
+        the files mode, writes them again if they are missing, e.g.
+        because the job was submitted to an API instance that is gone.
+        """
+        # touching the directories keeps them from being evicted from the
+        # input cache and fails if they are gone
+        if self.input_mode != "memory" and \
+                all(path in payload for path in INPUT_PATHS) and \
+                all([self.file_system_handler.input_cache.touch(directory)
+                     for directory in (
+                         Path(payload["simsettings_filename"]).parent,
+                         payload["simulation_dir"],
+                         payload["validation_dir"])]):
+            return payload
+
+        async def load():
+            simulation = await self.database_handler.get(
+                "simulations", payload["simulation_id"])
+            simsetting = await self.database_handler.get(
+                "simsettings", payload["simsettings_id"])
+            if simulation is None or simsetting is None:
+                raise ValueError("The input or the simsettings of the "
+                                 "simulation no longer exist.")
+            if self.input_mode == "memory":
+                return simulation, simsetting
+            return await self.materialize(simulation, simsetting)
+
+        # the database handler is bound to the event loop of the API
+        prepared = asyncio.run_coroutine_threadsafe(load(),
+                                                    self._loop).result()
+        if self.input_mode == "memory":
+            simulation, simsetting = prepared
+            return dict(payload, simulation=simulation, simsetting=simsetting)
+        return dict(payload, **{path: str(prepared[path])
+                                for path in INPUT_PATHS})
+
+    def _stage_input(self, payload: dict, workspace: Path):
+        """
+        Copies the input files of a job from the input cache into the
+        scratch directory of its run in the files mode. The cache may
+        evict a directory while it is copied (also another API process
+        sharing the cache), the directory is then written again and the
+        copy retried.
+        """
+        for attempt in range(1, STAGE_ATTEMPTS + 1):
+            payload = self._prepare_input(payload)
+            try:
+                return dict(payload,
+                            **self.file_system_handler.stage_input_files(
+                                workspace,
+                                payload["simulation_dir"],
+                                payload["simsettings_filename"],
+                                payload["validation_dir"]))
+            except OSError:
+                if attempt == STAGE_ATTEMPTS:
+                    raise
+                logger.info("The input of result %s was evicted from "
+                            "the input cache while it was staged, writing "
+                            "it again.", payload.get("objectid"),
+                            exc_info=True)
+
+    def _supervise_loop(self):
+        """
+        Collects the results of finished runs and stops runs that are
+        cancelled or exceed their limits. Cancellation requests of other
+        API instances are read from the job queue every poll interval.
+        """
+        next_poll = 0
+        while not self._stopping.wait(self.supervise_seconds):
+            with self._running_lock:
+                runs = list(self._running.values())
+            if runs and time.monotonic() >= next_poll:
+                next_poll = time.monotonic() + self.poll_seconds
+                try:
+                    requests = self._get_job_queue().cancel_requests(
+                        self.worker_id)
+                except Exception:
+                    logger.exception("Reading the cancellation requests "
+                                     "failed.")
+                    requests = {}
+                for job_id, force in requests.items():
+                    self._request_cancel(job_id, force)
+            for run in runs:
+                if run["process"] is not None:
+                    self._supervise(run)
+
+    def _supervise(self, run: dict):
+        """
+        Checks a single run, see _supervise_loop.
+        """
+        process = run["process"]
+        result = process.outcome()
+        if result is not None:
+            cancelled = run["cancel_at"] is not None and \
+                isinstance(result, dict) and "error" in result
+            self._finish(run, result, "cancelled" if cancelled else None)
+            return
+
+        if run["cancel_at"] is not None:
+            waited = time.monotonic() - run["cancel_at"]
+            if run["force"] or waited >= self.cancel_grace_seconds:
+                process.kill()
+                self._finish(run, {"error": "Simulation was cancelled."},
+                             "cancelled")
+        elif self.timeout_seconds and \
+                process.elapsed() > self.timeout_seconds:
+            process.kill()
+            self._finish(run, {"error": "Simulation exceeded the time limit "
+                                        f"of {self.timeout_seconds:g} "
+                                        "seconds."},
+                         "timeout")
+        elif self.max_rss and (process.rss() or 0) > self.max_rss:
+            process.kill()
+            self._finish(run, {"error": "Simulation exceeded the memory "
+                                        f"limit of {self.max_rss >> 20} MB."},
+                         "killed")
+
+    def _request_cancel(self, job_id, force: bool):
+        """
+        Cancels a run of this API instance, if it is running here.
+        """
+        with self._running_lock:
+            run = self._running.get(job_id)
+        if run is None:
+            return
+        if run["cancel_at"] is None:
+            run["cancel_at"] = time.monotonic()
+            if run["process"] is not None:
+                run["process"].cancel()
+        run["force"] = run["force"] or force
+
+    def _store_rows(self, run: dict, rows: list):
+        """
+        Stores a batch of the partial result of a run in the background
+        and tells the subscribers of its progress.
+        """
+        index = run["chunks"]
+        run["chunks"] += 1
+        result_id = run["job"]["result_id"]
+
+        def store():
+            try:
+                self.database_handler.store_result_chunk(result_id, index,
+                                                         rows)
+            except Exception:
+                logger.exception("Storing a partial result of %s failed.",
+                                 result_id)
+                return
+            self.progress.publish(result_id, {"event": "rows",
+                                              "from_day": rows[0]["Day"],
+                                              "to_day": rows[-1]["Day"]})
+
+        run["last_chunk"] = self._chunk_pool.submit(store)
+
+    def _finish(self, run: dict, result, status: str = None):
+        """
+        Frees the worker of a run right away, such that the next job can
+        start, and stores its result in the background.
+        """
+        with self._running_lock:
+            self._running.pop(run["job"]["_id"], None)
+        if run["workspace"] is not None:
+            self.file_system_handler.remove_workspace(run["workspace"])
+        self._wake.set()
+        self._store_pool.submit(self._store_result, run["job"], result,
+                                status, run["last_chunk"], run["chunks"])
+
+    def _store_result(self,
+                      job: dict,
+                      result,
+                      status: str = None,
+                      last_chunk=None,
+                      chunk_count: int = None):
+        """
+        Stores the result of a finished run in the database and completes
+        its job. Runs in a thread, since storing blocks on the database.
+
+        Parameters:
+        - job (dict): The job of the run.
+        - result (dict): The summary of the simulation, its rows have been
+          stored as partial result.
+        - status (str, optional): "cancelled", "timeout" or "killed" if
+          the run was stopped.
+        - last_chunk (Future, optional): The storing of the last partial
+          result, which the result is built from.
+        - chunk_count (int, optional): The number of partial results.
+        """
+        if last_chunk is not None:
+            last_chunk.result()
+
+        queue = self._get_job_queue()
+        if not queue.heartbeat(job["_id"], self.worker_id):
+            # the lease expired and the job is run again elsewhere
+            return
+
+        payload = job["payload"]
+        if status is not None:
+            self.database_handler.fail_simulations([payload["objectid"]],
+                                                   result["error"],
+                                                   status)
+            queue.fail(job["_id"], self.worker_id, result["error"], status)
+        else:
+            error = self.database_handler.store_simulation(
+                result,
+                object_id=payload["objectid"],
+                simulation_id=payload["simulation_id"],
+                simsettings_id=payload["simsettings_id"],
+                name=payload["name"],
+                chunk_count=chunk_count)
+            if error is not None:
+                status = "error"
+                queue.fail(job["_id"], self.worker_id, error)
+            else:
+                status = "done"
+                queue.complete(job["_id"], self.worker_id)
+        # identical runs submitted meanwhile copied this one
+        result_ids = [job["result_id"]] + \
+            self.database_handler.complete_copies(job["result_id"])
+        # subscribers fetch the result once it is stored
+        for result_id in result_ids:
+            self.progress.publish(result_id, {"event": "status",
+                                              "status": status})
+        if payload.get("seed") is not None:
+            # replicates of sweeps
+            try:
+                columns = None
+                if status == "done":
+                    _, columns = self.database_handler.load_result_columns(
+                        job["result_id"])
+                    if isinstance(columns, list):
+                        columns = ensemble.columns_from_rows(columns)
+                for result_id in result_ids:
+                    self._fold_into_ensembles(result_id, columns)
+            except Exception:
+                logger.exception("Folding result %s into its ensembles "
+                                 "failed.", job["result_id"])
+
+    def _fold_stored_result(self, result_id: str):
+        """
+        Folds a finished result that was reused by a sweep into its
+        ensembles. Results that are still running are folded in when they
+        finish.
+        """
+        try:
+            status, columns = \
+                self.database_handler.load_result_columns(result_id)
+            if status == "running":
+                return
+            if isinstance(columns, list):
+                columns = ensemble.columns_from_rows(columns)
+            self._fold_into_ensembles(result_id,
+                                      columns if status == "done" else None)
+        except Exception:
+            logger.exception("Folding result %s into its ensembles failed.",
+                             result_id)
+
+    def _fold_into_ensembles(self, result_id: str, columns: dict = None):
+        """
+        Adds a replicate to the statistics of the ensembles it belongs to.
+        Only the statistics and the one replicate are held in memory.
+
+        Parameters:
+        - result_id (str): The ID of the simulation result.
+        - columns (dict, optional): The columns of the result, None if the
+          run failed and is skipped.
+        """
+        for document in self.database_handler.get_pending_ensembles(
+                result_id):
+            # concurrent updates of the same ensemble are retried
+            for _ in range(10):
+                state = self.database_handler.load_ensemble_state(document)
+                accumulator = ensemble.EnsembleAccumulator() \
+                    if state is None \
+                    else ensemble.EnsembleAccumulator.from_bytes(state)
+                folded = columns
+                if folded is not None:
+                    try:
+                        accumulator.add(folded)
+                    except ValueError as e:
+                        logger.warning("Result %s is skipped in ensemble "
+                                       "%s: %s", result_id, document["_id"],
+                                       e)
+                        folded = None
+                if self.database_handler.update_ensemble(
+                        document,
+                        result_id,
+                        accumulator.to_bytes() if folded is not None
+                        else None,
+                        accumulator.count):
+                    break
+                pending = self.database_handler.get_pending_ensembles(
+                    result_id, document["_id"])
+                if not pending:
+                    break
+                document = pending[0]
+
+
+class QueueFullError(Exception):
+    """
+    Raised when a simulation is submitted while the queue is full.
+    """
+
+    def __init__(self, queue_position: int, max_queued: int):
+        super().__init__(
+            f"Simulation queue is full ({max_queued} waiting).")
+        self.queue_position = queue_position
+        self.max_queued = max_queued
@@ -0,0 +1,200 @@
+import numpy as np
+import os
+import random
+import tempfile
+import time
+
+# minimum time between two progress messages of a worker in seconds
+PROGRESS_INTERVAL = 0.25
+
+
+class SimulationCancelled(Exception):
+    """
+    Raised inside a worker process when its simulation is cancelled.
+    """
+
+
+class SimulationProcess:
+    """
+    Runs one simulation in its own worker process, such that FLEE does not
+    compete with request handling for the GIL and a run can be stopped
+    without affecting other runs.
+
+    Cancellation is cooperative first: the simulation checks the cancel
+    event before every simulated day and stops. A run that does not stop
+    is killed. The progress and the rows of the result are sent through
+    the same pipe as they are simulated, such that the memory of a worker
+    does not grow with the length of the simulation. The run ends with a
+    summary, {"days": ...} or {"error": ...}.
+    """
+
+    def __init__(self,
+                 context,
+                 simulation_dir: str,
+                 simsettings_filename: str,
+                 validation_dir: str,
+                 on_progress=None,
+                 on_rows=None,
+                 chunk_days: int = 10,
+                 seed: int = None,
+                 workspace: str = None):
+        """
+        Starts the worker process.
+
+        Parameters:
+        - context: The multiprocessing context used to create the process.
+        - simulation_dir (str): The path to the simulation directory.
+        - simsettings_filename (str): The path to the simsettings file.
+        - validation_dir (str): The path to the validation directory.
+        - on_progress (callable, optional): Called with the progress
+          reported by the simulation, see day_hooks.progress_hook.
+        - on_rows (callable, optional): Called with every batch of rows
+          of the result, see day_hooks.PartialResult.
+        - chunk_days (int): The number of days per batch.
+        - seed (int, optional): The random seed of the simulation.
+        - workspace (str, optional): The scratch directory of the run.
+        """
+        self.on_progress = on_progress
+        self.on_rows = on_rows
+        self.cancel_event = context.Event()
+        self._receiver, sender = context.Pipe(duplex=False)
+        self.process = context.Process(target=run_simulation_in_worker,
+                                       args=(sender,
+                                             self.cancel_event,
+                                             simulation_dir,
+                                             simsettings_filename,
+                                             validation_dir,
+                                             chunk_days,
+                                             seed,
+                                             workspace),
+                                       daemon=True)
+        self.process.start()
+        self.started_at = time.monotonic()
+        sender.close()
+
+    def outcome(self):
+        """
+        Returns the summary of the simulation without waiting for it.
+        Progress messages and rows received meanwhile are passed to
+        on_progress and on_rows.
+
+        Returns:
+        - dict: The summary, {"error": ...} if the process died, None if
+          the simulation is still running.
+        """
+        alive = self.process.is_alive()
+        while self._receiver.poll():
+            try:
+                kind, message = self._receiver.recv()
+            except EOFError:
+                break
+            if kind == "result":
+                self.process.join()
+                return message
+            if kind == "rows" and self.on_rows is not None:
+                self.on_rows(message)
+            elif kind == "progress" and self.on_progress is not None:
+                self.on_progress(message)
+        if not alive:
+            return self._exit_error()
+        return None
+
+    def cancel(self):
+        """
+        Asks the simulation to stop after the current day.
+        """
+        self.cancel_event.set()
+
+    def kill(self):
+        """
+        Stops the worker process immediately.
+        """
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self._receiver.close()
+
+    def elapsed(self):
+        """
+        Returns the wall-clock time of the run in seconds.
+        """
+        return time.monotonic() - self.started_at
+
+    def rss(self):
+        """
+        Returns the resident set size of the worker process in bytes, or
+        None where /proc is not available.
+        """
+        try:
+            with open(f"/proc/{self.process.pid}/statm") as statm:
+                pages = int(statm.read().split()[1])
+        except (OSError, IndexError, ValueError):
+            return None
+        return pages * os.sysconf("SC_PAGE_SIZE")
+
+    def _exit_error(self):
+        return {"error": "Simulation worker exited with code "
+                         f"{self.process.exitcode}."}
+
+
+def run_simulation_in_worker(connection,
+                             cancel_event,
+                             simulation_dir: str,
+                             simsettings_filename: str,
+                             validation_dir: str,
+                             chunk_days: int = 10,
+                             seed: int = None,
+                             workspace: str = None):
+    """
+    Entry point of the simulation worker processes. Runs FLEE and sends
+    its progress, at most every PROGRESS_INTERVAL seconds, the rows of its
+    result, every chunk_days days, and its summary back to the API
+    process.
+
+    Parameters:
+    - connection (Connection): The pipe to send messages through.
+    - cancel_event (Event): Set by the API process to cancel the run.
+    - simulation_dir (str): The path to the simulation directory.
+    - simsettings_filename (str): The path to the simsettings file.
+    - validation_dir (str): The path to the validation directory.
+    - chunk_days (int): The number of days per batch of rows.
+    - seed (int, optional): Seeds the random generators used by FLEE,
+      such that replicates of a sweep are reproducible.
+    - workspace (str, optional): The scratch directory of the run. It
+      becomes the working and temporary directory of the worker, such
+      that files written by FLEE do not collide with other runs.
+    """
+    # FLEE is only loaded by the worker processes, not by the API
+    from flee_adapter.adapter import Adapter
+
+    if workspace is not None:
+        os.chdir(workspace)
+        os.environ["TMPDIR"] = workspace
+        tempfile.tempdir = workspace
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+    last_sent = [None]
+
+    def on_day(progress: dict):
+        if cancel_event.is_set():
+            raise SimulationCancelled("Simulation was cancelled.")
+        now = time.monotonic()
+        last_day = progress["total_days"] is not None and \
+            progress["day"] + 1 >= progress["total_days"]
+        if last_sent[0] is None or last_day or \
+                now - last_sent[0] >= PROGRESS_INTERVAL:
+            connection.send(("progress", progress))
+            last_sent[0] = now
+
+    def on_rows(rows: list):
+        connection.send(("rows", rows))
+
+    result = Adapter().run_simulation_config(simulation_dir,
+                                             simsettings_filename,
+                                             validation_dir,
+                                             on_day,
+                                             on_rows,
+                                             chunk_days)
+    connection.send(("result", result))
+    connection.close()
@@ -0,0 +1,106 @@
+import copy
+import itertools
+import math
+
+# the section of the simsettings that bare parameter names refer to
+DEFAULT_SECTION = "move_rules"
+
+
+def expand_values(spec):
+    """
+    Expands the range of a sweep parameter into its values.
+
+    Parameters:
+    - spec (list or dict): Either the values themselves or a dict with
+      "start", "stop" (inclusive) and "step".
+
+    Returns:
+    - list: The values.
+
+    Raises:
+    - ValueError: If the range is empty or invalid.
+    """
+    if isinstance(spec, list):
+        values = spec
+    elif isinstance(spec, dict) and {"start", "stop", "step"} <= set(spec):
+        start, stop, step = spec["start"], spec["stop"], spec["step"]
+        if not all(isinstance(value, (int, float))
+                   for value in (start, stop, step)) or step <= 0:
+            raise ValueError("start, stop and step must be numbers and "
+                             "step must be positive.")
+        # the tolerance keeps stop despite floating point errors
+        count = math.floor((stop - start) / step + 1e-9) + 1
+        values = [start + i * step for i in range(max(count, 0))]
+        if all(isinstance(value, int) for value in (start, step)):
+            values = [int(value) for value in values]
+        else:
+            values = [round(value, 12) for value in values]
+    else:
+        raise ValueError("A parameter range is a list of values or "
+                         "{start, stop, step}.")
+    if not values:
+        raise ValueError("A parameter range must not be empty.")
+    return values
+
+
+def parameter_path(name: str):
+    """
+    Returns the path of a parameter in the simsettings, e.g.
+    "conflict_weight" -> ("move_rules", "conflict_weight").
+    """
+    if "." in name:
+        return tuple(name.split("."))
+    return (DEFAULT_SECTION, name)
+
+
+def expand_sweep(parameters: dict, replicates: int, seed: int = 0):
+    """
+    Expands the parameter ranges of a sweep into the grid of all value
+    combinations, each run replicates times with different random seeds.
+
+    Parameters:
+    - parameters (dict): Parameter names mapped to their ranges, see
+      expand_values and parameter_path.
+    - replicates (int): The number of runs per combination.
+    - seed (int): The seed of the first replicate, replicate i gets seed+i.
+
+    Returns:
+    - list: One dict per run with "values" (parameter name -> value) and
+      "seed".
+    """
+    if replicates < 1:
+        raise ValueError("replicates must be at least 1.")
+    names = list(parameters)
+    ranges = [expand_values(parameters[name]) for name in names]
+    return [{"values": dict(zip(names, combination)), "seed": seed + i}
+            for combination in itertools.product(*ranges)
+            for i in range(replicates)]
+
+
+def apply_values(simsetting: dict, values: dict):
+    """
+    Returns a copy of the simsettings with the parameter values set.
+
+    Raises:
+    - ValueError: If a parameter does not exist in the simsettings.
+    """
+    variant = copy.deepcopy(simsetting)
+    for name, value in values.items():
+        *sections, key = parameter_path(name)
+        target = variant
+        for section in sections:
+            target = target.get(section) if isinstance(target, dict) \
+                else None
+        if not isinstance(target, dict) or key not in target:
+            raise ValueError(f"Unknown simsettings parameter: {name}")
+        target[key] = value
+    return variant
+
+
+def variant_name(name: str, values: dict, seed: int):
+    """
+    Returns the name of a run of a sweep, e.g.
+    "default [conflict_weight=0.5, seed=1]".
+    """
+    labels = [f"{key}={value}" for key, value in values.items()]
+    return f"{name} [{', '.join(labels + [f'seed={seed}'])}]"
@@ -1,4 +1,6 @@
 from runscripts.runner import Simulation
+from flee_adapter.day_hooks import PartialResult, install_day_hook
+from flee_adapter.day_hooks import progress_hook
 
 
 class Adapter:
@@ -9,27 +11,48 @@ class Adapter:
     def run_simulation_config(self,
                               simulation_dir: str,
                               simsettings_file: str,
-                              validation_dir: str):
+                              validation_dir: str,
+                              on_day=None,
+                              on_rows=None,
+                              chunk_days: int = 10):
         """
         Runs a simulation using custom simulation and simsettings.
 
         Parameters:
         - simulation_dir (str): The path to the simulation directory.
         - simsettings_file (str): The path to the simsettings file.
+        - on_day (callable, optional): Called with the progress of the
+          simulation before every simulated day, see progress_hook.
+        - on_rows (callable, optional): Called with the rows of the result
+          every chunk_days simulated days, see PartialResult.
+        - chunk_days (int): The number of days per batch of rows.
 
         Exceptions:
         - All Exceptions and a SystemExit of flee are caught and returned
           as a string, such that the user can see whether their simulation
-          failed.
+          failed. This includes exceptions raised by on_day.
 
         Returns:
-        -dict: The result of the simulation.
+        -dict: The result of the simulation. If on_rows is given, its rows
+         have been passed to on_rows and only the number of days is
+         returned, {"days": ...}.
         """
         sim = Simulation(simulation_dir,
                          validation_dir,
                          0,
                          simsettings_file)
 
+        hooks = []
+        if on_rows is not None:
+            partial_result = PartialResult(on_rows, simulation_dir,
+                                           chunk_days)
+            hooks.append(partial_result)
+        if on_day is not None:
+            hooks.append(progress_hook(on_day, simulation_dir))
+        if hooks:
+            install_day_hook(lambda ecosystem: [hook(ecosystem)
+                                                for hook in hooks])
+
         try:
             result = sim.run()
         except Exception as e:
@@ -37,4 +60,10 @@ class Adapter:
         except SystemExit as e:
             result = {"error": "{}".format(e)}
 
+        if on_rows is not None:
+            partial_result.close()
+            if not isinstance(result, dict) or "error" not in result:
+                # the rows returned by FLEE are not sent back
+                result = {"days": partial_result.days}
+
         return result
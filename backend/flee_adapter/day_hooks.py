@@ -0,0 +1,142 @@
+"""
+Hooks that observe a FLEE simulation day by day (progress and partial
+results). Only install_day_hook imports FLEE, when it is called, such that
+the hooks can be used and tested without FLEE.
+"""
+from datetime import date, timedelta
+from pathlib import Path
+import csv
+import time
+
+
+class PartialResult:
+    """
+    Collects the simulated population of every camp day by day while a
+    simulation runs and passes it on in batches, such that the result can
+    be stored while it is simulated instead of being kept in memory. The
+    batches make up the whole result, the validation data and errors
+    computed by FLEE are not used since runs have no validation data.
+    """
+
+    def __init__(self, on_rows, simulation_dir: str, chunk_days: int):
+        """
+        Parameters:
+        - on_rows (callable): Called with a list of rows, one per day, with
+          "Day", "Date", "<camp> sim" and "refugees in camps (simulation)".
+        - simulation_dir (str): The path to the simulation directory.
+        - chunk_days (int): The number of days per batch.
+        """
+        self.on_rows = on_rows
+        self.chunk_days = chunk_days
+        self.start_date = simulation_period(simulation_dir).get("StartDate")
+        self.ecosystem = None
+        self.last_day = -1
+        self.rows = []
+        self.days = 0
+
+    def __call__(self, ecosystem):
+        # called before a day is simulated, the previous day is complete
+        self.ecosystem = ecosystem
+        self._add(ecosystem.time - 1)
+
+    def close(self):
+        """
+        Adds the last simulated day and passes on the remaining rows.
+        """
+        if self.ecosystem is not None:
+            self._add(self.ecosystem.time - 1)
+        self._flush()
+
+    def _add(self, day: int):
+        if day <= self.last_day:
+            return
+        row = {"Day": day, "Date": self._date(day)}
+        in_camps = 0
+        for location in self.ecosystem.locations:
+            if location.camp:
+                row[location.name + " sim"] = location.numAgents
+                in_camps += location.numAgents
+        row["refugees in camps (simulation)"] = in_camps
+        self.rows.append(row)
+        self.last_day = day
+        if len(self.rows) >= self.chunk_days:
+            self._flush()
+
+    def _flush(self):
+        if self.rows:
+            self.on_rows(self.rows)
+            self.days += len(self.rows)
+            self.rows = []
+
+    def _date(self, day: int):
+        try:
+            start = date.fromisoformat(self.start_date)
+        except (TypeError, ValueError):
+            return None
+        return (start + timedelta(days=day)).isoformat()
+
+
+def progress_hook(on_day, simulation_dir: str):
+    """
+    Creates a day hook that reports the progress of a simulation.
+
+    Parameters:
+    - on_day (callable): Called with a dict of the current day, the total
+      number of days, the number of agents and the elapsed seconds.
+    - simulation_dir (str): The path to the simulation directory.
+
+    Returns:
+    - callable: The hook for install_day_hook.
+    """
+    total_days = simulation_period(simulation_dir).get("length")
+    started_at = time.monotonic()
+
+    def hook(ecosystem):
+        on_day({"day": ecosystem.time,
+                "total_days": total_days,
+                "agents": len(ecosystem.agents),
+                "elapsed": time.monotonic() - started_at})
+
+    return hook
+
+
+def simulation_period(simulation_dir: str):
+    """
+    Reads the start date ("StartDate") and the number of simulated days
+    ("length") from sim_period.csv.
+
+    Returns:
+    - dict: The entries found, empty if the file is missing.
+    """
+    period = {}
+    try:
+        with open(Path(simulation_dir) / "sim_period.csv") as csv_file:
+            for row in csv.reader(csv_file):
+                if len(row) == 2 and row[0] == "StartDate":
+                    period["StartDate"] = row[1]
+                elif len(row) == 2 and row[0] == "length":
+                    period["length"] = int(row[1])
+    except (OSError, ValueError):
+        pass
+    return period
+
+
+def install_day_hook(hook):
+    """
+    Calls the hook with the FLEE ecosystem before every simulated day.
+    Patches FLEE globally, so it is only used inside worker processes
+    that run a single simulation.
+
+    Parameters:
+    - hook (callable): Called with the ecosystem; exceptions raised by
+      the hook end the simulation.
+    """
+    from flee import flee
+
+    evolve = flee.Ecosystem.evolve
+
+    def evolve_with_hook(ecosystem, *args, **kwargs):
+        hook(ecosystem)
+        return evolve(ecosystem, *args, **kwargs)
+
+    flee.Ecosystem.evolve = evolve_with_hook
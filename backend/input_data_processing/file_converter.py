@@ -5,6 +5,12 @@ from bson.objectid import ObjectId as ObjectID
 from datetime import datetime
 from dotenv import load_dotenv
 from pathlib import Path
+import sys
+
+# add backend directory to PYTHONPATH
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from controller.conflict_intervals import encode_conflicts
 
 
 def csv_to_list(file_path):
@@ -148,11 +154,12 @@ def transform_closure_data(closure_data):
 
 def transform_conflicts_data(conflicts_data):
     '''
-    Transform the conflicts data to match the MongoDB schema.
+    Transform the conflicts data to match the MongoDB schema. The conflicts are stored as intervals per zone
+    (see controller/conflict_intervals.py), or as list of dictionaries if they can not be encoded without loss.
         Parameters:
             conflicts_data (list): List of dictionaries
         Returns:
-            transformed_data (list): List of dictionaries
+            transformed_data (dict or list): Intervals per zone or list of dictionaries
     '''
     transformed_data = []
 
@@ -166,6 +173,10 @@ def transform_conflicts_data(conflicts_data):
             transformed_row[key] = value
 
         transformed_data.append(transformed_row)
+
+    intervals = encode_conflicts(transformed_data)
+    if intervals is not None:
+        return intervals
     return transformed_data
 
 
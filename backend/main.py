@@ -1,19 +1,58 @@
-from fastapi import FastAPI, HTTPException, Path, BackgroundTasks, Query
+from bson import ObjectId
+from fastapi import FastAPI, HTTPException, Path, Query
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
 from controller.handler.database_handler import DatabaseHandler
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Any, Dict, AnyStr, List, Union
+from typing import Any, Dict, AnyStr, List, Optional, Union
 from controller.simulation_executor import SimulationExecutor
+from controller.simulation_executor import QueueFullError
 from controller.data_extractor import DataExtractor
-
-app = FastAPI()
+from controller.handler import result_codec
+from controller import downsampling
+from controller import http_encoding
+from controller import serialization
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import logging
 
 DEFAULT_INPUT_ID = "65a6d3eb9ae2636fa2b3e3c6"
 DEFAULT_SETTING_ID = "6599846eeb8f8c36cce8307a"
 
+# failures of the background threads (dispatcher, change stream, ...) are
+# logged, uvicorn only configures its own loggers
+logging.basicConfig(level=logging.INFO,
+                    format="%(levelname)s:     %(name)s: %(message)s")
+
 database_handler = DatabaseHandler(DEFAULT_INPUT_ID, DEFAULT_SETTING_ID)
 simulation_executor = SimulationExecutor(database_handler)
 data_extractor = DataExtractor()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Closes the database connection pool at shutdown. The pool itself is
+    created on first database use, such that the credentials are only
+    resolved once they are needed and startup works without network.
+    All requests share one MongoClient.
+    Starts the simulation dispatcher, which first resumes or fails the
+    simulations interrupted by a restart (see SimulationExecutor.reconcile).
+    Stops the simulation worker processes at shutdown.
+    Watches the database for writes of other processes to keep the
+    document cache up to date (see DatabaseHandler.watch_changes).
+    """
+    simulation_executor.start()
+    change_watcher = asyncio.ensure_future(database_handler.watch_changes())
+    yield
+    change_watcher.cancel()
+    simulation_executor.shutdown()
+    database_handler.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
 JSONObject = Dict[AnyStr, Any]
 JSONArray = List[Any]
 JSONStructure = Union[JSONArray, JSONObject]
@@ -25,9 +64,215 @@ app.add_middleware(
     allow_credentials=True,  # allow cookies
     allow_methods=["*"],  # allow all methods
     allow_headers=["*"],  # allow all headers
+    expose_headers=["X-Next-After-Id", "X-Column-Dtype",
+                    "X-Column-Codec", "X-Column-Length", "ETag"],
 )
 
 
+# Helpers: --------------------------------------------------------------------
+
+
+def parse_fields(fields: Optional[str]):
+    """
+    Splits the comma separated fields query parameter.
+
+    Parameters:
+    - fields (str, optional): e.g. "name,status".
+
+    Returns:
+    - list: The field names or None if all fields are requested.
+    """
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(",") if field.strip()]
+
+
+def parse_filters(**filters):
+    """
+    Returns the equality filters that have been set.
+
+    Returns:
+    - dict: The filters without the unset (None) values.
+    """
+    return {key: value for key, value in filters.items()
+            if value is not None}
+
+
+def encoded_response(request: Request,
+                     content,
+                     headers: dict = None,
+                     table: dict = None):
+    """
+    Serializes a response in the format accepted by the client: JSON, or
+    MessagePack and (for tables) Arrow if installed (see
+    serialization.negotiate_format). The content is serialized as read
+    from the database, without FastAPI's jsonable_encoder.
+
+    Parameters:
+    - request (Request): The request.
+    - content: The content of the response.
+    - headers (dict, optional): Further headers.
+    - table (dict, optional): Columns of equally long numpy arrays or
+      lists to send with the content, which may then be sent as Arrow
+      (see serialization.dumps_table).
+
+    Returns:
+    - Response: The serialized response.
+    """
+    media_format = serialization.negotiate_format(
+        request.headers.get("accept"), tabular=table is not None)
+    if table is None:
+        body = serialization.dumps(content, media_format)
+    else:
+        body = serialization.dumps_table(table, media_format, content)
+    headers = dict(headers or {})
+    headers["Vary"] = ", ".join(filter(None, [headers.get("Vary"),
+                                              "Accept"]))
+    return Response(body,
+                    media_type=serialization.MEDIA_TYPES[media_format],
+                    headers=headers)
+
+
+def tagged_response(request: Request, tagged: tuple):
+    """
+    Sends a document with its entity tag, or 304 Not Modified without a
+    body if the client has the document already (If-None-Match). Bodies
+    of at least COMPRESSION_MIN_BYTES are compressed with the content
+    coding accepted by the client.
+
+    Parameters:
+    - request (Request): The request.
+    - tagged (tuple): The tag and document of DatabaseHandler.get_tagged.
+
+    Returns:
+    - Response: The document (see encoded_response), null if there is no
+      document.
+    """
+    tag, document = tagged
+    if tag is None:
+        return encoded_response(request, None)
+
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    encoding = http_encoding.negotiate_encoding(
+        request.headers.get("accept-encoding"))
+    if document is None:
+        headers["ETag"] = http_encoding.representation_tag(tag, encoding)
+        return Response(status_code=304, headers=headers)
+
+    response = encoded_response(request, document, headers)
+    if encoding is None or \
+            len(response.body) < http_encoding.COMPRESSION_MIN_BYTES:
+        encoding = None
+    else:
+        response.body = http_encoding.compress(response.body, encoding)
+        response.headers["Content-Encoding"] = encoding
+        response.headers["Content-Length"] = str(len(response.body))
+    response.headers["ETag"] = http_encoding.representation_tag(tag,
+                                                                encoding)
+    return response
+
+
+async def ndjson_lines(batches):
+    """
+    Serializes document batches to newline delimited JSON, one batch at a
+    time as the batches arrive from the database cursor.
+
+    Parameters:
+    - batches: Async iterator over lists of documents.
+
+    Yields:
+    - bytes: The serialized documents of one batch.
+    """
+    async for batch in batches:
+        yield b"".join(serialization.dumps_json(document) + b"\n"
+                       for document in batch)
+
+
+def server_sent_event(event: dict):
+    """
+    Serializes an event in the Server-Sent Events format, using its "event"
+    entry as event type.
+    """
+    data = {key: value for key, value in event.items() if key != "event"}
+    return f"event: {event['event']}\ndata: {json.dumps(data)}\n\n"
+
+
+async def progress_events(result_id: str,
+                          queue: asyncio.Queue,
+                          keep_alive: float = 15):
+    """
+    Streams the progress events of a running simulation until its status
+    event. Simulations running in another API instance publish no events
+    here, for those the status is checked once per keep-alive interval.
+
+    Parameters:
+    - result_id (str): The ID of the simulation result.
+    - queue (asyncio.Queue): The subscription of the progress broker.
+    - keep_alive (float): Seconds between two keep-alive comments.
+
+    Yields:
+    - str: The events in the Server-Sent Events format.
+    """
+    try:
+        latest = simulation_executor.progress.latest(result_id)
+        if latest is not None:
+            yield server_sent_event(latest)
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), keep_alive)
+            except asyncio.TimeoutError:
+                if not simulation_executor.runs_locally(result_id):
+                    result = await database_handler.get(
+                        "simulations_results", result_id, ["status"])
+                    if result is None or result["status"] != "running":
+                        status = result["status"] if result else "deleted"
+                        yield server_sent_event({"event": "status",
+                                                 "status": status})
+                        return
+                yield ": keep-alive\n\n"
+                continue
+            yield server_sent_event(event)
+            if event["event"] == "status":
+                return
+    finally:
+        simulation_executor.progress.unsubscribe(result_id, queue)
+
+
+async def list_documents(request: Request,
+                         collection_name: str,
+                         filters: dict,
+                         fields: Optional[str],
+                         limit: Optional[int],
+                         after_id: Optional[str],
+                         stream: bool):
+    """
+    Returns a page of documents of a collection, either as list (see
+    encoded_response) or as NDJSON stream. If the page is full, the ID to
+    request the next page with is returned in the X-Next-After-Id header.
+    """
+    # checked before streaming, once the stream started it can not fail
+    if after_id is not None and not ObjectId.is_valid(after_id):
+        raise HTTPException(status_code=400,
+                            detail=f"Invalid after_id: {after_id}")
+    # the IDs are converted to strings by the serializers
+    batches = database_handler.iterate_batches(collection_name,
+                                               filters,
+                                               parse_fields(fields),
+                                               limit,
+                                               after_id)
+    if stream:
+        return StreamingResponse(ndjson_lines(batches),
+                                 media_type="application/x-ndjson")
+
+    documents = []
+    async for batch in batches:
+        documents.extend(batch)
+    headers = {}
+    if limit is not None and len(documents) == limit:
+        headers["X-Next-After-Id"] = str(documents[-1]["_id"])
+    return encoded_response(request, documents, headers)
+
+
 # General: --------------------------------------------------------------------
 
 
@@ -41,20 +286,43 @@ def read_root():
     return {"data": "Welcome to the Caturanga API!!"}
 
 
+@app.get("/database/pool_stats")
+def get_database_pool_stats():
+    """
+    Returns statistics of the database connection pools.
+
+    Returns:
+    - dict: Checked-out connections, checkout wait times and the number
+      of connection handshakes since startup, for the blocking ("sync")
+      and the asynchronous ("async") client.
+    """
+    return database_handler.get_pool_statistics()
+
+
+@app.get("/database/cache_stats")
+def get_database_cache_stats():
+    """
+    Returns statistics of the cache of inputs, simsettings and their
+    summaries.
+
+    Returns:
+    - dict: Cached entries, hits, misses and invalidations since startup.
+    """
+    return database_handler.get_cache_statistics()
+
+
 # Simulation Execution: -------------------------------------------------------
 
 
 @app.post("/run_simulation/config")
 async def run_simulation_config(
-        background_tasks: BackgroundTasks,
         simulation_config: JSONStructure = None
 ):
     """
     Run simulation with specified simulation input and settings.
+    The simulation runs asynchronously in a pool of worker processes.
 
     Parameters:
-    - background_tasks (BackgroundTasks): The background tasks object used to
-      run the simulation asynchronously.
     - simulation_config (JSONStructure, optional) containing:
         - input_id (str): The ID of the simulation input.
         - input_name (str): The name of the simulation input.
@@ -62,7 +330,13 @@ async def run_simulation_config(
         - simsettings_name (str): The name of the simulation settings.
 
     Returns:
-        dict: A dictionary containing the object ID of the dummy simulation.
+        dict: A dictionary containing the object ID of the dummy simulation
+        and its position in the queue (0 if it runs immediately).
+        If the same input and simsettings content has already been
+        simulated, that result is copied and the ID of the copy is
+        returned with "cached": True and no new simulation is started.
+        If all workers are busy and the queue is full, the request fails
+        with status 429 and the queue position it would have had.
 
     Example:
         To query this endpoint, use the following URL format:
@@ -82,38 +356,186 @@ async def run_simulation_config(
         }
 
     """
-    data = await simulation_executor.initialize_simulation(
-        simulation_config=simulation_config
-    )
+    try:
+        data = await simulation_executor.initialize_simulation(
+            simulation_config=simulation_config,
+            admit=True
+        )
+    except QueueFullError as e:
+        raise HTTPException(status_code=429,
+                            detail={"error": str(e),
+                                    "queue_position": e.queue_position,
+                                    "max_queued": e.max_queued},
+                            headers={"Retry-After": "30"})
+
+    if data["cached"]:
+        # identical input and simsettings were already simulated (or are
+        # being simulated), return the copy of that result instead of
+        # running again
+        return {"dummy simulation": str(data["objectid"]),
+                "cached": True,
+                "status": data["status"]}
+
+    queue_position = await simulation_executor.submit(data)
+
+    return {"dummy simulation": str(data["objectid"]),
+            "queue_position": queue_position}
+
+
+@app.post("/run_simulation/sweep")
+async def run_simulation_sweep(
+        sweep_config: JSONStructure = None
+):
+    """
+    Runs a parameter sweep: the base simsettings are varied over the grid
+    of all parameter values and every combination is run replicates times
+    with different random seeds, in parallel on the simulation workers.
+
+    Parameters:
+    - sweep_config (JSONStructure): The structure of the JSON-object
+      should be as follows:
+
+        {
+            input: {
+                input_id: <input_id>,
+                input_name: <input_name>
+            },
+            settings: {
+                simsettings_id: <base simsettings_id>,
+                simsettings_name: <base simsettings_name>
+            },
+            parameters: {
+                conflict_weight: [0.25, 0.5, 1.0],
+                camp_weight: {start: 1, stop: 3, step: 1}
+            },
+            replicates: <runs per combination>,
+            seed: <seed of the first replicate>
+        }
+
+    Returns:
+    - dict: The ID of the sweep, the number of runs and of results reused
+      from identical earlier runs.
+    """
+    try:
+        return await simulation_executor.submit_sweep(sweep_config)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/run_simulation/sweep/{sweep_id}")
+async def get_simulation_sweep(
+        sweep_id: str = Path(),
+):
+    """
+    Returns a parameter sweep with the status of its runs, the number of
+    runs per status and its progress between 0 and 1.
+
+    Parameters:
+    - sweep_id (str): The ID of the sweep.
+
+    Returns:
+    - dict: The sweep.
+    """
+    result = await simulation_executor.sweep_status(sweep_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Sweep not found.")
+    return result
+
 
-    background_tasks.add_task(
-        simulation_executor.run_simulation,
-        data["name"],
-        data["simulation_id"],
-        data["simsettings_id"],
-        data["objectid"],
-        data["simsettings_filename"],
-        data["simulation_dir"],
-        data["validation_dir"])
+@app.get("/run_simulation/sweep/{sweep_id}/ensembles")
+async def get_simulation_sweep_ensembles(
+        sweep_id: str = Path(),
+):
+    """
+    Returns the ensembles of a parameter sweep: the replicates of every
+    parameter combination, with the number of replicates folded into
+    their statistics so far.
+
+    Parameters:
+    - sweep_id (str): The ID of the sweep.
+
+    Returns:
+    - list: The ensembles, without their statistics.
+    """
+    return await database_handler.get_all(
+        "simulation_ensembles",
+        {"sweep_id": sweep_id},
+        ["sweep_id", "values", "result_ids", "folded", "skipped", "count",
+         "status", "created_at", "updated_at"])
 
-    return {"dummy simulation": str(data["objectid"])}
+
+@app.get("/simulation_ensembles/{ensemble_id}")
+async def get_simulation_ensemble(
+        ensemble_id: str = Path(),
+        columns: Optional[str] = Query(None),
+):
+    """
+    Returns the statistics of the replicates of an ensemble, per location
+    and day: "<location> mean", "<location> std" and the percentile bands
+    "<location> p5", "p25", "p50", "p75" and "p95".
+
+    Parameters:
+    - ensemble_id (str): The ID of the ensemble.
+    - columns (str, optional): Comma separated column names, e.g.
+      "Date,Kobo sim mean". All columns if omitted.
+
+    Returns:
+    - dict: The ensemble with the number of days ("length") and the
+      values per column ("columns").
+    """
+    try:
+        result = await simulation_executor.ensemble_statistics(
+            ensemble_id, parse_fields(columns))
+    except KeyError as e:
+        raise HTTPException(status_code=404,
+                            detail=f"Unknown columns: {e.args[0]}")
+    if result is None:
+        raise HTTPException(status_code=404, detail="Ensemble not found.")
+    result["columns"] = result_codec.columns_to_lists(result["columns"])
+    return result
+
+
+@app.get("/run_simulation/queue")
+async def get_simulation_queue():
+    """
+    Returns the utilization of the simulation queue.
+
+    Returns:
+    - dict: Number of local workers, running and queued simulations and
+      the maximum queue length.
+    """
+    return await simulation_executor.queue_status()
 
 # /simulations
 
 
 @app.get("/simulations")
-async def get_all_simulations():
+async def get_all_simulations(
+        request: Request,
+        limit: Optional[int] = Query(None, ge=1),
+        after_id: Optional[str] = Query(None),
+        fields: Optional[str] = Query(None),
+        stream: bool = Query(False),
+):
     """
     Return the data of all simulations.
 
+    Parameters:
+    - limit (int, optional): Maximum number of simulations per page.
+    - after_id (str, optional): Return the simulations after this ID, i.e.
+      the X-Next-After-Id header of the previous page.
+    - fields (str, optional): Comma separated fields to return.
+    - stream (bool, optional): Stream the simulations as NDJSON.
+
     Returns:
     - list: The data of the all simulations.
     """
-    return await database_handler.get_all("simulations")
+    return await list_documents(request, "simulations", {},
+                                fields, limit, after_id, stream)
 
 
 @app.get("/simulations/summary")
-async def get_all_simulation_summaries():
+async def get_all_simulation_summaries(request: Request):
     """
     Retrieves all simulation summaries.
     A simulation summary contains the simulation ID and the simulation name.
@@ -122,24 +544,34 @@ async def get_all_simulation_summaries():
     - list of simulation summaries.
     """
     summary = await database_handler.get_summaries("simulations")
-    return {"data": summary,
-            "protectedIDs": [DEFAULT_INPUT_ID]}
+    return encoded_response(request, {"data": summary,
+                                      "protectedIDs": [DEFAULT_INPUT_ID]})
 
 
 @app.get("/simulations/{simulation_id}")
 async def get_simulation(
+        request: Request,
         simulation_id: str = Path(),
+        fields: Optional[str] = Query(None),
 ):
     """
     Return the data of a simulation based on its ID.
+    Sends an ETag and 304 Not Modified to clients that have the data
+    already (see tagged_response).
 
     Parameters:
     - simulation_id (str): The ID of the simulation.
+    - fields (str, optional): Comma separated fields to return.
 
     Returns:
     - dict: The data of the simulation.
     """
-    return await database_handler.get("simulations", simulation_id)
+    known_tags = http_encoding.requested_tags(
+        request.headers.get("if-none-match"))
+    tagged = await database_handler.get_tagged("simulations", simulation_id,
+                                               parse_fields(fields),
+                                               known_tags=known_tags)
+    return tagged_response(request, tagged)
 
 
 @app.delete("/simulations/{simulation_id}")
@@ -195,18 +627,37 @@ async def post_simulation(
 
 
 @app.get("/simulation_results")
-async def get_all_simulation_results():
+async def get_all_simulation_results(
+        request: Request,
+        limit: Optional[int] = Query(None, ge=1),
+        after_id: Optional[str] = Query(None),
+        fields: Optional[str] = Query(None),
+        status: Optional[str] = Query(None),
+        simulation_id: Optional[str] = Query(None),
+        stream: bool = Query(False),
+):
     """
     Retrieves all simulation results.
 
+    Parameters:
+    - limit (int, optional): Maximum number of results per page.
+    - after_id (str, optional): Return the results after this ID, i.e.
+      the X-Next-After-Id header of the previous page.
+    - fields (str, optional): Comma separated fields to return.
+    - status (str, optional): Only results with this status.
+    - simulation_id (str, optional): Only results of this input.
+    - stream (bool, optional): Stream the results as NDJSON.
+
     Returns:
     - list: A list of all simulation results.
     """
-    return await database_handler.get_all("simulations_results")
+    filters = parse_filters(status=status, simulation_id=simulation_id)
+    return await list_documents(request, "simulations_results", filters,
+                                fields, limit, after_id, stream)
 
 
 @app.get("/simulation_results/summary")
-async def get_all_simulation_result_summaries():
+async def get_all_simulation_result_summaries(request: Request):
     """
     Retrieves all simulation result summaries.
     A simulation result summary contains the
@@ -215,24 +666,275 @@ async def get_all_simulation_result_summaries():
     Returns:
     - list of simulation result summaries.
     """
-    return await database_handler.get_summaries("simulations_results")
+    summaries = await database_handler.get_summaries("simulations_results")
+    return encoded_response(request, summaries)
 
 
 @app.get("/simulation_results/{simulation_result_id}")
 async def get_simulation_result(
+        request: Request,
         simulation_result_id: str = Path(),
+        fields: Optional[str] = Query(None),
+        status: Optional[str] = Query(None),
+        simulation_id: Optional[str] = Query(None),
 ):
     """
     Retrieve the data of a simulation result based on its ID.
+    Sends an ETag and 304 Not Modified to clients that have the data
+    already, without decoding the stored result (see tagged_response).
 
     Parameters:
     - simulation_result_id (str): The ID of the simulation result.
+    - fields (str, optional): Comma separated fields to return, e.g.
+      "status" for polling clients.
+    - status (str, optional): Only return the result with this status.
+    - simulation_id (str, optional): Only return the result of this input.
 
     Returns:
     - dict: The data of the simulation result.
     """
-    return await database_handler.get("simulations_results",
-                                      simulation_result_id)
+    filters = parse_filters(status=status, simulation_id=simulation_id)
+    known_tags = http_encoding.requested_tags(
+        request.headers.get("if-none-match"))
+    tagged = await database_handler.get_tagged("simulations_results",
+                                               simulation_result_id,
+                                               parse_fields(fields),
+                                               filters,
+                                               known_tags)
+    return tagged_response(request, tagged)
+
+
+@app.get("/simulation_results/{simulation_result_id}/series")
+async def get_simulation_result_series(
+        request: Request,
+        simulation_result_id: str = Path(),
+        columns: Optional[str] = Query(None),
+        from_day: int = Query(0, ge=0),
+        to_day: Optional[int] = Query(None, ge=0),
+        stride: int = Query(1, ge=1),
+        downsample: Optional[str] = Query(None, pattern="^(lttb|minmax)$"),
+        points: int = Query(500, ge=3),
+):
+    """
+    Returns selected columns of a simulation result for a range of days.
+    Only the requested columns are read and decoded, which keeps payload
+    and server work small when only a few locations are plotted.
+
+    Parameters:
+    - simulation_result_id (str): The ID of the simulation result.
+    - columns (str, optional): Comma separated column names, e.g.
+      "Date,Kobo sim". All columns if omitted.
+    - from_day (int, optional): The first day to return. Defaults to 0.
+    - to_day (int, optional): The last day to return (inclusive).
+      Defaults to the last simulated day.
+    - stride (int, optional): Return every stride-th day. Defaults to 1.
+    - downsample (str, optional): Reduce every column to about "points"
+      values while keeping peaks, with "lttb" or "minmax".
+    - points (int, optional): Target number of values per column when
+      downsampling. Defaults to 500.
+
+    Returns:
+    - dict: The total number of days ("length"), the returned day indices
+      ("days") and the values per column ("columns"). When downsampling,
+      every column has its own days: {"days": [...], "values": [...]}.
+      Without downsampling, clients accepting
+      application/vnd.apache.arrow.stream get the columns as Arrow table
+      with "length" and "days" as JSON in the schema metadata.
+    """
+    try:
+        series = await database_handler.get_result_series(
+            simulation_result_id,
+            parse_fields(columns),
+            from_day,
+            to_day,
+            stride)
+    except KeyError as e:
+        raise HTTPException(status_code=404,
+                            detail=f"Unknown columns: {e.args[0]}")
+
+    if series is None:
+        raise HTTPException(status_code=404,
+                            detail="Simulation result not found.")
+
+    if downsample is not None:
+        try:
+            series["columns"] = await asyncio.to_thread(
+                downsampling.downsample,
+                series.pop("days"),
+                series["columns"],
+                points,
+                downsample)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return encoded_response(request, series)
+
+    return encoded_response(request, series, table=series.pop("columns"))
+
+
+@app.get("/simulation_results/{simulation_result_id}/columns")
+async def get_simulation_result_columns(
+        simulation_result_id: str = Path(),
+):
+    """
+    Describes the columns of a simulation result stored in the columnar
+    format.
+
+    Parameters:
+    - simulation_result_id (str): The ID of the simulation result.
+
+    Returns:
+    - dict: The number of days and name, dtype and codec of each column.
+    """
+    encoded = await database_handler.get_result_encoding(
+        simulation_result_id)
+    if encoded is None:
+        raise HTTPException(status_code=404,
+                            detail="Columnar simulation result not found.")
+
+    keys = result_codec.column_keys(encoded)
+    return {"length": encoded["length"],
+            "columns": [{"name": name,
+                         "dtype": encoded["columns"][keys[name]]["dtype"],
+                         "codec": encoded["columns"][keys[name]]["codec"]}
+                        for name in encoded["column_names"]]}
+
+
+@app.get("/simulation_results/{simulation_result_id}/columns/"
+         "{column_name:path}")
+async def get_raw_simulation_result_column(
+        simulation_result_id: str = Path(),
+        column_name: str = Path(),
+):
+    """
+    Returns one column of a simulation result as stored: a compressed
+    little-endian int64/float64 array or a compressed JSON list.
+
+    Parameters:
+    - simulation_result_id (str): The ID of the simulation result.
+    - column_name (str): The name of the column, e.g. "Kobo sim".
+
+    Returns:
+    - bytes: The compressed column. The headers X-Column-Dtype,
+      X-Column-Codec and X-Column-Length describe how to decode it.
+    """
+    column = await database_handler.get_raw_result_column(
+        simulation_result_id, column_name)
+    if column is None:
+        raise HTTPException(status_code=404,
+                            detail="Simulation result column not found.")
+
+    description, data = column
+    return Response(content=data,
+                    media_type="application/octet-stream",
+                    headers={"X-Column-Dtype": description["dtype"],
+                             "X-Column-Codec": description["codec"],
+                             "X-Column-Length": str(description["length"])})
+
+
+@app.get("/simulation_results/{simulation_result_id}/partial")
+async def get_partial_simulation_result(
+        request: Request,
+        simulation_result_id: str = Path(),
+        from_day: int = Query(0, ge=0),
+):
+    """
+    Returns the rows of a simulation result from a given day on. While the
+    simulation runs (or if it was stopped), these are the stored batches of
+    its partial result: the simulated population of every camp per day.
+    Once it is done, the rows of the complete result are returned. Clients
+    follow a running simulation by requesting the days after the last row
+    they received, e.g. on every "rows" event of the event stream.
+
+    Parameters:
+    - simulation_result_id (str): The ID of the simulation result.
+    - from_day (int, optional): The first day to return.
+
+    Returns:
+    - dict: The status of the result and its rows.
+    """
+    result = await database_handler.get("simulations_results",
+                                        simulation_result_id,
+                                        ["status"])
+    if result is None:
+        raise HTTPException(status_code=404,
+                            detail="Simulation result not found.")
+
+    if result["status"] == "done":
+        result = await database_handler.get("simulations_results",
+                                            simulation_result_id,
+                                            ["status", "data"])
+        rows = [row for row in result.get("data", [])
+                if row.get("Day", from_day) >= from_day]
+    else:
+        rows = await database_handler.get_partial_result(
+            simulation_result_id, from_day)
+    return encoded_response(request, {"status": result["status"],
+                                      "rows": rows})
+
+
+@app.get("/simulation_results/{simulation_result_id}/events")
+async def get_simulation_events(
+        simulation_result_id: str = Path(),
+):
+    """
+    Streams the progress of a simulation as Server-Sent Events, without
+    database round trips while it runs. "progress" events contain the
+    current day, the total number of days, the number of agents and the
+    elapsed seconds, "rows" events announce a stored batch of the partial
+    result (from_day, to_day). A final "status" event (done, error,
+    cancelled, timeout or killed) ends the stream; finished results only
+    get that event.
+
+    Parameters:
+    - simulation_result_id (str): The ID of the simulation result.
+
+    Returns:
+    - StreamingResponse: The event stream (text/event-stream).
+    """
+    # subscribe first, such that no event is lost during the status check
+    queue = simulation_executor.progress.subscribe(simulation_result_id)
+    if simulation_executor.progress.latest(simulation_result_id) is None:
+        result = await database_handler.get("simulations_results",
+                                            simulation_result_id,
+                                            ["status"])
+        if result is None:
+            simulation_executor.progress.unsubscribe(simulation_result_id,
+                                                     queue)
+            raise HTTPException(status_code=404,
+                                detail="Simulation result not found.")
+        if result["status"] != "running":
+            # the stream ends with this event
+            queue.put_nowait({"event": "status", "status": result["status"]})
+
+    return StreamingResponse(progress_events(simulation_result_id, queue),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache",
+                                      "X-Accel-Buffering": "no"})
+
+
+@app.post("/simulation_results/{simulation_result_id}/cancel")
+async def cancel_simulation(
+        simulation_result_id: str = Path(),
+        force: bool = Query(False),
+):
+    """
+    Cancels the simulation of a result. A queued simulation is removed from
+    the queue, a running one stops after the current simulated day, or is
+    killed right away if force is set. Its result gets the status
+    "cancelled".
+
+    Parameters:
+    - simulation_result_id (str): The ID of the simulation result.
+    - force (bool): Whether to kill the simulation without waiting.
+
+    Returns:
+    - dict: "cancelled" or "cancelling" (still stopping) as status.
+    """
+    status = await simulation_executor.cancel(simulation_result_id, force)
+    if status is None:
+        raise HTTPException(status_code=404,
+                            detail="No queued or running simulation found.")
+    return {"status": status}
 
 
 @app.delete("/simulation_results/{simulation_result_id}")
@@ -245,9 +947,12 @@ async def delete_simulation_results(
     Parameters:
     - simulation_result_id (str): The ID of the simulation result.
 
+    A running simulation of the result is killed first.
+
     Returns:
     - dict: The data of the simulation result.
     """
+    await simulation_executor.cancel(simulation_result_id, force=True)
     result = await database_handler.delete("simulations_results",
                                            simulation_result_id)
 
@@ -262,20 +967,21 @@ async def delete_simulation_results(
 
 
 @app.get("/simsettings")
-async def get_all_simsettings():
+async def get_all_simsettings(request: Request):
     """
-    Return all simsettings.
+    Return all simsettings, except those generated for parameter sweeps.
 
     Returns:
     - list: A list of all simulation settings.
     """
-    simsettings = await database_handler.get_all("simsettings")
-    return {"data": simsettings,
-            "protectedIDs": [DEFAULT_SETTING_ID]}
+    simsettings = await database_handler.get_all(
+        "simsettings", {"sweep_id": {"$exists": False}})
+    return encoded_response(request, {"data": simsettings,
+                                      "protectedIDs": [DEFAULT_SETTING_ID]})
 
 
 @app.get("/simsettings/summary")
-async def get_all_simsetting_summaries():
+async def get_all_simsetting_summaries(request: Request):
     """
     Retrieves all simsetting summaries.
     A simsetting summary contains the simsetting ID and the simsetting name.
@@ -284,8 +990,8 @@ async def get_all_simsetting_summaries():
     - list of simsetting summaries.
     """
     summary = await database_handler.get_summaries("simsettings")
-    return {"data": summary,
-            "protectedIDs": [DEFAULT_SETTING_ID]}
+    return encoded_response(request, {"data": summary,
+                                      "protectedIDs": [DEFAULT_SETTING_ID]})
 
 
 @app.get("/simsettings/{simsetting_id}")
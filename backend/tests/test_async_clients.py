@@ -0,0 +1,111 @@
+from pathlib import Path
+import asyncio
+import sys
+import threading
+import pytest
+
+# add backend directory to PYTHONPATH
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND))
+
+from controller.handler import database_handler  # noqa: E402
+
+
+class TestAsyncClients:
+    """
+    This class contains unit tests for the Motor clients of the database
+    handler, one per event loop.
+    """
+
+    @pytest.fixture
+    def handler(self, monkeypatch):
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        created = []
+
+        class Client(mongomock_motor.AsyncMongoMockClient):
+            # records the clients instead of connecting
+            def __init__(self, uri, io_loop=None, **kwargs):
+                super().__init__()
+                self.io_loop = io_loop
+                self.closed = False
+                created.append(self)
+
+            def close(self):
+                self.closed = True
+
+        monkeypatch.setenv("MONGO_URI", "mongodb://localhost:27017")
+        monkeypatch.setattr(database_handler, "AsyncIOMotorClient", Client)
+        handler = database_handler.DatabaseHandler("input", "settings")
+        handler.created = created
+        return handler
+
+    def test_crud(self, handler):
+        """
+        Documents are stored, read, listed and deleted through the client
+        of the running loop.
+        """
+        async def crud():
+            basic = {"_id": "default", "name": "default",
+                     "move_rules": {"max_move_speed": 360}}
+            object_id = await handler.post(
+                {"_id": None, "name": "fast",
+                 "move_rules": {"max_move_speed": 720}},
+                "simsettings", basic)
+            stored = await handler.get("simsettings", object_id)
+            listed = await handler.get_all("simsettings", fields=["name"])
+            deleted = await handler.delete("simsettings", object_id)
+            missing = await handler.get("simsettings", object_id)
+            return object_id, stored, listed, deleted, missing
+
+        object_id, stored, listed, deleted, missing = asyncio.run(crud())
+
+        assert stored == {"_id": object_id, "name": "fast",
+                          "move_rules": {"max_move_speed": 720}}
+        assert listed == [{"_id": object_id, "name": "fast"}]
+        assert deleted == {"status": "success"}
+        assert missing is None
+        assert len(handler.created) == 1
+
+    def test_client_per_loop(self, handler):
+        """
+        Every event loop gets a client of its own. Clients of running
+        loops are kept, those of closed loops are closed.
+        """
+        async def get_db():
+            return handler.get_async_db()
+
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        running = asyncio.run_coroutine_threadsafe(get_db(), loop).result()
+        again = asyncio.run_coroutine_threadsafe(get_db(), loop).result()
+        asyncio.run(get_db())
+        first, second = handler.created
+
+        assert again is running
+        assert first.io_loop is loop
+        assert second.io_loop is not loop
+        assert not first.closed
+
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+        asyncio.run(get_db())
+
+        assert len(handler.created) == 3
+        assert first.closed
+        assert second.closed
+        assert not handler.created[2].closed
+
+    def test_close(self, handler):
+        """
+        Closing the handler closes the clients of all loops.
+        """
+        async def get_db():
+            return handler.get_async_db()
+
+        asyncio.run(get_db())
+        asyncio.run(get_db())
+        handler.close()
+
+        assert [client.closed for client in handler.created] == [True, True]
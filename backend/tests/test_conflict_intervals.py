@@ -0,0 +1,155 @@
+from io import StringIO
+from pathlib import Path
+import random
+import sys
+import pytest
+
+# add backend directory to PYTHONPATH
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND))
+
+from controller import conflict_intervals  # noqa: E402
+from controller.handler.csv_transformer import CsvTransformer  # noqa: E402
+
+
+def dense_conflicts(days: int, zones: int, seed: int = 0):
+    """
+    Returns a dense conflict matrix with a few runs of conflict per zone.
+    """
+    rng = random.Random(seed)
+    rows = [{"Day": day} for day in range(days)]
+    for zone in range(zones):
+        value = 0
+        for row in rows:
+            if rng.random() < 0.05:
+                value = 1 - value
+            row[f"zone {zone}"] = value
+    return rows
+
+
+class TestConflictIntervals:
+    """
+    This class contains unit tests for the storage of conflicts as
+    intervals.
+    """
+
+    def test_encode(self):
+        """
+        Runs of conflict days become intervals, other values keep their
+        value.
+        """
+        rows = [{"Day": day, "A": value, "B": 0}
+                for day, value in enumerate([0, 1, 1, 2, None, 1])]
+
+        conflicts = conflict_intervals.encode_conflicts(rows)
+
+        assert conflicts == {
+            "day_column": "Day",
+            "days": 6,
+            "zones": {"A": [[1, 3], [3, 4, 2], [4, 5, None], [5, 6]],
+                      "B": []}}
+
+    @pytest.mark.parametrize("rows", [
+        [],
+        [{"Day": 0, "A": 1}, {"Day": 2, "A": 1}],
+        [{"Day": 0, "A": 1}, {"Day": 1, "B": 1}],
+        [{"Day": 0, "A": 1}, {"A": 1, "Day": 1}],
+        [{"Day": 0, "A": 0.5}],
+        [{"Day": 0, "A": True}],
+    ])
+    def test_not_encodable(self, rows):
+        """
+        Matrices which can not be encoded without loss are rejected.
+        """
+        assert conflict_intervals.encode_conflicts(rows) is None
+
+    @pytest.mark.parametrize("rows", [
+        dense_conflicts(400, 30),
+        [{"Day": day, "A": value, "B": 1}
+         for day, value in enumerate([0, None, 3, 12])],
+    ])
+    def test_same_conflicts_csv(self, rows):
+        """
+        conflicts.csv written from the intervals is identical to the one
+        written from the dense matrix.
+        """
+        transformer = CsvTransformer(None)
+        dense = transformer.render_simulation_csv(
+            {"closures": [], "conflicts": rows, "locations": [],
+             "routes": [], "sim_period": {}})
+        encoded = transformer.render_simulation_csv(
+            {"closures": [], "locations": [], "routes": [],
+             "sim_period": {},
+             "conflicts": conflict_intervals.encode_conflicts(rows)})
+
+        assert encoded == dense
+
+    def test_migration(self):
+        """
+        Dense matrices of stored inputs are replaced by intervals.
+        """
+        mongomock = pytest.importorskip("mongomock")
+        from controller.handler.database_handler import DatabaseHandler
+
+        database_handler = DatabaseHandler("input", "settings")
+        database_handler.db = mongomock.MongoClient().Caturanga
+        simulations = database_handler.db.simulations
+        dense = dense_conflicts(50, 3)
+        ragged = [{"Day": 0, "A": 1}, {"Day": 1}]
+        simulations.insert_many([{"name": "dense", "conflicts": dense},
+                                 {"name": "ragged", "conflicts": ragged}])
+
+        assert database_handler.migrate_conflict_intervals() == 1
+        assert database_handler.migrate_conflict_intervals() == 0
+        assert simulations.find_one({"name": "dense"})["conflicts"] == \
+            conflict_intervals.encode_conflicts(dense)
+        assert simulations.find_one({"name": "ragged"})["conflicts"] == \
+            ragged
+
+    def test_matrix(self):
+        """
+        The dense matrix is an int64 array unless fields are empty.
+        """
+        fieldnames, matrix = conflict_intervals.conflict_matrix(
+            {"day_column": "Day", "days": 4,
+             "zones": {"A": [[1, 3]], "B": [[3, 4, 5]]}})
+
+        assert fieldnames == ["Day", "A", "B"]
+        assert matrix.tolist() == [[0, 0, 0], [1, 1, 0], [2, 1, 0],
+                                   [3, 0, 5]]
+        assert str(matrix.dtype) == "int64"
+
+        csv_file = StringIO(newline='')
+        CsvTransformer(None).write_conflict_intervals_csv(
+            csv_file, {"day_column": "Day", "days": 2,
+                       "zones": {"A": [[0, 1, None]]}})
+        assert csv_file.getvalue() == "Day,A\r\n0,\r\n1,0"
+
+    def test_failed_migration(self, monkeypatch, caplog):
+        """
+        An input that fails to migrate is logged and skipped.
+        """
+        mongomock = pytest.importorskip("mongomock")
+        from controller.handler import database_handler
+
+        handler = database_handler.DatabaseHandler("input", "settings")
+        handler.db = mongomock.MongoClient().Caturanga
+        simulations = handler.db.simulations
+        dense = dense_conflicts(50, 3)
+        broken = [{"Day": 0, "A": "broken"}]
+        simulations.insert_many([{"name": "broken", "conflicts": broken},
+                                 {"name": "dense", "conflicts": dense}])
+
+        def encode_conflicts(rows):
+            if rows == broken:
+                raise ValueError("broken")
+            return conflict_intervals.encode_conflicts(rows)
+
+        monkeypatch.setattr(database_handler, "encode_conflicts",
+                            encode_conflicts)
+        with caplog.at_level("ERROR"):
+            assert handler.migrate_conflict_intervals() == 1
+
+        assert "Migrating the conflicts of input" in caplog.text
+        assert simulations.find_one({"name": "broken"})["conflicts"] == \
+            broken
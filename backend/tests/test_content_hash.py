@@ -0,0 +1,209 @@
+from pathlib import Path
+import asyncio
+import sys
+import pytest
+from bson import ObjectId
+
+# add backend directory to PYTHONPATH
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND))
+
+from controller.content_hash import content_hash  # noqa: E402
+from controller.handler import database_handler  # noqa: E402
+from controller.handler import result_codec  # noqa: E402
+
+INPUT = {
+    "_id": "input",
+    "name": "Nigeria",
+    "locations": [{"name": "A", "location_type": "conflict_zone"},
+                  {"name": "B", "location_type": "camp"}],
+    "routes": [{"from": "A", "to": "B", "distance": 10.0}],
+}
+
+
+class FakeBucket:
+    """
+    Records the deleted GridFS files.
+    """
+
+    deleted = []
+
+    def __init__(self, db, bucket_name):
+        pass
+
+    async def delete(self, file_id):
+        self.deleted.append(file_id)
+
+
+class TestContentHash:
+    """
+    This class contains unit tests for the content hash of inputs and
+    simsettings.
+    """
+
+    def test_top_level_keys_ignored(self):
+        """
+        The ID and name of a document do not change its hash.
+        """
+        copy = dict(INPUT, _id="copy", name="Copy of Nigeria")
+
+        assert content_hash(copy) == content_hash(INPUT)
+
+    def test_nested_keys_hashed(self):
+        """
+        Nested keys named like volatile keys, e.g. the name of a location,
+        are content.
+        """
+        renamed = dict(INPUT, locations=[
+            dict(INPUT["locations"][0]),
+            dict(INPUT["locations"][1], name="C")])
+
+        assert content_hash(renamed) != content_hash(INPUT)
+
+
+class TestResultCopies:
+    """
+    This class contains unit tests for the copies of the results of
+    identical runs.
+    """
+
+    @pytest.fixture
+    def handler(self, monkeypatch):
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        client = mongomock_motor.AsyncMongoMockClient()
+        handler = database_handler.DatabaseHandler("input", "settings")
+        handler.get_async_db = lambda: client.Caturanga
+        handler.get_db = \
+            lambda: client.Caturanga._AsyncMongoMockDatabase__database
+        monkeypatch.setattr(database_handler, "AsyncIOMotorGridFSBucket",
+                            FakeBucket)
+        monkeypatch.setattr(FakeBucket, "deleted", [])
+        return handler
+
+    @staticmethod
+    async def insert_result(handler, status, gridfs_id=None):
+        result = {"name": "source", "simulation_id": "input",
+                  "simsettings_id": "settings", "status": status,
+                  "input_hash": "hash"}
+        if gridfs_id is not None:
+            result["result"] = {"format": result_codec.FORMAT,
+                                "columns": {"A": {"gridfs_id": gridfs_id}}}
+        inserted = await handler.get_async_db().simulations_results \
+            .insert_one(result)
+        return inserted.inserted_id
+
+    def test_copy_finished_result(self, handler):
+        """
+        A finished result is copied under the IDs and name of the new run.
+        The copy only references the data of the source, which is handed
+        over to the copy when the source is deleted.
+        """
+        gridfs_id = ObjectId()
+
+        async def copy_and_delete():
+            source_id = await self.insert_result(handler, "done", gridfs_id)
+            copy_id = await handler.copy_result(source_id, "other",
+                                                "settings", "copy", "hash")
+            stored = await handler.get_async_db().simulations_results \
+                .find_one({"_id": copy_id})
+            encoding = await handler.get_result_encoding(str(copy_id))
+            await handler.delete("simulations_results", str(source_id))
+            kept = list(FakeBucket.deleted)
+            detached = await handler.get_async_db().simulations_results \
+                .find_one({"_id": copy_id})
+            await handler.delete("simulations_results", str(copy_id))
+            return source_id, stored, encoding, kept, detached
+
+        source_id, stored, encoding, kept, detached = \
+            asyncio.run(copy_and_delete())
+
+        assert stored["_id"] != source_id
+        assert stored["name"] == "copy"
+        assert stored["simulation_id"] == "other"
+        assert stored["status"] == "done"
+        assert stored["source_id"] == str(source_id)
+        assert "result" not in stored
+        assert encoding["columns"]["A"]["gridfs_id"] == gridfs_id
+        assert kept == []
+        assert "source_id" not in detached
+        assert detached["result"]["columns"]["A"]["gridfs_id"] == gridfs_id
+        assert FakeBucket.deleted == [gridfs_id]
+
+    def test_read_copy(self, handler):
+        """
+        The data of a copy is read from its source, also for copies of
+        copies.
+        """
+        rows = [{"Day": 0, "Kobo sim": 3}, {"Day": 1, "Kobo sim": 4}]
+
+        async def copy_and_read():
+            db = handler.get_async_db()
+            source_id = await self.insert_result(handler, "done")
+            await db.simulations_results.update_one(
+                {"_id": source_id},
+                {"$set": {"result": result_codec.encode_result(rows)}})
+            copy_id = await handler.copy_result(source_id, "input",
+                                                "settings", "copy", "hash")
+            second_id = await handler.copy_result(copy_id, "input",
+                                                  "settings", "copy 2",
+                                                  "hash")
+            second = await db.simulations_results.find_one(
+                {"_id": second_id})
+            read = await handler.get("simulations_results", str(second_id))
+            listed = await handler.get_all("simulations_results",
+                                           {"_id": second_id},
+                                           ["name", "data"])
+            series = await handler.get_result_series(str(second_id),
+                                                     ["Kobo sim"])
+            return source_id, second, read, listed, series
+
+        source_id, second, read, listed, series = asyncio.run(
+            copy_and_read())
+        _, columns = handler.load_result_columns(str(second["_id"]))
+
+        assert second["source_id"] == str(source_id)
+        assert read["name"] == "copy 2"
+        assert read["data"] == rows
+        assert listed[0]["data"] == rows
+        assert series["columns"]["Kobo sim"].tolist() == [3, 4]
+        assert columns["Kobo sim"].tolist() == [3, 4]
+
+    def test_copy_running_result(self, handler):
+        """
+        A copy of a running result is completed when the source finishes
+        and failed with it.
+        """
+        async def copy():
+            source_id = await self.insert_result(handler, "running")
+            copy_id = await handler.copy_result(source_id, "input",
+                                                "settings", "copy", "hash")
+            found = await handler.find_result_by_hash("hash")
+            return source_id, copy_id, found
+
+        source_id, copy_id, found = asyncio.run(copy())
+        collection = handler.get_db().simulations_results
+
+        assert found["_id"] == source_id
+        assert handler.get_running_result_ids() == [str(source_id)]
+        assert handler.complete_copies(source_id) == []
+        handler.fail_simulations([str(source_id)], "Stopped.", "cancelled")
+        assert collection.find_one({"_id": copy_id})["status"] == "cancelled"
+
+    def test_complete_copies(self, handler):
+        """
+        Copies waiting for a running result get its content once it is
+        stored.
+        """
+        async def copy():
+            source_id = await self.insert_result(handler, "running")
+            copy_id = await handler.copy_result(source_id, "input",
+                                                "settings", "copy", "hash")
+            return source_id, copy_id
+
+        source_id, copy_id = asyncio.run(copy())
+        handler.store_simulation({"error": "FLEE failed."}, str(source_id))
+
+        assert handler.complete_copies(str(source_id)) == [str(copy_id)]
+        copy = handler.get_db().simulations_results.find_one({"_id": copy_id})
+        assert copy["status"] == "error"
+        assert copy["name"] == "copy"
@@ -0,0 +1,128 @@
+from io import StringIO
+from pathlib import Path
+import sys
+
+# add backend directory to PYTHONPATH
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND))
+
+from controller.handler.csv_transformer import CsvTransformer  # noqa: E402
+
+
+def written(write, *args):
+    csv_file = StringIO(newline='')
+    write(csv_file, *args)
+    return csv_file.getvalue()
+
+
+class TestCsvTransformer:
+    """
+    This class contains unit tests for the content of the .csv files
+    written for FLEE.
+    """
+
+    transformer = CsvTransformer(None)
+
+    def test_conflicts(self):
+        """
+        The conflict matrix is written in header order without the final
+        line break.
+        """
+        data = [{"Day": day, "A": day % 2, "B": 0, "C town": 12}
+                for day in range(11)]
+        data[3] = {"C town": 7, "B": 1, "A": 0, "Day": 3}
+
+        content = written(self.transformer.write_conflicts_csv, data,
+                          data[0].keys())
+
+        lines = content.split("\r\n")
+        assert lines[0] == "Day,A,B,C town"
+        assert lines[1:5] == ["0,0,0,12", "1,1,0,12", "2,0,0,12",
+                              "3,0,1,7"]
+        assert lines[-1] == "10,0,0,12"
+
+    def test_conflicts_with_empty_values(self):
+        """
+        Empty values are written as empty fields.
+        """
+        data = [{"Day": 0, "A": None, "B": 1},
+                {"Day": 1, "A": 1, "B": ''}]
+
+        content = written(self.transformer.write_conflicts_csv, data,
+                          data[0].keys())
+
+        assert content == "Day,A,B\r\n0,,1\r\n1,1,"
+
+    def test_conflicts_with_unknown_column(self):
+        """
+        Rows with columns missing in the header are rejected.
+        """
+        data = [{"Day": 0, "A": 1}, {"Day": 1, "A": 1, "B": 0}]
+
+        message = self.transformer.write_conflicts_csv(
+            StringIO(newline=''), data, data[0].keys())
+
+        assert "'B'" in message
+
+    def test_locations(self):
+        """
+        Text is quoted, numbers are not, rows with empty values are
+        skipped.
+        """
+        fieldnames = ["name", "region", "latitude", "conflict_date",
+                      "population"]
+        data = [{"name": "A", "region": "R", "latitude": 9.5,
+                 "conflict_date": 0, "population": None},
+                {"name": "B", "region": "", "latitude": 1.0,
+                 "conflict_date": 3, "population": 10}]
+
+        content = written(self.transformer.write_locations_csv, data,
+                          fieldnames)
+
+        assert content == (
+            '"#name","region","latitude","conflict_date","population"\r\n'
+            '"A","R",9.5,0,""\r\n')
+
+    def test_routes(self):
+        """
+        Distances are truncated to int, zero redirections are left empty.
+        """
+        data = [{"from": "A", "to": "B", "distance": 12.9,
+                 "forced_redirection": 0.0},
+                {"from": "B", "to": "C", "distance": 0.0,
+                 "forced_redirection": None},
+                {"from": "C", "to": "A", "distance": -3.5,
+                 "forced_redirection": 1.0}]
+
+        content = written(self.transformer.write_routes_csv, data, None)
+
+        assert content == ("#name1,name2,distance,forced_redirection\r\n"
+                           "A,B,12,\r\nB,C,,\r\nC,A,-3,1\r\n")
+
+    def test_closures(self):
+        """
+        Numbers are truncated to int, zeros are kept as they are.
+        """
+        data = [{"closure_type": "location", "name1": "A", "name2": "B",
+                 "closure_start": 5.0, "closure_end": -1},
+                {"closure_type": "country", "name1": "C", "name2": "D",
+                 "closure_start": 0.0, "closure_end": 20}]
+
+        content = written(self.transformer.write_closures_csv, data)
+
+        assert content == (
+            "#closure_type,name1,name2,closure_start,closure_end\r\n"
+            "location,A,B,5,-1\r\ncountry,C,D,0.0,20\r\n")
+
+    def test_rows_of_different_lengths(self):
+        """
+        Rows which can not be split into columns are converted value by
+        value.
+        """
+        data = [{"from": "A", "to": "B", "distance": 2.5},
+                {"from": "B", "to": "C", "distance": 0,
+                 "forced_redirection": 1.0}]
+
+        content = written(self.transformer.write_routes_csv, data, None)
+
+        assert content.endswith("\r\nA,B,2\r\nB,C,,1\r\n")
@@ -0,0 +1,248 @@
+from pathlib import Path
+import asyncio
+import sys
+import pytest
+
+# add backend directory to PYTHONPATH
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND))
+
+from controller.handler.document_cache import DocumentCache  # noqa: E402
+from controller.handler.document_cache import SUMMARIES  # noqa: E402
+
+
+class FakeClock:
+    """
+    A clock that only moves when told to.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Loader:
+    """
+    Counts the reads of a value from the "database".
+    """
+
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+def read(cache, key, load):
+    return asyncio.run(cache.read_through(key, load))
+
+
+class TestDocumentCache:
+    """
+    This class contains unit tests for the read-through cache of
+    documents.
+    """
+
+    def test_read_through(self):
+        """
+        A document is loaded once and returned as copy.
+        """
+        cache = DocumentCache()
+        load = Loader({"_id": "a", "move_rules": {"max_move_speed": 360}})
+        key = DocumentCache.key("simsettings", "a")
+
+        first = read(cache, key, load)
+        first["move_rules"]["max_move_speed"] = 1
+        second = read(cache, key, load)
+
+        assert load.calls == 1
+        assert second["move_rules"]["max_move_speed"] == 360
+        assert cache.as_dict()["hits"] == 1
+        assert cache.as_dict()["misses"] == 1
+
+    def test_keys(self):
+        """
+        Projections are cached separately, results are not cached at all.
+        """
+        cache = DocumentCache()
+        load = Loader({"_id": "a"})
+
+        read(cache, DocumentCache.key("simulations", "a"), load)
+        read(cache, DocumentCache.key("simulations", "a", ["name"]), load)
+        read(cache, DocumentCache.key("simulations", "a", ["name"]), load)
+        read(cache, DocumentCache.key("simulations_results", "a"), load)
+        read(cache, DocumentCache.key("simulations_results", "a"), load)
+
+        assert load.calls == 4
+        assert cache.as_dict()["entries"] == 2
+
+    def test_missing_documents(self):
+        """
+        Missing documents are not cached.
+        """
+        cache = DocumentCache()
+        load = Loader(None)
+        key = DocumentCache.key("simulations", "a")
+
+        read(cache, key, load)
+        read(cache, key, load)
+
+        assert load.calls == 2
+
+    def test_lru_eviction(self):
+        """
+        The least recently used entries are evicted.
+        """
+        cache = DocumentCache(max_entries=2)
+        loads = {name: Loader({"_id": name}) for name in "abc"}
+
+        def get(name):
+            read(cache, DocumentCache.key("simulations", name), loads[name])
+
+        get("a")
+        get("b")
+        get("a")
+        get("c")
+        get("a")
+        get("b")
+
+        assert {name: load.calls for name, load in loads.items()} == \
+            {"a": 1, "b": 2, "c": 1}
+
+    def test_expiry(self):
+        """
+        Entries are read again after their time to live.
+        """
+        clock = FakeClock()
+        cache = DocumentCache(ttl_seconds=60, clock=clock)
+        load = Loader({"_id": "a"})
+        key = DocumentCache.key("simulations", "a")
+
+        read(cache, key, load)
+        clock.now = 60
+        read(cache, key, load)
+        clock.now = 61
+        read(cache, key, load)
+
+        assert load.calls == 2
+
+    def test_invalidate(self):
+        """
+        A write removes the document and the summaries of its collection.
+        """
+        cache = DocumentCache()
+        loads = {key: Loader([]) for key in [
+            DocumentCache.key("simulations", "a"),
+            DocumentCache.key("simulations", "a", ["name"]),
+            DocumentCache.key("simulations", "b"),
+            DocumentCache.key("simulations", SUMMARIES),
+            DocumentCache.key("simsettings", SUMMARIES)]}
+        for key, load in loads.items():
+            read(cache, key, load)
+
+        cache.invalidate("simulations", "a")
+        for key, load in loads.items():
+            read(cache, key, load)
+
+        assert [load.calls for load in loads.values()] == [2, 2, 1, 2, 1]
+
+    def test_write_while_loading(self):
+        """
+        A value loaded while the cache was invalidated is not cached.
+        """
+        cache = DocumentCache()
+        key = DocumentCache.key("simulations", "a")
+
+        async def outdated():
+            cache.invalidate("simulations", "a")
+            return {"_id": "a", "name": "old"}
+
+        read(cache, key, outdated)
+        load = Loader({"_id": "a", "name": "new"})
+
+        assert read(cache, key, load)["name"] == "new"
+        assert load.calls == 1
+
+    def test_handler_invalidates_on_write(self):
+        """
+        Posting an input invalidates the cached summaries.
+        """
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        from controller.handler.database_handler import DatabaseHandler
+
+        client = mongomock_motor.AsyncMongoMockClient()
+        handler = DatabaseHandler("input", "settings")
+        handler.get_async_db = lambda: client.Caturanga
+
+        async def post():
+            inserted = await client.Caturanga.simsettings.insert_one(
+                {"name": "default", "move_rules": {}})
+            basic_id = str(inserted.inserted_id)
+            before = await handler.get_summaries("simsettings")
+            await handler.get_summaries("simsettings")
+            basic = await handler.get("simsettings", basic_id)
+            await handler.post({"_id": "", "name": "copy"}, "simsettings",
+                               basic)
+            after = await handler.get_summaries("simsettings")
+            return before, after
+
+        before, after = asyncio.run(post())
+
+        assert [summary["name"] for summary in before] == ["default"]
+        assert [summary["name"] for summary in after] == ["default", "copy"]
+        assert handler.get_cache_statistics()["hits"] == 1
+
+    def test_change_streams_not_available(self, caplog):
+        """
+        Without change streams, the watcher logs that the cache relies on
+        its TTL and returns.
+        """
+        from pymongo.errors import OperationFailure
+        from controller.handler.database_handler import DatabaseHandler
+
+        class Database:
+            def watch(self, pipeline):
+                raise OperationFailure("$changeStream is only supported "
+                                       "on replica sets", code=40573)
+
+        handler = DatabaseHandler("input", "settings")
+        handler.get_async_db = Database
+
+        with caplog.at_level("WARNING"):
+            asyncio.run(handler.watch_changes())
+
+        assert "Change streams are not available" in caplog.text
+
+    def test_change_stream_retried(self, caplog):
+        """
+        Failing to connect and transient errors reopen the change stream.
+        """
+        from pymongo.errors import OperationFailure
+        from controller.handler.database_handler import DatabaseHandler
+
+        errors = [ConnectionError("no database"),
+                  OperationFailure("interrupted", code=11601),
+                  OperationFailure("not supported", code=40573)]
+
+        class Database:
+            def watch(self, pipeline):
+                raise errors.pop(0)
+
+        handler = DatabaseHandler("input", "settings")
+
+        def get_async_db():
+            if isinstance(errors[0], ConnectionError):
+                raise errors.pop(0)
+            return Database()
+
+        handler.get_async_db = get_async_db
+
+        with caplog.at_level("WARNING"):
+            asyncio.run(handler.watch_changes(retry_seconds=0))
+
+        assert errors == []
+        assert caplog.text.count("Change stream interrupted") == 2
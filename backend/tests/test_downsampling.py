@@ -0,0 +1,81 @@
+from pathlib import Path
+import sys
+import numpy as np
+import pytest
+
+# add backend directory to PYTHONPATH
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND))
+
+from controller.downsampling import downsample  # noqa: E402
+
+
+def reference_lttb(x, y, points):
+    """
+    Straightforward single-series LTTB used as reference.
+    """
+    n = len(x)
+    every = (n - 2) / (points - 2)
+    selected = [0]
+    a = 0
+    for i in range(points - 2):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        next_start, next_end = end, min(int((i + 2) * every) + 1, n)
+        if next_start >= next_end:
+            next_start, next_end = n - 1, n
+        avg_x = sum(x[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(y[next_start:next_end]) / (next_end - next_start)
+        areas = [abs((x[a] - avg_x) * (y[j] - y[a])
+                     - (x[a] - x[j]) * (avg_y - y[a]))
+                 for j in range(start, end)]
+        a = start + areas.index(max(areas))
+        selected.append(a)
+    selected.append(n - 1)
+    return selected
+
+
+class TestDownsampling:
+    """
+    This class contains unit tests for the downsampling of result series.
+    """
+
+    DAYS = list(range(1000))
+    RNG = np.random.default_rng(42)
+    COLUMNS = {"Kobo sim": RNG.integers(0, 1000, 1000).tolist(),
+               "Sekota sim": np.cumsum(RNG.normal(size=1000)).tolist()}
+
+    def test_lttb_matches_reference(self):
+        """
+        The vectorized LTTB selects the same points as the reference.
+        """
+        result = downsample(self.DAYS, self.COLUMNS, 100, "lttb")
+        for name, values in self.COLUMNS.items():
+            assert result[name]["days"] == \
+                reference_lttb(self.DAYS, values, 100)
+            assert len(result[name]["values"]) == 100
+
+    def test_minmax_keeps_extremes(self):
+        """
+        The min/max downsampling keeps global peaks and the end points.
+        """
+        result = downsample(self.DAYS, self.COLUMNS, 100, "minmax")
+        for name, values in self.COLUMNS.items():
+            assert len(result[name]["days"]) <= 100
+            assert max(values) in result[name]["values"]
+            assert min(values) in result[name]["values"]
+            assert result[name]["days"][0] == 0
+            assert result[name]["days"][-1] == 999
+
+    def test_short_series_unchanged(self):
+        """
+        Series shorter than the target are returned completely.
+        """
+        result = downsample([0, 1, 2], {"a": [1, 5, 2]}, 100)
+        assert result == {"a": {"days": [0, 1, 2], "values": [1, 5, 2]}}
+
+    def test_non_numeric_column(self):
+        """
+        Text columns cannot be downsampled.
+        """
+        with pytest.raises(ValueError):
+            downsample([0, 1], {"Date": ["2023-01-01", "2023-01-02"]}, 10)
@@ -0,0 +1,142 @@
+from pathlib import Path
+import sys
+import numpy as np
+import pytest
+
+# add backend directory to PYTHONPATH
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND))
+
+from controller import ensemble  # noqa: E402
+
+
+def replicate(values: np.ndarray):
+    """
+    Returns the columns of a replicate with the camps of values.
+    """
+    days = values.shape[0]
+    columns = {"Day": np.arange(days),
+               "Date": [f"2024-01-{day + 1:02d}" for day in range(days)]}
+    for camp in range(values.shape[1]):
+        columns[f"camp{camp} sim"] = values[:, camp]
+    return columns
+
+
+def statistic(statistics: dict, suffix: str, camps: int):
+    return np.stack([statistics[f"camp{camp} sim {suffix}"]
+                     for camp in range(camps)], axis=1)
+
+
+class TestEnsembleAccumulator:
+    """
+    This class contains unit tests for the streaming aggregation of
+    replicates.
+    """
+
+    def fold(self, data: np.ndarray, **kwargs):
+        # the state is serialized between replicates as in production
+        accumulator = ensemble.EnsembleAccumulator(**kwargs)
+        for values in data:
+            accumulator = ensemble.EnsembleAccumulator.from_bytes(
+                accumulator.to_bytes())
+            accumulator.add(replicate(values))
+        return accumulator.statistics()
+
+    def test_mean_and_std(self):
+        """
+        Mean and sample standard deviation match numpy.
+        """
+        data = np.random.default_rng(0).poisson(300, (40, 30, 4))
+        statistics = self.fold(data.astype(float))
+
+        assert np.allclose(statistic(statistics, "mean", 4), data.mean(0))
+        assert np.allclose(statistic(statistics, "std", 4),
+                           data.std(0, ddof=1))
+        assert statistics["Day"] == list(range(30))
+        assert statistics["Date"][0] == "2024-01-01"
+
+    def test_exact_quantiles_of_few_replicates(self):
+        """
+        The quantiles of up to exact_replicates replicates are exact.
+        """
+        data = np.random.default_rng(1).normal(100, 20, (8, 10, 3))
+        statistics = self.fold(data, exact_replicates=8)
+
+        for p in ensemble.QUANTILES:
+            label = ensemble.quantile_label(p)
+            assert np.allclose(statistic(statistics, label, 3),
+                               np.quantile(data, p, axis=0))
+
+    def test_estimated_quantiles(self):
+        """
+        The P² estimates of many replicates are close to the exact
+        quantiles.
+        """
+        data = np.random.default_rng(2).normal(100, 20, (1000, 20, 5))
+        statistics = self.fold(data, exact_replicates=5)
+
+        for p in ensemble.QUANTILES:
+            label = ensemble.quantile_label(p)
+            error = np.abs(statistic(statistics, label, 5)
+                           - np.quantile(data, p, axis=0))
+            assert error.mean() < 0.05 * 20
+
+    def test_state_size_is_bounded(self):
+        """
+        The state does not grow with the number of replicates once the
+        sketches took over.
+        """
+        rng = np.random.default_rng(3)
+        accumulator = ensemble.EnsembleAccumulator(exact_replicates=5)
+        sizes = []
+        for _ in range(60):
+            accumulator.add(replicate(rng.normal(100, 20, (50, 4))))
+            sizes.append(len(accumulator.to_bytes()))
+        assert max(sizes[10:]) < 1.2 * sizes[10]
+        assert accumulator.sample is None
+
+    def test_single_replicate(self):
+        """
+        A single replicate has no spread.
+        """
+        data = np.array([[[1.0, 2.0], [3.0, 4.0]]])
+        statistics = self.fold(data)
+
+        assert np.array_equal(statistic(statistics, "std", 2),
+                              np.zeros((2, 2)))
+        assert np.array_equal(statistic(statistics, "p95", 2), data[0])
+
+    def test_mismatching_replicate(self):
+        """
+        Replicates must have the columns and days of the first one.
+        """
+        accumulator = ensemble.EnsembleAccumulator()
+        accumulator.add(replicate(np.ones((5, 2))))
+        with pytest.raises(ValueError):
+            accumulator.add(replicate(np.ones((6, 2))))
+        with pytest.raises(ValueError):
+            accumulator.add(replicate(np.ones((5, 3))))
+        assert accumulator.count == 1
+
+    def test_columns_from_rows(self):
+        """
+        Numeric columns of FLEE rows become arrays, others stay lists.
+        """
+        columns = ensemble.columns_from_rows([
+            {"Day": 0, "Date": "2024-01-01", "A sim": 1.5},
+            {"Day": 1, "Date": "2024-01-02", "A sim": 2}])
+
+        assert columns["Day"].dtype == np.int64
+        assert columns["A sim"].tolist() == [1.5, 2.0]
+        assert columns["Date"] == ["2024-01-01", "2024-01-02"]
+
+    def test_mixed_number_column(self):
+        """
+        Stored columns mixing ints and floats, decoded as lists, are
+        folded like arrays.
+        """
+        accumulator = ensemble.EnsembleAccumulator()
+        accumulator.add({"Day": [0, 1], "A sim": [1, 2.5]})
+        accumulator.add({"Day": [0, 1], "A sim": np.array([3.0, 4.5])})
+
+        assert accumulator.statistics()["A sim mean"].tolist() == [2.0, 3.5]
@@ -0,0 +1,77 @@
+from pathlib import Path
+import socket
+import sys
+import pytest
+
+# add backend directory to PYTHONPATH
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND))
+
+from controller.handler.filesystem_handler import FileSystemHandler  # noqa
+
+
+class TestWorkspaces:
+    """
+    This class contains unit tests for the scratch directories of runs.
+    """
+
+    @pytest.fixture
+    def handler(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("SIMULATION_SCRATCH_DIR", str(tmp_path))
+        return FileSystemHandler()
+
+    def test_separate_workspaces(self, handler, tmp_path):
+        """
+        Every run gets its own directory, removed after the run.
+        """
+        first = handler.create_workspace()
+        second = handler.create_workspace()
+        (first / "out.csv").write_text("first")
+
+        assert first != second
+        assert first.parent == second.parent == tmp_path / "caturanga-runs"
+        assert not (second / "out.csv").exists()
+
+        handler.remove_workspace(first)
+        assert not first.exists()
+        assert second.exists()
+
+    def test_stage_input_files(self, handler, tmp_path):
+        """
+        Input files are copied, changes do not reach the input cache.
+        """
+        cached = tmp_path / "cache"
+        (cached / "input").mkdir(parents=True)
+        (cached / "input" / "routes.csv").write_bytes(b"#name1,name2\r\n")
+        (cached / "validation").mkdir()
+        (cached / "validation" / "data_layout.csv").write_text("")
+        (cached / "simsettings.yml").write_text("log_levels: {}\n")
+        workspace = handler.create_workspace()
+
+        paths = handler.stage_input_files(workspace,
+                                          cached / "input",
+                                          cached / "simsettings.yml",
+                                          cached / "validation")
+        Path(paths["simulation_dir"], "routes.csv").write_text("changed")
+
+        assert Path(paths["simsettings_filename"]).read_text() == \
+            "log_levels: {}\n"
+        assert Path(paths["validation_dir"], "data_layout.csv").exists()
+        assert (cached / "input" / "routes.csv").read_bytes() == \
+            b"#name1,name2\r\n"
+
+    def test_remove_stale_workspaces(self, handler):
+        """
+        Directories of processes that no longer run are removed.
+        """
+        own = handler.create_workspace()
+        stale = handler.scratch_root / \
+            f"run-{socket.gethostname()}-999999999-0"
+        stale.mkdir()
+        other_host = handler.scratch_root / "run-elsewhere-999999999-0"
+        other_host.mkdir()
+
+        assert handler.remove_stale_workspaces() == 1
+        assert own.exists()
+        assert not stale.exists()
+        assert other_host.exists()
@@ -0,0 +1,112 @@
+from pathlib import Path
+import asyncio
+import gzip
+import sys
+import pytest
+
+# add backend directory to PYTHONPATH
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND))
+
+from controller import http_encoding  # noqa: E402
+
+
+class TestHttpEncoding:
+    """
+    This class contains unit tests for the entity tags and content codings
+    of API responses.
+    """
+
+    @pytest.mark.parametrize("accept_encoding, expected", [
+        (None, None),
+        ("", None),
+        ("identity", None),
+        ("gzip, deflate", "gzip"),
+        ("GZIP;q=0.5", "gzip"),
+        ("gzip;q=0", None),
+        ("*", "gzip"),
+        ("*;q=0, gzip", "gzip"),
+    ])
+    def test_negotiate_gzip(self, accept_encoding, expected, monkeypatch):
+        """
+        gzip is sent if it is accepted with a positive weight.
+        """
+        monkeypatch.setattr(http_encoding, "brotli", None)
+
+        assert http_encoding.negotiate_encoding(accept_encoding) == expected
+
+    def test_negotiate_brotli(self, monkeypatch):
+        """
+        Brotli is preferred if installed, unless it has a lower weight.
+        """
+        monkeypatch.setattr(http_encoding, "brotli", object())
+
+        assert http_encoding.negotiate_encoding("gzip, br") == "br"
+        assert http_encoding.negotiate_encoding("gzip, br;q=0.5") == "gzip"
+
+    def test_compress_gzip(self):
+        """
+        gzip bodies are decompressed to the original and do not depend on
+        the time of compression.
+        """
+        body = b'{"data": [' + b"1, " * 1000 + b"1]}"
+
+        compressed = http_encoding.compress(body, "gzip")
+
+        assert gzip.decompress(compressed) == body
+        assert compressed == http_encoding.compress(body, "gzip")
+        assert len(compressed) < len(body) // 10
+
+    def test_tags(self):
+        """
+        The tags of all codings of a document match If-None-Match.
+        """
+        tags = [http_encoding.representation_tag("abc", encoding)
+                for encoding in (None, "gzip", "br")]
+
+        assert tags == ['"abc"', '"abc-gzip"', '"abc-br"']
+        assert http_encoding.requested_tags(", ".join(tags)) == {"abc"}
+        assert http_encoding.requested_tags('W/"def", *') == {"def", "*"}
+        assert http_encoding.requested_tags(None) == set()
+
+    def test_known_result_is_not_decoded(self):
+        """
+        The tag of a result is computed from the stored document, which is
+        only decoded if the tag is not known.
+        """
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        from controller.handler.database_handler import DatabaseHandler
+
+        client = mongomock_motor.AsyncMongoMockClient()
+        handler = DatabaseHandler("input", "settings")
+        handler.get_async_db = lambda: client.Caturanga
+        decoded = []
+
+        async def decode_result(document):
+            decoded.append(document["_id"])
+            return document
+
+        handler.decode_result = decode_result
+
+        async def get():
+            inserted = await client.Caturanga.simulations_results.insert_one(
+                {"status": "done", "data": [{"Day": 0}]})
+            result_id = str(inserted.inserted_id)
+            first = await handler.get_tagged("simulations_results",
+                                             result_id)
+            known = await handler.get_tagged("simulations_results",
+                                             result_id,
+                                             known_tags={first[0]})
+            status = await handler.get_tagged("simulations_results",
+                                              result_id, ["status"],
+                                              known_tags={first[0]})
+            return result_id, first, known, status
+
+        result_id, first, known, status = asyncio.run(get())
+
+        assert first[1] == {"_id": result_id, "status": "done",
+                            "data": [{"Day": 0}]}
+        assert known == (first[0], None)
+        assert status[0] != first[0]
+        assert status[1] == {"_id": result_id, "status": "done"}
+        assert decoded == [result_id, result_id]
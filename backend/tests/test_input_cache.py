@@ -0,0 +1,121 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import os
+import sys
+import time
+import pytest
+
+# add backend directory to PYTHONPATH
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND))
+
+from controller.handler import input_cache  # noqa: E402
+from controller.handler.input_cache import InputCache  # noqa: E402
+
+
+class TestInputCache:
+    """
+    This class contains unit tests for the content-addressed cache of
+    FLEE input directories.
+    """
+
+    def test_reuse(self, tmp_path):
+        """
+        A directory is rendered once and reused for the same key.
+        """
+        cache = InputCache(tmp_path, 2**20)
+        calls = []
+
+        def render():
+            calls.append(1)
+            return {"routes.csv": "#name1,name2\r\nA,B\r\n"}
+
+        first = cache.materialize("input-a", render)
+        second = cache.materialize("input-a", render)
+
+        assert first == second == tmp_path / "input-a"
+        assert len(calls) == 1
+        assert (first / "routes.csv").read_bytes() == \
+            b"#name1,name2\r\nA,B\r\n"
+
+    def test_concurrent_writers(self, tmp_path):
+        """
+        Writers of the same key end up with one complete directory and
+        leave no temporary directories behind.
+        """
+        cache = InputCache(tmp_path, 2**20)
+
+        def render():
+            time.sleep(0.01)
+            return {f"{i}.csv": str(i) * 100 for i in range(5)}
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            directories = list(pool.map(
+                lambda _: cache.materialize("input-a", render), range(8)))
+
+        assert set(directories) == {tmp_path / "input-a"}
+        assert sorted(entry.name for entry in tmp_path.iterdir()) == \
+            ["input-a"]
+        assert len(list(directories[0].iterdir())) == 5
+
+    def test_failed_render(self, tmp_path):
+        """
+        A failing render leaves neither the directory nor a temporary one.
+        """
+        cache = InputCache(tmp_path, 2**20)
+
+        def render():
+            raise KeyError("conflicts")
+
+        with pytest.raises(KeyError):
+            cache.materialize("input-a", render)
+        assert list(tmp_path.iterdir()) == []
+
+    def test_lru_eviction(self, tmp_path):
+        """
+        The least recently used directories are removed once the cache
+        exceeds its size.
+        """
+        cache = InputCache(tmp_path, 250)
+        for key in ("a", "b"):
+            cache.materialize(key, lambda: {"data.csv": "x" * 100})
+        past = time.time() - 60
+        os.utime(tmp_path / "a", (past, past))
+        os.utime(tmp_path / "b", (past + 1, past + 1))
+        # a is used again, b becomes the least recently used
+        cache.materialize("a", lambda: {})
+
+        cache.materialize("c", lambda: {"data.csv": "x" * 100})
+
+        assert sorted(entry.name for entry in tmp_path.iterdir()) == \
+            ["a", "c"]
+        assert cache.size() == (2, 200)
+
+    def test_keeps_new_directory(self, tmp_path):
+        """
+        A directory larger than the cache is still kept until the next one
+        is written.
+        """
+        cache = InputCache(tmp_path, 10)
+        cache.materialize("a", lambda: {"data.csv": "x" * 100})
+        assert (tmp_path / "a").is_dir()
+
+        cache.materialize("b", lambda: {"data.csv": "x" * 100})
+        assert sorted(entry.name for entry in tmp_path.iterdir()) == ["b"]
+
+    def test_stale_temporary_directories(self, tmp_path, monkeypatch):
+        """
+        Temporary directories of crashed writers are removed.
+        """
+        monkeypatch.setattr(input_cache, "STALE_SECONDS", 10)
+        stale = tmp_path / ".tmp-input-a-1"
+        stale.mkdir()
+        past = time.time() - 60
+        os.utime(stale, (past, past))
+        fresh = tmp_path / ".tmp-input-b-2"
+        fresh.mkdir()
+
+        InputCache(tmp_path, 2**20).evict()
+
+        assert not stale.exists()
+        assert fresh.exists()
@@ -0,0 +1,201 @@
+from pathlib import Path
+from types import SimpleNamespace
+import asyncio
+import csv
+import sys
+import threading
+import pytest
+
+# add backend directory to PYTHONPATH
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND))
+
+from controller.handler import filesystem_handler  # noqa: E402
+from controller.handler.filesystem_handler import FileSystemHandler  # noqa
+from controller.handler.input_cache import InputCache  # noqa: E402
+
+SIMULATION = {
+    "_id": "65a000000000000000000001",
+    "name": "test",
+    "closures": [{"closure_type": "location", "name1": "A", "name2": "B",
+                  "closure_start": 0, "closure_end": 5.0}],
+    "conflicts": [{"#Days": 0, "A": 1, "B": ""},
+                  {"#Days": 1, "A": 1, "B": 0}],
+    "locations": [{"name": "A", "region": "R", "country": "C",
+                   "latitude": 1.5, "longitude": 2, "location_type":
+                   "conflict_zone", "conflict_date": 0, "population": 10},
+                  {"name": "Kobö", "region": "R", "country": "C",
+                   "latitude": 1.5, "longitude": 2.25, "location_type":
+                   "camp", "conflict_date": 0, "population": 0},
+                  {"name": "C", "region": "R", "country": "C",
+                   "latitude": 0, "longitude": 0, "location_type": "town",
+                   "conflict_date": "", "population": 5}],
+    "routes": [{"from": "A", "to": "Kobö", "distance": 12.5,
+                "forced_redirection": 0.0}],
+    "sim_period": {"date": "2023-01-30T00:00:00", "length": 10},
+}
+SIMSETTINGS = {"_id": "65a000000000000000000002",
+               "name": "default",
+               "move_rules": {"max_move_speed": 360}}
+
+
+class TestInputFiles:
+    """
+    This class contains unit tests for running FLEE on input files rendered
+    from the stored documents into the scratch directory of a run.
+    """
+
+    @pytest.fixture
+    def handler(self, tmp_path):
+        handler = FileSystemHandler()
+        handler.backend_root_dir = tmp_path
+        handler.csv_transformer.backend_root_dir = tmp_path
+        handler.input_cache = InputCache(tmp_path / "input_cache", 2**20)
+        return handler
+
+    def write(self, handler, tmp_path):
+        workspace = tmp_path / "run"
+        workspace.mkdir()
+        return handler.write_input_files(workspace, SIMULATION, SIMSETTINGS)
+
+    @pytest.mark.asyncio
+    async def test_same_content_as_files(self, handler, tmp_path):
+        """
+        The files of the scratch directory are byte-identical to the ones
+        of the input cache.
+        """
+        paths = self.write(handler, tmp_path)
+        files = [Path(paths["simsettings_filename"]),
+                 *Path(paths["simulation_dir"]).iterdir(),
+                 *Path(paths["validation_dir"]).iterdir()]
+        simsettings_filename = \
+            await handler.store_simsettings_to_filesystem(SIMSETTINGS)
+        simulation_dir = \
+            await handler.store_simulation_to_filesystem(SIMULATION)
+        validation_dir = await handler.store_validation_to_filesystem()
+        written = {path: path.read_bytes()
+                   for path in [simsettings_filename,
+                                *simulation_dir.iterdir(),
+                                *validation_dir.iterdir()]}
+
+        assert len(files) == len(written) == 7
+        assert sorted(path.read_bytes() for path in files) == \
+            sorted(written.values())
+
+    def test_write_input_files(self, handler, tmp_path):
+        """
+        The input files are written to the scratch directory only.
+        """
+        paths = self.write(handler, tmp_path)
+
+        simulation_dir = Path(paths["simulation_dir"])
+        assert simulation_dir.parent == tmp_path / "run"
+        assert (simulation_dir / "routes.csv").is_file()
+        assert Path(paths["simsettings_filename"]).is_file()
+        assert Path(paths["validation_dir"], "data_layout.csv").is_file()
+        with open(simulation_dir / "locations.csv", newline="",
+                  encoding="utf-8") as csv_file:
+            rows = list(csv.reader(csv_file))
+        assert rows[2][0] == "Kobö"
+        assert not handler.backend_root_dir.joinpath(
+            "flee_stored_files").exists()
+
+    def test_flee_reads_input_files(self, handler, tmp_path):
+        """
+        FLEE simulates the written input files.
+        """
+        adapter = pytest.importorskip("flee_adapter.adapter")
+        paths = self.write(handler, tmp_path)
+
+        result = adapter.Adapter().run_simulation_config(
+            paths["simulation_dir"],
+            paths["simsettings_filename"],
+            paths["validation_dir"])
+
+        assert "error" not in result
+
+
+class TestStageInputFiles:
+    """
+    This class contains unit tests for copying the input files of a run
+    from the input cache into its scratch directory.
+    """
+
+    @pytest.fixture
+    def executor(self, tmp_path):
+        from controller.simulation_executor import SimulationExecutor
+
+        async def get(collection_name, object_id):
+            return {"simulations": SIMULATION,
+                    "simsettings": SIMSETTINGS}[collection_name]
+
+        executor = SimulationExecutor(SimpleNamespace(get=get))
+        executor.input_mode = "files"
+        handler = executor.file_system_handler
+        handler.backend_root_dir = tmp_path
+        handler.csv_transformer.backend_root_dir = tmp_path
+        handler.input_cache = InputCache(tmp_path / "input_cache", 2**20)
+        executor._loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=executor._loop.run_forever,
+                                  daemon=True)
+        thread.start()
+        yield executor
+        executor._loop.call_soon_threadsafe(executor._loop.stop)
+        thread.join()
+
+    def submit(self, executor):
+        paths = asyncio.run_coroutine_threadsafe(
+            executor.materialize(SIMULATION, SIMSETTINGS),
+            executor._loop).result()
+        return {"simulation_id": SIMULATION["_id"],
+                "simsettings_id": SIMSETTINGS["_id"],
+                "objectid": "65a000000000000000000003",
+                **{path: str(value) for path, value in paths.items()}}
+
+    def test_stage(self, executor, tmp_path):
+        """
+        The cached files are copied into the scratch directory.
+        """
+        payload = self.submit(executor)
+        workspace = tmp_path / "run"
+        workspace.mkdir()
+
+        staged = executor._stage_input(payload, workspace)
+
+        assert Path(staged["simulation_dir"]) == workspace / "input"
+        for name in ("locations.csv", "routes.csv"):
+            assert (workspace / "input" / name).read_bytes() == \
+                (Path(payload["simulation_dir"]) / name).read_bytes()
+
+    def test_evicted_while_staging(self, executor, tmp_path, monkeypatch):
+        """
+        Input files evicted from the cache while they are copied are
+        written again and copied once more.
+        """
+        payload = self.submit(executor)
+        workspace = tmp_path / "run"
+        workspace.mkdir()
+        cache = executor.file_system_handler.input_cache
+        copytree = filesystem_handler.shutil.copytree
+        calls = []
+
+        def evict_and_copy(source, destination):
+            calls.append(source)
+            if len(calls) == 2:
+                # another run fills the cache while the input is copied
+                cache.max_bytes = 0
+                cache.evict()
+                cache.max_bytes = 2**20
+            return copytree(source, destination)
+
+        monkeypatch.setattr(filesystem_handler.shutil, "copytree",
+                            evict_and_copy)
+        staged = executor._stage_input(payload, workspace)
+
+        assert len(calls) == 4
+        for path in ("simulation_dir", "validation_dir"):
+            assert Path(payload[path]).is_dir()
+        assert sorted(path.name for path in workspace.iterdir()) == \
+            ["input", "simsettings.yml", "validation"]
+        assert (Path(staged["validation_dir"]) / "data_layout.csv").is_file()
+        assert len(list(Path(staged["simulation_dir"]).iterdir())) == 5
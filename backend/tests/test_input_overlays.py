@@ -0,0 +1,147 @@
+from pathlib import Path
+import asyncio
+import sys
+import pytest
+
+# add backend directory to PYTHONPATH
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND))
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from controller.content_hash import content_hash  # noqa: E402
+from controller.handler.database_handler import DatabaseHandler  # noqa: E402
+
+BASIC_INPUT = {
+    "name": "Nigeria",
+    "region": "Nigeria",
+    "locations": [{"name": "A", "location_type": "conflict_zone"}],
+    "routes": [{"from": "A", "to": "B", "distance": 10.0}],
+    "sim_period": {"date": "2023-01-01", "length": 30},
+    "validation": {"camps": {"B": [{"date": "2023-01-01",
+                                    "refugee_numbers": "12"}]}},
+}
+
+
+class TestInputOverlays:
+    """
+    This class contains unit tests for inputs stored as overlay on their
+    parent.
+    """
+
+    @pytest.fixture
+    def handler(self):
+        client = mongomock_motor.AsyncMongoMockClient()
+        handler = DatabaseHandler("input", "settings")
+        handler.get_async_db = lambda: client.Caturanga
+        return handler
+
+    async def post_variant(self, handler, data):
+        collection = handler.get_async_db().simulations
+        inserted = await collection.insert_one(dict(BASIC_INPUT))
+        basic_input = await handler.get("simulations",
+                                        str(inserted.inserted_id))
+        variant_id = await handler.post(dict(data, _id=""), "simulations",
+                                        basic_input)
+        return str(inserted.inserted_id), variant_id
+
+    def test_post_stores_changes(self, handler):
+        """
+        Only changed fields are stored, the input reads like a copy.
+        """
+        sim_period = {"date": "2023-02-01", "length": 10}
+
+        async def post():
+            parent_id, variant_id = await self.post_variant(
+                handler, {"name": "variant", "sim_period": sim_period,
+                          "routes": BASIC_INPUT["routes"]})
+            stored = await handler.get_async_db().simulations.find_one(
+                {"name": "variant"})
+            variant = await handler.get("simulations", variant_id)
+            return parent_id, variant_id, stored, variant
+
+        parent_id, variant_id, stored, variant = asyncio.run(post())
+
+        assert set(stored) == {"_id", "name", "sim_period", "parent_id"}
+        assert stored["parent_id"] == parent_id
+        copy = dict(BASIC_INPUT, name="variant", sim_period=sim_period)
+        assert variant == dict(copy, _id=variant_id, parent_id=parent_id)
+        assert content_hash(variant) == content_hash(copy)
+
+    def test_reads(self, handler):
+        """
+        Projections, lists and summaries resolve the parent, which is
+        fetched once.
+        """
+        async def read():
+            parent_id, variant_id = await self.post_variant(
+                handler, {"name": "variant"})
+            fields = await handler.get("simulations", variant_id,
+                                       ["name", "locations"])
+            documents = await handler.get_all("simulations")
+            summaries = await handler.get_summaries("simulations")
+            return parent_id, variant_id, fields, documents, summaries
+
+        parent_id, variant_id, fields, documents, summaries = \
+            asyncio.run(read())
+
+        assert fields == {"_id": variant_id, "name": "variant",
+                          "locations": BASIC_INPUT["locations"],
+                          "parent_id": parent_id}
+        assert [document["routes"] for document in documents] == \
+            [BASIC_INPUT["routes"]] * 2
+        assert summaries[1]["locations"] == BASIC_INPUT["locations"]
+        assert "validation" not in summaries[1]
+        assert list(handler._parents) == [parent_id]
+
+    def test_delete_parent(self, handler):
+        """
+        Overlays become complete documents before their parent is deleted.
+        """
+        async def delete():
+            parent_id, variant_id = await self.post_variant(
+                handler, {"name": "variant"})
+            await handler.get("simulations", variant_id)
+            deleted = await handler.delete("simulations", parent_id)
+            variant = await handler.get_async_db().simulations.find_one({})
+            return deleted, variant
+
+        deleted, variant = asyncio.run(delete())
+
+        assert deleted == {"status": "success"}
+        assert "parent_id" not in variant
+        assert variant["locations"] == BASIC_INPUT["locations"]
+        assert variant["name"] == "variant"
+        assert not handler._parents
+
+    def test_parent_fields_are_copies(self, handler):
+        """
+        Changing a resolved input does not change the kept parent.
+        """
+        async def read():
+            await self.post_variant(handler, {"name": "variant"})
+            stored = await handler.get_async_db().simulations.find_one(
+                {"name": "variant"})
+            variant = await handler.resolve_overlay(dict(stored))
+            variant["locations"].append({"name": "B"})
+            return await handler.resolve_overlay(dict(stored))
+
+        variant = asyncio.run(read())
+
+        assert variant["locations"] == BASIC_INPUT["locations"]
+
+    def test_missing_parent(self, handler, caplog):
+        """
+        An input whose parent is missing is returned unresolved and logged.
+        """
+        async def read():
+            inserted = await handler.get_async_db().simulations.insert_one(
+                {"name": "orphan", "parent_id": "65a000000000000000000009"})
+            return await handler.get("simulations",
+                                     str(inserted.inserted_id))
+
+        with caplog.at_level("WARNING"):
+            orphan = asyncio.run(read())
+
+        assert "locations" not in orphan
+        assert "Parent 65a000000000000000000009" in caplog.text
@@ -0,0 +1,240 @@
+from bson import ObjectId
+from datetime import datetime, timedelta
+from pathlib import Path
+import sys
+import time
+import pytest
+
+# add backend directory to PYTHONPATH
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND))
+
+mongomock = pytest.importorskip("mongomock")
+
+from controller.job_queue import JobQueue  # noqa: E402
+
+
+class FakeClock:
+    """
+    A clock that only moves when told to.
+    """
+
+    def __init__(self):
+        self.now = datetime(2024, 1, 1)
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += timedelta(seconds=seconds)
+
+
+class TestJobQueue:
+    """
+    This class contains unit tests for the persistent simulation job queue,
+    using mongomock as stand-in for MongoDB.
+    """
+
+    def create_queue(self, **kwargs):
+        self.clock = FakeClock()
+        collection = mongomock.MongoClient().Caturanga.simulation_jobs
+        return JobQueue(collection, lease_seconds=60, clock=self.clock,
+                        **kwargs)
+
+    def test_lease_order(self):
+        """
+        Jobs are leased by priority first and age second.
+        """
+        queue = self.create_queue()
+        first = queue.enqueue("a", {})
+        self.clock.advance(1)
+        second = queue.enqueue("b", {})
+        self.clock.advance(1)
+        urgent = queue.enqueue("c", {}, priority=5)
+
+        assert queue.queue_position(urgent) == 1
+        assert queue.queue_position(first) == 2
+        assert queue.queue_position(second) == 3
+        assert [queue.lease("worker")["_id"] for _ in range(3)] == \
+            [urgent, first, second]
+        assert queue.lease("worker") is None
+
+    def test_lease_is_exclusive(self):
+        """
+        A job is leased by one worker only, until it is completed.
+        """
+        queue = self.create_queue()
+        job_id = queue.enqueue("a", {})
+        job = queue.lease("worker-1")
+        assert job["_id"] == job_id
+        assert job["attempts"] == 1
+        assert queue.lease("worker-2") is None
+
+        assert not queue.complete(job_id, "worker-2")
+        assert queue.complete(job_id, "worker-1")
+        assert queue.count("done") == 1
+
+    def test_heartbeat_keeps_lease(self):
+        """
+        Jobs with regular heartbeats are not requeued.
+        """
+        queue = self.create_queue()
+        job_id = queue.enqueue("a", {})
+        queue.lease("worker")
+        for _ in range(5):
+            self.clock.advance(30)
+            assert queue.heartbeat(job_id, "worker")
+            queue.requeue_expired()
+        assert queue.count("leased") == 1
+
+    def test_recovery_after_crash(self):
+        """
+        The job of a crashed worker is resumed by another worker as soon
+        as its lease expired and the lost worker cannot complete it.
+        """
+        queue = self.create_queue()
+        job_id = queue.enqueue("a", {"simulation_id": "1"})
+        queue.lease("crashed")
+
+        self.clock.advance(59)
+        queue.requeue_expired()
+        assert queue.lease("worker") is None
+
+        self.clock.advance(2)
+        assert queue.requeue_expired() == []
+        job = queue.lease("worker")
+        assert job["_id"] == job_id
+        assert job["payload"] == {"simulation_id": "1"}
+        assert job["attempts"] == 2
+        assert not queue.heartbeat(job_id, "crashed")
+        assert not queue.complete(job_id, "crashed")
+        assert queue.complete(job_id, "worker")
+
+    def test_max_attempts(self):
+        """
+        Jobs whose lease expired max_attempts times are failed.
+        """
+        queue = self.create_queue(max_attempts=2)
+        queue.enqueue("a", {})
+        for _ in range(2):
+            queue.lease("crashed")
+            self.clock.advance(61)
+            failed = queue.requeue_expired()
+        assert [job["result_id"] for job in failed] == ["a"]
+        assert queue.count("failed") == 1
+        assert queue.active_result_ids() == set()
+
+    def test_cancel(self):
+        """
+        Queued jobs are cancelled right away, leased jobs are flagged for
+        the worker holding the lease.
+        """
+        queue = self.create_queue()
+        queued = queue.enqueue("a", {})
+        running = queue.enqueue("b", {}, priority=1)
+        queue.lease("worker")
+
+        assert queue.request_cancel("a")["status"] == "cancelled"
+        assert queue.queue_position(queued) == 0
+        assert queue.request_cancel("b", force=True)["status"] == "leased"
+        assert queue.cancel_requests("other") == {}
+        assert queue.cancel_requests("worker") == {running: True}
+        assert queue.fail(running, "worker", "cancelled", "cancelled")
+        assert queue.request_cancel("b") is None
+        assert queue.count("cancelled") == 2
+
+    def test_throughput(self):
+        """
+        Enqueueing, leasing and completing 200 jobs by several workers
+        runs every job exactly once. The time bound is loose, since
+        mongomock scans the whole collection for every operation.
+        """
+        queue = self.create_queue()
+        jobs = 200
+        start = time.perf_counter()
+        for i in range(jobs):
+            queue.enqueue(str(i), {}, priority=i % 3)
+
+        leased = []
+        while True:
+            batch = [queue.lease(f"worker-{i}") for i in range(4)]
+            batch = [job for job in batch if job is not None]
+            if not batch:
+                break
+            for job in batch:
+                assert queue.complete(job["_id"], job["lease_owner"])
+                leased.append(job["result_id"])
+        elapsed = time.perf_counter() - start
+
+        assert sorted(leased) == sorted(str(i) for i in range(jobs))
+        assert queue.count("done") == jobs
+        assert elapsed < jobs / 20
+
+
+class TestReconcile:
+    """
+    This class contains unit tests for the recovery of the simulation queue
+    at startup of the API.
+    """
+
+    def test_reconcile(self):
+        """
+        Expired jobs are resumed, running results without a job are failed.
+        """
+        from controller.handler.database_handler import DatabaseHandler
+        from controller.simulation_executor import SimulationExecutor
+
+        database_handler = DatabaseHandler("input", "settings")
+        database_handler.db = mongomock.MongoClient().Caturanga
+        executor = SimulationExecutor(database_handler)
+        executor.lease_seconds = 0
+        results = database_handler.db.simulations_results
+        started = datetime.utcnow() - timedelta(minutes=5)
+        resumed = ObjectId.from_datetime(started)
+        orphaned = ObjectId.from_datetime(started + timedelta(seconds=1))
+        results.insert_many([{"_id": resumed, "status": "running"},
+                             {"_id": orphaned, "status": "running"}])
+
+        queue = executor._get_job_queue()
+        job_id = queue.enqueue(str(resumed), {})
+        queue.lease("crashed")
+        time.sleep(0.01)
+
+        assert executor.reconcile() == {"failed": [],
+                                        "orphaned": [str(orphaned)]}
+        assert queue.queue_position(job_id) == 1
+        assert results.find_one(resumed)["status"] == "running"
+        assert results.find_one(orphaned)["status"] == "error"
+
+    def test_failed_migration(self, caplog):
+        """
+        Failing index creation and migration are logged and do not hold
+        up leasing.
+        """
+        from controller.handler.database_handler import DatabaseHandler
+        from controller.simulation_executor import SimulationExecutor
+
+        database_handler = DatabaseHandler("input", "settings")
+        database_handler.db = mongomock.MongoClient().Caturanga
+
+        def fail():
+            raise ConnectionError("no database")
+
+        database_handler.ensure_indexes = fail
+        database_handler.migrate_conflict_intervals = fail
+        executor = SimulationExecutor(database_handler)
+        job_id = executor._get_job_queue().enqueue(str(ObjectId()), {})
+        leased = []
+
+        def run_job(job):
+            leased.append(job["_id"])
+            executor._stopping.set()
+
+        executor._run_job = run_job
+        with caplog.at_level("ERROR"):
+            executor._maintain_database()
+        executor._dispatch_loop()
+
+        assert "Creating the indexes failed" in caplog.text
+        assert "Migrating the stored conflicts failed" in caplog.text
+        assert leased == [job_id]
@@ -0,0 +1,124 @@
+from fastapi.testclient import TestClient
+from pathlib import Path
+import asyncio
+import json
+import sys
+import pytest
+from bson import ObjectId
+
+# add backend directory to PYTHONPATH
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND))
+
+import main  # noqa: E402
+
+RESULTS = [{"_id": ObjectId(f"65a7{index:020x}"),
+            "name": f"result {index}",
+            "simulation_id": "input",
+            "simsettings_id": "settings",
+            "status": "done" if index % 2 else "error",
+            "data": [{"Day": 0, "A sim": index}]}
+           for index in range(5)]
+
+
+class TestPagination:
+    """
+    This class contains unit tests for the paged and streamed list
+    endpoints.
+    """
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        db = mongomock_motor.AsyncMongoMockClient().Caturanga
+        db._AsyncMongoMockDatabase__database.simulations_results \
+            .insert_many([dict(result) for result in RESULTS])
+        monkeypatch.setattr(main.database_handler, "get_async_db",
+                            lambda: db)
+        return TestClient(main.app)
+
+    def test_pages(self, client):
+        """
+        Full pages return the ID to continue after, the pages together
+        return every result once, in the order of their IDs.
+        """
+        names = []
+        after_id = None
+        pages = 0
+        while True:
+            params = {"limit": 2}
+            if after_id is not None:
+                params["after_id"] = after_id
+            response = client.get("/simulation_results", params=params)
+            assert response.status_code == 200
+            names.extend(result["name"] for result in response.json())
+            pages += 1
+            after_id = response.headers.get("X-Next-After-Id")
+            if after_id is None:
+                break
+            assert after_id == response.json()[-1]["_id"]
+
+        assert pages == 3
+        assert names == [result["name"] for result in RESULTS]
+
+    def test_filters_and_fields(self, client):
+        """
+        Only the requested fields of the matching results are returned.
+        """
+        response = client.get("/simulation_results",
+                              params={"status": "done",
+                                      "fields": "name, status"})
+
+        assert response.json() == [
+            {"_id": str(result["_id"]), "name": result["name"],
+             "status": "done"}
+            for result in RESULTS if result["status"] == "done"]
+
+    def test_stream(self, client):
+        """
+        Streamed results are sent as one JSON document per line.
+        """
+        response = client.get("/simulation_results",
+                              params={"stream": "true",
+                                      "after_id": str(RESULTS[1]["_id"]),
+                                      "fields": "name"})
+
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert response.text.endswith("\n")
+        lines = response.text.splitlines()
+        assert [json.loads(line) for line in lines] == [
+            {"_id": str(result["_id"]), "name": result["name"]}
+            for result in RESULTS[2:]]
+
+    @pytest.mark.parametrize("stream", ["false", "true"])
+    @pytest.mark.parametrize("path", ["/simulation_results",
+                                      "/simulations"])
+    def test_invalid_after_id(self, client, path, stream):
+        """
+        An after_id that is no ObjectId is rejected.
+        """
+        response = client.get(path, params={"after_id": "not-an-id",
+                                            "stream": stream})
+
+        assert response.status_code == 400
+        assert "after_id" in response.json()["detail"]
+
+    def test_ids_converted_by_serializer(self, client):
+        """
+        The batches keep the IDs read from the database, which are only
+        converted to strings while serializing, get_all returns strings.
+        """
+        async def read():
+            batches = main.database_handler.iterate_batches(
+                "simulations_results", fields=["name"], batch_size=2)
+            ids = [document["_id"] async for batch in batches
+                   for document in batch]
+            listed = await main.database_handler.get_all(
+                "simulations_results", fields=["name"])
+            return ids, listed
+
+        ids, listed = asyncio.run(read())
+
+        assert ids == [result["_id"] for result in RESULTS]
+        assert [document["_id"] for document in listed] == \
+            [str(result["_id"]) for result in RESULTS]
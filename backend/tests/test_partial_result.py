@@ -0,0 +1,43 @@
+from pathlib import Path
+from types import SimpleNamespace
+import sys
+
+# add backend directory to PYTHONPATH
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND))
+
+from flee_adapter.day_hooks import PartialResult  # noqa: E402
+
+
+class TestPartialResult:
+    """
+    This class contains unit tests for the partial result collected while
+    a simulation runs.
+    """
+
+    def test_batches(self, tmp_path):
+        """
+        Every simulated day becomes one row, passed on in batches.
+        """
+        (tmp_path / "sim_period.csv").write_text(
+            "StartDate,2023-01-30\nlength,5\n")
+        camp = SimpleNamespace(name="Kobo", camp=True, numAgents=0)
+        town = SimpleNamespace(name="Town", camp=False, numAgents=7)
+        ecosystem = SimpleNamespace(time=0, locations=[camp, town])
+        batches = []
+        partial_result = PartialResult(batches.append, tmp_path, 2)
+
+        for day in range(5):
+            partial_result(ecosystem)
+            ecosystem.time += 1
+            camp.numAgents += 10
+        partial_result.close()
+
+        assert [len(batch) for batch in batches] == [2, 2, 1]
+        assert partial_result.days == 5
+        rows = [row for batch in batches for row in batch]
+        assert [row["Day"] for row in rows] == [0, 1, 2, 3, 4]
+        assert rows[2] == {"Day": 2,
+                           "Date": "2023-02-01",
+                           "Kobo sim": 30,
+                           "refugees in camps (simulation)": 30}
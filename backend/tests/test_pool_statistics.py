@@ -0,0 +1,129 @@
+from pathlib import Path
+from types import SimpleNamespace
+import asyncio
+import sys
+
+# add backend directory to PYTHONPATH
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND))
+
+from controller.handler import database_handler  # noqa: E402
+from controller.handler.pool_statistics import PoolStatistics  # noqa: E402
+from controller.handler.pool_statistics import pool_options  # noqa: E402
+
+EVENT = SimpleNamespace()
+
+
+class FakeClient:
+    """
+    Records the arguments of a MongoClient instead of connecting.
+    """
+
+    def __init__(self, uri, **kwargs):
+        self.uri = uri
+        self.kwargs = kwargs
+
+    def __getattr__(self, name):
+        return SimpleNamespace(name=name)
+
+    def close(self):
+        pass
+
+
+class TestPoolOptions:
+    """
+    This class contains unit tests for the configuration of the connection
+    pool from the environment.
+    """
+
+    def test_defaults(self, monkeypatch):
+        """
+        Unset variables keep the defaults, timeouts without default are
+        left to pymongo.
+        """
+        for name in ("MONGO_MAX_POOL_SIZE", "MONGO_MIN_POOL_SIZE",
+                     "MONGO_MAX_IDLE_TIME_MS", "MONGO_WAIT_QUEUE_TIMEOUT_MS",
+                     "MONGO_CONNECT_TIMEOUT_MS", "MONGO_SOCKET_TIMEOUT_MS",
+                     "MONGO_SERVER_SELECTION_TIMEOUT_MS"):
+            monkeypatch.delenv(name, raising=False)
+
+        assert pool_options() == {"maxPoolSize": 100,
+                                  "minPoolSize": 0,
+                                  "maxIdleTimeMS": 300000,
+                                  "connectTimeoutMS": 10000,
+                                  "serverSelectionTimeoutMS": 10000}
+
+    def test_environment(self, monkeypatch):
+        """
+        Set variables are parsed as integers.
+        """
+        monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "20")
+        monkeypatch.setenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "500")
+        monkeypatch.setenv("MONGO_SOCKET_TIMEOUT_MS", "30000")
+
+        options = pool_options()
+
+        assert options["maxPoolSize"] == 20
+        assert options["waitQueueTimeoutMS"] == 500
+        assert options["socketTimeoutMS"] == 30000
+
+
+class TestPoolStatistics:
+    """
+    This class contains unit tests for the connection pool listener.
+    """
+
+    def test_counters(self):
+        """
+        Checkouts, check-ins, connections and handshakes are counted.
+        """
+        statistics = PoolStatistics()
+
+        for _ in range(2):
+            statistics.connection_created(EVENT)
+            statistics.connection_ready(EVENT)
+            statistics.connection_check_out_started(EVENT)
+            statistics.connection_checked_out(EVENT)
+        statistics.connection_checked_in(EVENT)
+        statistics.connection_check_out_started(EVENT)
+        statistics.connection_check_out_failed(EVENT)
+        statistics.connection_closed(EVENT)
+        statistics.pool_cleared(EVENT)
+
+        stats = statistics.as_dict()
+        assert stats["connections_open"] == 1
+        assert stats["checked_out"] == 1
+        assert stats["max_checked_out"] == 2
+        assert stats["checkouts"] == 2
+        assert stats["checkout_failures"] == 1
+        assert stats["handshakes"] == 2
+        assert stats["pools_cleared"] == 1
+        assert stats["max_wait_ms"] >= 0
+
+    def test_clients_have_own_statistics(self, monkeypatch):
+        """
+        The blocking and the Motor client report their pools separately.
+        """
+        monkeypatch.setenv("MONGO_URI", "mongodb://localhost:27017")
+        monkeypatch.setattr(database_handler, "MongoClient", FakeClient)
+        monkeypatch.setattr(database_handler, "AsyncIOMotorClient",
+                            FakeClient)
+        handler = database_handler.DatabaseHandler("input", "settings")
+
+        handler.connect()
+
+        async def connect_async():
+            handler.get_async_db()
+
+        asyncio.run(connect_async())
+        [(async_client, _)] = handler._async_clients.values()
+        sync_listeners = handler.client.kwargs["event_listeners"]
+        async_listeners = async_client.kwargs["event_listeners"]
+
+        assert sync_listeners == [handler.pool_statistics["sync"]]
+        assert async_listeners == [handler.pool_statistics["async"]]
+        sync_listeners[0].connection_created(EVENT)
+        stats = handler.get_pool_statistics()
+        assert stats["sync"]["connections_open"] == 1
+        assert stats["async"]["connections_open"] == 0
+
@@ -0,0 +1,64 @@
+from pathlib import Path
+import asyncio
+import sys
+import threading
+
+# add backend directory to PYTHONPATH
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND))
+
+from controller.progress_broker import ProgressBroker  # noqa: E402
+
+
+class TestProgressBroker:
+    """
+    This class contains unit tests for the forwarding of simulation
+    progress events.
+    """
+
+    def test_events_from_other_thread(self):
+        """
+        Events published by a worker thread reach the subscriber, the
+        status event ends the run.
+        """
+        async def receive():
+            broker = ProgressBroker()
+            queue = broker.subscribe("result")
+
+            def publish():
+                for day in range(3):
+                    broker.publish("result", {"event": "progress",
+                                              "day": day})
+                broker.publish("result", {"event": "status",
+                                          "status": "done"})
+
+            threading.Thread(target=publish).start()
+            events = [await asyncio.wait_for(queue.get(), 5)
+                      for _ in range(4)]
+            broker.unsubscribe("result", queue)
+            return broker, events
+
+        broker, events = asyncio.run(receive())
+        assert [event.get("day") for event in events] == [0, 1, 2, None]
+        assert broker.latest("result") is None
+
+    def test_slow_subscriber(self):
+        """
+        Subscribers that do not keep up only lose the oldest events, late
+        subscribers get the latest progress.
+        """
+        async def receive():
+            broker = ProgressBroker(max_pending=2)
+            queue = broker.subscribe("result")
+            for day in range(5):
+                broker.publish("result", {"event": "progress", "day": day})
+            await asyncio.sleep(0)
+            events = [queue.get_nowait(), queue.get_nowait()]
+            # partial results are no progress
+            broker.publish("result", {"event": "rows", "rows": []})
+            return broker, events
+
+        broker, events = asyncio.run(receive())
+        assert [event["day"] for event in events] == [3, 4]
+        assert broker.latest("result")["day"] == 4
+        assert broker.latest("other") is None
@@ -0,0 +1,213 @@
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+import asyncio
+import os
+import sys
+import pytest
+from bson import ObjectId
+
+# add backend directory to PYTHONPATH
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND))
+
+from controller.handler import indexes  # noqa: E402
+from controller.handler import query_plans  # noqa: E402
+from controller.handler.database_handler import DatabaseHandler  # noqa: E402
+from controller.job_queue import JobQueue  # noqa: E402
+
+# scratch database of the query plan check, dropped afterwards
+DATABASE = "caturanga_query_plans"
+
+
+class TestIndexes:
+    """
+    This class contains unit tests for the creation of the indexes.
+    """
+
+    def test_ensure_indexes(self):
+        """
+        Missing indexes are created, existing ones are left alone.
+        """
+        mongomock = pytest.importorskip("mongomock")
+        db = mongomock.MongoClient().Caturanga
+        db.simulations_results.create_index("simulation_id",
+                                            name="simulation_id")
+        expected = [f"{collection_name}.{model.document['name']}"
+                    for collection_name, models in indexes.INDEXES.items()
+                    for model in models]
+
+        created = indexes.ensure_indexes(db)
+
+        assert created == [name for name in expected
+                           if name != "simulations_results.simulation_id"]
+        assert indexes.ensure_indexes(db) == []
+        assert "input_hash_status" in \
+            db.simulations_results.index_information()
+
+
+class TestQueryPlans:
+    """
+    This class contains unit tests for the check of the query plans and,
+    if MONGO_URI is set, checks that no query of the DatabaseHandler and
+    the JobQueue scans a whole collection. The check runs in a scratch
+    database of the server at MONGO_URI, e.g.
+    MONGO_URI=mongodb://localhost:27017 python -m pytest
+    tests/test_query_plans.py
+    """
+
+    def test_plan_stages(self):
+        """
+        The stages of winning plans are found in nested plans, rejected
+        plans are ignored.
+        """
+        plan = {"queryPlanner": {
+            "winningPlan": {"stage": "FETCH",
+                            "inputStage": {"stage": "IXSCAN"}},
+            "rejectedPlans": [{"stage": "COLLSCAN"}]}}
+        aggregation = {"stages": [{"$cursor": {"queryPlanner": {
+            "winningPlan": {"queryPlan": {"stage": "COLLSCAN"}}}}}]}
+
+        assert list(query_plans.plan_stages(plan)) == ["FETCH", "IXSCAN"]
+        assert list(query_plans.plan_stages(aggregation)) == ["COLLSCAN"]
+
+    @pytest.mark.parametrize("command, expected", [
+        ({"find": "a", "filter": {"status": "done"}}, {"status": "done"}),
+        ({"find": "a"}, {}),
+        ({"count": "a", "query": {"x": 1}}, {"x": 1}),
+        ({"delete": "a", "deletes": [{"q": {"x": 1}, "limit": 0}]},
+         {"x": 1}),
+        ({"update": "a", "updates": [{"q": {}, "u": {}}]}, {}),
+        ({"aggregate": "a", "pipeline": [{"$match": {"x": 1}}]}, {"x": 1}),
+        ({"aggregate": "a", "pipeline": [{"$project": {"x": 1}}]}, {}),
+    ])
+    def test_query_filter(self, command, expected):
+        """
+        The filters of all explainable commands are found.
+        """
+        assert query_plans.query_filter(command) == expected
+
+    def test_recorder(self):
+        """
+        Only explainable commands are recorded, without driver fields.
+        """
+        recorder = query_plans.QueryRecorder()
+
+        for name, command in [
+                ("find", {"find": "a", "filter": {}, "lsid": {}, "$db": "b"}),
+                ("insert", {"insert": "a", "documents": []}),
+                ("getMore", {"getMore": 1, "collection": "a"})]:
+            recorder.started(SimpleNamespace(command_name=name,
+                                             command=command))
+
+        assert recorder.commands == [{"find": "a", "filter": {}}]
+
+    def test_no_collection_scans(self):
+        """
+        Every query with a filter is answered from an index.
+        """
+        uri = os.getenv("MONGO_URI")
+        if not uri:
+            pytest.skip("MONGO_URI is not set")
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from pymongo import MongoClient
+
+        recorder = query_plans.QueryRecorder()
+        client = MongoClient(uri, event_listeners=[recorder])
+        client.drop_database(DATABASE)
+        db = client[DATABASE]
+        handler = DatabaseHandler("input", "settings")
+        handler.db = db
+        try:
+            indexes.ensure_indexes(db)
+            ids = self.seed(db)
+            self.run_sync_queries(handler, db, ids)
+
+            async def run():
+                async_client = AsyncIOMotorClient(
+                    uri, event_listeners=[recorder])
+                handler.get_async_db = lambda: async_client[DATABASE]
+                try:
+                    await self.run_async_queries(handler, ids)
+                finally:
+                    async_client.close()
+
+            asyncio.run(run())
+
+            # the migration of conflicts reads all inputs once at startup
+            def migration(command):
+                return command.get("find") == "simulations" and \
+                    "conflicts" in query_plans.query_filter(command)
+
+            scans = query_plans.collection_scans(db, recorder.commands,
+                                                 migration)
+            assert recorder.commands
+            assert scans == []
+        finally:
+            client.drop_database(DATABASE)
+            client.close()
+
+    @staticmethod
+    def seed(db):
+        parent_id = db.simulations.insert_one(
+            {"name": "parent", "locations": [], "routes": [],
+             "conflicts": [{"Day": 0, "A": 1}]}).inserted_id
+        child_id = db.simulations.insert_one(
+            {"name": "child", "parent_id": str(parent_id)}).inserted_id
+        db.simsettings.insert_many([{"name": "default"},
+                                    {"name": "sweep", "sweep_id": "sweep"}])
+        done_id, running_id = db.simulations_results.insert_many([
+            {"name": "done", "simulation_id": str(parent_id),
+             "status": "done", "input_hash": "hash",
+             "data": [{"Day": 0, "A": 1}]},
+            {"name": "running", "simulation_id": str(parent_id),
+             "status": "running", "input_hash": "hash"},
+        ]).inserted_ids
+        db.simulation_ensembles.insert_one(
+            {"sweep_id": "sweep", "result_ids": [str(done_id)],
+             "folded": [], "skipped": [], "version": 0})
+        return {"parent": str(parent_id), "child": str(child_id),
+                "done": str(done_id), "running": str(running_id)}
+
+    @staticmethod
+    def run_sync_queries(handler, db, ids):
+        handler.store_result_chunk(ids["running"], 0,
+                                   [{"Day": 0, "A": 1}])
+        handler.get_running_result_ids(datetime.utcnow())
+        handler.get_pending_ensembles(ids["done"])
+        handler.load_result_columns(ids["done"])
+        handler.migrate_conflict_intervals()
+
+        queue = JobQueue(db.simulation_jobs)
+        job_id = queue.enqueue(ids["running"], {})
+        queue.enqueue(ObjectId(), {})
+        queue.queue_position(job_id)
+        job = queue.lease("worker")
+        queue.heartbeat(job["_id"], "worker")
+        queue.request_cancel(job["result_id"])
+        queue.cancel_requests("worker")
+        queue.requeue_expired()
+        queue.count("queued", min_priority=0)
+        queue.active_result_ids()
+        queue.complete(job["_id"], "worker")
+        handler.fail_simulations([ids["running"]], "Stopped.")
+
+    @staticmethod
+    async def run_async_queries(handler, ids):
+        await handler.get("simulations", ids["child"])
+        await handler.get_tagged("simulations_results", ids["done"],
+                                 filters={"status": "done"})
+        for filters in ({"status": "done"},
+                        {"simulation_id": ids["parent"]},
+                        {"status": "done", "simulation_id": ids["parent"]}):
+            await handler.get_all("simulations_results", filters, ["name"],
+                                  limit=10, after_id=ids["parent"])
+        for collection_name in ("simulations", "simsettings",
+                                "simulations_results"):
+            await handler.get_summaries(collection_name)
+        await handler.get_all("simulation_ensembles", {"sweep_id": "sweep"})
+        await handler.find_result_by_hash("hash")
+        await handler.get_partial_result(ids["running"], 0)
+        await handler.get_result_series(ids["done"])
+        await handler.delete_simulation_and_associated_results(
+            ids["parent"])
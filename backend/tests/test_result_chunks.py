@@ -0,0 +1,94 @@
+from pathlib import Path
+import sys
+import pytest
+from bson import ObjectId
+
+# add backend directory to PYTHONPATH
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND))
+
+from controller.handler import database_handler  # noqa: E402
+from controller.handler import result_codec  # noqa: E402
+
+ROWS = [{"Day": day,
+         "Date": f"2023-01-{day + 1:02d}",
+         "Kobo sim": day * 3,
+         "refugees in camps (simulation)": day * 3}
+        for day in range(25)]
+
+
+class TestResultChunks:
+    """
+    This class contains unit tests for results that are built from the
+    chunks stored while the simulation ran.
+    """
+
+    @pytest.fixture
+    def handler(self):
+        mongomock = pytest.importorskip("mongomock")
+        client = mongomock.MongoClient()
+        handler = database_handler.DatabaseHandler("input", "settings")
+        handler.get_db = lambda: client.Caturanga
+        return handler
+
+    @staticmethod
+    def run(handler, rows, chunk_days=10):
+        result_id = handler.get_db().simulations_results.insert_one(
+            {"name": "run", "status": "running",
+             "input_hash": "hash"}).inserted_id
+        chunk_count = 0
+        for start in range(0, len(rows), chunk_days):
+            handler.store_result_chunk(str(result_id), chunk_count,
+                                       rows[start:start + chunk_days])
+            chunk_count += 1
+        return str(result_id), chunk_count
+
+    def test_result_from_chunks(self, handler):
+        """
+        The stored chunks become the result and are removed.
+        """
+        result_id, chunk_count = self.run(handler, ROWS)
+
+        error = handler.store_simulation({"days": len(ROWS)}, result_id,
+                                         chunk_count=chunk_count)
+
+        db = handler.get_db()
+        document = db.simulations_results.find_one(
+            {"_id": ObjectId(result_id)})
+        assert error is None
+        assert document["status"] == "done"
+        assert document["input_hash"] == "hash"
+        assert result_codec.decode_rows(document["result"]) == ROWS
+        assert db.simulation_result_chunks.count_documents({}) == 0
+
+    def test_chunks_of_previous_run_ignored(self, handler):
+        """
+        Chunks left behind by a longer previous run are not part of the
+        result.
+        """
+        result_id, _ = self.run(handler, ROWS)
+        handler.store_result_chunk(result_id, 0, ROWS[:10])
+
+        handler.store_simulation({"days": 10}, result_id, chunk_count=1)
+
+        document = handler.get_db().simulations_results.find_one(
+            {"_id": ObjectId(result_id)})
+        assert result_codec.decode_rows(document["result"]) == ROWS[:10]
+
+    def test_missing_chunk(self, handler):
+        """
+        A result whose chunks could not all be stored fails.
+        """
+        result_id, chunk_count = self.run(handler, ROWS)
+        handler.get_db().simulation_result_chunks.delete_one({"index": 1})
+
+        error = handler.store_simulation({"days": len(ROWS)}, result_id,
+                                         chunk_count=chunk_count)
+
+        document = handler.get_db().simulations_results.find_one(
+            {"_id": ObjectId(result_id)})
+        assert error is not None
+        assert document["status"] == "error"
+        assert "result" not in document
+        assert handler.get_db().simulation_result_chunks.count_documents(
+            {}) == 2
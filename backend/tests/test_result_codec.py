@@ -0,0 +1,129 @@
+from pathlib import Path
+import sys
+
+# add backend directory to PYTHONPATH
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND))
+
+from controller.handler import result_codec  # noqa: E402
+
+
+class TestResultCodec:
+    """
+    This class contains unit tests for the columnar encoding of simulation
+    results.
+    """
+
+    ROWS = [{"Day": day,
+             "Date": f"2023-01-{day + 1:02d}",
+             "Kobo sim": day * 3,
+             "Kobo error": day / 7,
+             "Total error": None if day == 2 else 0.25}
+            for day in range(10)]
+
+    def test_roundtrip(self):
+        """
+        Decoding an encoded result returns the original rows.
+        """
+        encoded = result_codec.encode_result(self.ROWS)
+        assert result_codec.is_encoded(encoded)
+        assert result_codec.decode_rows(encoded) == self.ROWS
+
+    def test_roundtrip_zlib(self):
+        """
+        Results compressed with the zlib fallback can be decoded.
+        """
+        encoded = result_codec.encode_result(self.ROWS, codec="zlib")
+        assert result_codec.decode_rows(encoded) == self.ROWS
+
+    def test_column_types(self):
+        """
+        Numeric columns are stored as typed arrays, all others as JSON.
+        """
+        encoded = result_codec.encode_result(self.ROWS)
+        keys = result_codec.column_keys(encoded)
+        dtypes = {name: encoded["columns"][keys[name]]["dtype"]
+                  for name in encoded["column_names"]}
+        assert dtypes == {"Day": "int64",
+                          "Date": "json",
+                          "Kobo sim": "int64",
+                          "Kobo error": "float64",
+                          "Total error": "json"}
+
+    def test_decode_selected_columns(self):
+        """
+        Single columns can be decoded without the others.
+        """
+        encoded = result_codec.encode_result(self.ROWS)
+        columns = result_codec.columns_to_lists(
+            result_codec.decode_columns(encoded, ["Kobo sim"]))
+        assert columns == {"Kobo sim": [row["Kobo sim"] for row in self.ROWS]}
+
+    def test_spilled_column(self):
+        """
+        Columns whose data is passed separately (GridFS) are decoded.
+        """
+        encoded = result_codec.encode_result(self.ROWS)
+        key = result_codec.column_keys(encoded)["Kobo error"]
+        data = encoded["columns"][key].pop("data")
+        rows = result_codec.decode_rows(encoded, {key: data})
+        assert rows == self.ROWS
+
+    def test_rows_with_different_keys(self):
+        """
+        Rows that do not share their keys are not encoded.
+        """
+        assert result_codec.encode_result([{"a": 1}, {"b": 2}]) is None
+
+    def test_concat_results(self):
+        """
+        Chunks of a result are concatenated into the encoded result.
+        """
+        for codec in ("zstd", "zlib"):
+            chunks = (result_codec.encode_result(self.ROWS[start:start + 4],
+                                                 codec=codec)
+                      for start in range(0, 10, 4))
+            encoded = result_codec.concat_results(chunks, codec=codec)
+            assert encoded["length"] == 10
+            assert result_codec.decode_rows(encoded) == self.ROWS
+
+    def test_concat_different_dtypes(self):
+        """
+        A column whose chunks have different dtypes keeps its values.
+        """
+        chunks = [result_codec.encode_result([{"a": 1}, {"a": 2}]),
+                  result_codec.encode_result([{"a": 2.5}])]
+        encoded = result_codec.concat_results(chunks)
+        assert encoded["columns"]["c0"]["dtype"] == "json"
+        rows = result_codec.decode_rows(encoded)
+        assert rows == [{"a": 1}, {"a": 2}, {"a": 2.5}]
+        assert [type(row["a"]) for row in rows] == [int, int, float]
+
+    def test_concat_different_columns(self):
+        """
+        Chunks that do not share their columns are not concatenated.
+        """
+        chunks = [result_codec.encode_result([{"a": 1}]),
+                  result_codec.encode_result([{"b": 1}])]
+        assert result_codec.concat_results(chunks) is None
+
+    def test_number_types_kept(self):
+        """
+        Decoded numbers keep their types: columns of ints stay int64,
+        columns mixing ints and floats are stored as JSON.
+        """
+        rows = [{"ints": 3, "floats": 0.5, "mixed": 3},
+                {"ints": 4, "floats": 1.0, "mixed": 2.5}]
+        encoded = result_codec.encode_result(rows)
+        keys = result_codec.column_keys(encoded)
+
+        decoded = result_codec.decode_rows(encoded)
+
+        assert {name: encoded["columns"][keys[name]]["dtype"]
+                for name in keys} == {"ints": "int64",
+                                      "floats": "float64",
+                                      "mixed": "json"}
+        assert decoded == rows
+        assert [[type(value) for value in row.values()]
+                for row in decoded] == [[int, float, int],
+                                        [int, float, float]]
@@ -0,0 +1,142 @@
+from fastapi.testclient import TestClient
+from pathlib import Path
+import asyncio
+import sys
+import pytest
+from bson import ObjectId
+
+# add backend directory to PYTHONPATH
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND))
+
+import main  # noqa: E402
+from controller.handler import result_codec  # noqa: E402
+
+ROWS = [{"Day": day,
+         "Date": f"2023-01-{day + 1:02d}",
+         "Kobo sim": day * 3,
+         "Nora sim": day * 0.5}
+        for day in range(12)]
+
+
+class TestResultSeries:
+    """
+    This class contains unit tests for reading selected columns and days
+    of a simulation result, stored as columns or in the old row format.
+    """
+
+    COLUMNAR = ObjectId("65a700000000000000000001")
+    ROW_FORMAT = ObjectId("65a700000000000000000002")
+
+    @pytest.fixture
+    def handler(self, monkeypatch):
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        db = mongomock_motor.AsyncMongoMockClient().Caturanga
+        db._AsyncMongoMockDatabase__database.simulations_results \
+            .insert_many([
+                {"_id": self.COLUMNAR, "status": "done",
+                 "result": result_codec.encode_result(ROWS)},
+                {"_id": self.ROW_FORMAT, "status": "done", "data": ROWS}])
+        handler = main.database_handler
+        monkeypatch.setattr(handler, "get_async_db", lambda: db)
+        return handler
+
+    def series(self, handler, result_id, *args):
+        series = asyncio.run(handler.get_result_series(str(result_id),
+                                                       *args))
+        series["columns"] = result_codec.columns_to_lists(series["columns"])
+        return series
+
+    @pytest.mark.parametrize("layout", ["COLUMNAR", "ROW_FORMAT"])
+    def test_selected_columns(self, handler, layout):
+        """
+        Only the requested columns are returned, all days by default.
+        """
+        series = self.series(handler, getattr(self, layout),
+                             ["Date", "Kobo sim"])
+
+        assert series["length"] == 12
+        assert series["days"] == list(range(12))
+        assert series["columns"] == {
+            "Date": [row["Date"] for row in ROWS],
+            "Kobo sim": [row["Kobo sim"] for row in ROWS]}
+
+    @pytest.mark.parametrize("layout", ["COLUMNAR", "ROW_FORMAT"])
+    def test_all_columns(self, handler, layout):
+        """
+        All columns are returned if none are requested.
+        """
+        series = self.series(handler, getattr(self, layout))
+
+        assert list(series["columns"]) == list(ROWS[0])
+        assert series["columns"]["Nora sim"] == \
+            [row["Nora sim"] for row in ROWS]
+
+    @pytest.mark.parametrize("layout", ["COLUMNAR", "ROW_FORMAT"])
+    def test_day_range(self, handler, layout):
+        """
+        The days from from_day to to_day (inclusive) are returned, every
+        stride-th day.
+        """
+        series = self.series(handler, getattr(self, layout),
+                             ["Kobo sim"], 2, 9, 3)
+
+        assert series["length"] == 12
+        assert series["days"] == [2, 5, 8]
+        assert series["columns"] == {"Kobo sim": [6, 15, 24]}
+
+    @pytest.mark.parametrize("layout", ["COLUMNAR", "ROW_FORMAT"])
+    def test_empty_day_range(self, handler, layout):
+        """
+        A range after the last day returns no days.
+        """
+        series = self.series(handler, getattr(self, layout),
+                             ["Kobo sim"], 20)
+
+        assert series["days"] == []
+        assert series["columns"] == {"Kobo sim": []}
+
+    @pytest.mark.parametrize("layout", ["COLUMNAR", "ROW_FORMAT"])
+    def test_unknown_column(self, handler, layout):
+        """
+        Requesting a column that does not exist fails.
+        """
+        with pytest.raises(KeyError):
+            asyncio.run(handler.get_result_series(
+                str(getattr(self, layout)), ["Kobo sim", "Atlantis sim"]))
+
+    def test_missing_result(self, handler):
+        """
+        None is returned for a result that does not exist.
+        """
+        assert asyncio.run(handler.get_result_series(
+            str(ObjectId()))) is None
+
+    def test_endpoint(self, handler):
+        """
+        The endpoint returns the selected columns and days as JSON.
+        """
+        response = TestClient(main.app).get(
+            f"/simulation_results/{self.COLUMNAR}/series",
+            params={"columns": "Date,Kobo sim", "from_day": 10})
+
+        assert response.status_code == 200
+        assert response.json() == {
+            "length": 12,
+            "days": [10, 11],
+            "columns": {"Date": ["2023-01-11", "2023-01-12"],
+                        "Kobo sim": [30, 33]}}
+
+    def test_endpoint_errors(self, handler):
+        """
+        Unknown columns and results are not found.
+        """
+        client = TestClient(main.app)
+
+        unknown = client.get(f"/simulation_results/{self.COLUMNAR}/series",
+                             params={"columns": "Atlantis sim"})
+        missing = client.get(f"/simulation_results/{ObjectId()}/series")
+
+        assert unknown.status_code == 404
+        assert unknown.json()["detail"] == "Unknown columns: Atlantis sim"
+        assert missing.status_code == 404
@@ -0,0 +1,263 @@
+from pathlib import Path
+import json
+import logging
+import sys
+import threading
+import time
+import pytest
+
+# add backend directory to PYTHONPATH
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND))
+
+from controller.handler import database_handler  # noqa: E402
+from controller.handler import secrets_provider  # noqa: E402
+from controller.handler.secrets_provider import CachedSecretProvider  # noqa: E402,E501
+
+SECRET = {"MONGO_USER": "user", "MONGO_PASSWORD": "password"}
+
+
+class FakeClock:
+    """
+    A clock that only moves when told to.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingProvider(secrets_provider.SecretProvider):
+    """
+    Returns the current value of a secret and counts the reads.
+    """
+
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+        self.threads = []
+
+    def get_secret(self, secret_name: str):
+        self.calls += 1
+        self.threads.append(threading.current_thread())
+        if isinstance(self.value, Exception):
+            raise self.value
+        return dict(self.value)
+
+
+class FakeClient:
+    """
+    Records the URI of a MongoClient instead of connecting.
+    """
+
+    def __init__(self, uri, **kwargs):
+        self.uri = uri
+        self.closed = False
+        self.Caturanga = object()
+
+    def close(self):
+        self.closed = True
+
+
+class TestSecretProviders:
+    """
+    This class contains unit tests for the secret providers.
+    """
+
+    def test_abstract(self):
+        """
+        The base class can not be used as provider.
+        """
+        with pytest.raises(TypeError):
+            secrets_provider.SecretProvider()
+
+    def test_environment(self, monkeypatch):
+        """
+        Secrets are read from environment variables.
+        """
+        monkeypatch.setenv("MONGO_USER", "user")
+        monkeypatch.delenv("MONGO_PASSWORD", raising=False)
+        provider = secrets_provider.EnvironmentSecretProvider()
+
+        with pytest.raises(KeyError):
+            provider.get_secret("db")
+        monkeypatch.setenv("MONGO_PASSWORD", "password")
+        assert provider.get_secret("db") == SECRET
+
+    def test_file(self, tmp_path):
+        """
+        Secrets are read from <name>.json files.
+        """
+        (tmp_path / "db.json").write_text(json.dumps(SECRET))
+        provider = secrets_provider.FileSecretProvider(tmp_path)
+
+        assert provider.get_secret("db") == SECRET
+
+    def test_create(self, monkeypatch):
+        """
+        The provider is selected by SECRET_PROVIDER.
+        """
+        monkeypatch.setenv("SECRET_PROVIDER", "env")
+        monkeypatch.setenv("SECRET_TTL_SECONDS", "60")
+
+        provider = secrets_provider.create_secret_provider()
+
+        assert isinstance(provider.provider,
+                          secrets_provider.EnvironmentSecretProvider)
+        assert provider.ttl == 60
+        monkeypatch.setenv("SECRET_PROVIDER", "vault")
+        with pytest.raises(ValueError):
+            secrets_provider.create_secret_provider()
+
+
+class TestCachedSecretProvider:
+    """
+    This class contains unit tests for the TTL cache and background refresh
+    of secrets.
+    """
+
+    def test_ttl(self):
+        """
+        Secrets are read once per lifetime.
+        """
+        clock = FakeClock()
+        provider = CountingProvider(SECRET)
+        cached = CachedSecretProvider(provider, ttl=100, clock=clock)
+
+        cached.get_secret("db")
+        clock.now = 50
+        cached.get_secret("db")
+        clock.now = 100
+        cached.get_secret("db")
+
+        assert provider.calls == 2
+
+    def test_background_refresh(self):
+        """
+        A secret about to expire is refreshed in the background, listeners
+        are told about a changed value.
+        """
+        clock = FakeClock()
+        provider = CountingProvider(SECRET)
+        cached = CachedSecretProvider(provider, ttl=100, clock=clock)
+        changed = []
+        cached.add_listener(changed.append)
+        cached.get_secret("db")
+
+        provider.value = dict(SECRET, MONGO_PASSWORD="rotated")
+        clock.now = 95
+        assert cached.get_secret("db") == SECRET
+        cached._refresh_in_background("db").join()
+
+        assert cached.get_secret("db")["MONGO_PASSWORD"] == "rotated"
+        assert changed == ["db"]
+
+    def test_unchanged_refresh(self):
+        """
+        Listeners are not called if the refreshed value is the same.
+        """
+        clock = FakeClock()
+        cached = CachedSecretProvider(CountingProvider(SECRET), ttl=100,
+                                      clock=clock)
+        changed = []
+        cached.add_listener(changed.append)
+        cached.get_secret("db")
+
+        clock.now = 100
+        cached.get_secret("db")
+
+        assert changed == []
+
+    def test_failed_refresh(self, caplog):
+        """
+        A failed refresh keeps the cached value and is logged.
+        """
+        clock = FakeClock()
+        provider = CountingProvider(SECRET)
+        cached = CachedSecretProvider(provider, ttl=100, clock=clock)
+        cached.get_secret("db")
+
+        provider.value = ConnectionError("no network")
+        clock.now = 95
+        with caplog.at_level(logging.WARNING):
+            cached._refresh_in_background("db").join()
+
+        assert cached.get_secret("db") == SECRET
+        assert "Refreshing secret db failed" in caplog.text
+
+
+class TestCredentialRotation:
+    """
+    This class contains unit tests for the reconnection of the database
+    handler with rotated credentials.
+    """
+
+    def test_reconnect(self, monkeypatch):
+        """
+        Rotated credentials rebuild the client, the old one is closed
+        after a delay.
+        """
+        monkeypatch.delenv("MONGO_URI", raising=False)
+        monkeypatch.setattr(database_handler, "load_dotenv", lambda: None)
+        monkeypatch.setattr(database_handler, "MongoClient", FakeClient)
+        monkeypatch.setattr(database_handler, "CLIENT_CLOSE_DELAY_SECONDS",
+                            0)
+        clock = FakeClock()
+        provider = CountingProvider(SECRET)
+        cached = CachedSecretProvider(provider, ttl=100, clock=clock)
+        handler = database_handler.DatabaseHandler("input", "settings",
+                                                   cached)
+
+        old_client, _ = handler.connect()
+        provider.value = dict(SECRET, MONGO_PASSWORD="rotated")
+        clock.now = 100
+        # the rotated secret is read in the background
+        deadline = time.monotonic() + 5
+        new_client, _ = handler.connect()
+        while new_client is old_client and time.monotonic() < deadline:
+            time.sleep(0.01)
+            new_client, _ = handler.connect()
+
+        assert new_client is not old_client
+        assert "user:rotated@" in new_client.uri
+        deadline = time.monotonic() + 5
+        while not old_client.closed and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert old_client.closed
+        assert not new_client.closed
+
+    def test_expired_secret(self, monkeypatch, caplog):
+        """
+        Database accesses never wait for the secret provider: an expired
+        secret that can not be refreshed is kept, the refresh is retried
+        in the background after retry_seconds.
+        """
+        monkeypatch.delenv("MONGO_URI", raising=False)
+        monkeypatch.setattr(database_handler, "load_dotenv", lambda: None)
+        monkeypatch.setattr(database_handler, "MongoClient", FakeClient)
+        clock = FakeClock()
+        provider = CountingProvider(SECRET)
+        cached = CachedSecretProvider(provider, ttl=100, retry_seconds=10,
+                                      clock=clock)
+        handler = database_handler.DatabaseHandler("input", "settings",
+                                                   cached)
+        client, _ = handler.connect()
+
+        provider.value = ConnectionError("no network")
+        clock.now = 200
+        with caplog.at_level(logging.WARNING):
+            for _ in range(3):
+                assert handler.get_db() is client.Caturanga
+                deadline = time.monotonic() + 5
+                while cached._refreshing and time.monotonic() < deadline:
+                    time.sleep(0.01)
+            clock.now = 210
+            handler.get_db()
+            while cached._refreshing and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        assert provider.calls == 3
+        assert threading.current_thread() not in provider.threads[1:]
+        assert caplog.text.count("Refreshing secret") == 2
@@ -0,0 +1,115 @@
+from datetime import datetime
+from pathlib import Path
+import json
+import sys
+import numpy as np
+import pytest
+from bson import ObjectId
+
+# add backend directory to PYTHONPATH
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND))
+
+from controller import serialization  # noqa: E402
+
+DOCUMENT = {"_id": ObjectId("65a6d3eb9ae2636fa2b3e3c6"),
+            "name": "Nigeria ü",
+            "created_at": datetime(2024, 1, 2, 3, 4, 5, 123000),
+            "data": [{"Day": 0, "Date": "2023-01-01", "A": 1.5, "B": None}],
+            "columns": {"A": np.array([1, 2], dtype=np.int64),
+                        "B": np.array([0.5, 1e-05])},
+            "count": np.int64(3)}
+
+EXPECTED = {"_id": "65a6d3eb9ae2636fa2b3e3c6",
+            "name": "Nigeria ü",
+            "created_at": "2024-01-02T03:04:05.123000",
+            "data": [{"Day": 0, "Date": "2023-01-01", "A": 1.5, "B": None}],
+            "columns": {"A": [1, 2], "B": [0.5, 1e-05]},
+            "count": 3}
+
+
+class TestSerialization:
+    """
+    This class contains unit tests for the serialization of API responses.
+    """
+
+    @pytest.mark.parametrize("use_orjson", [True, False])
+    def test_dumps_json(self, use_orjson, monkeypatch):
+        """
+        IDs, dates and numpy values are serialized like jsonable_encoder
+        does, with and without orjson.
+        """
+        if use_orjson:
+            pytest.importorskip("orjson")
+        else:
+            monkeypatch.setattr(serialization, "orjson", None)
+
+        body = serialization.dumps_json(DOCUMENT)
+
+        assert json.loads(body) == EXPECTED
+        assert body.startswith(b'{"_id":"65a6d3eb9ae2636fa2b3e3c6","name"')
+
+    @pytest.mark.parametrize("accept, expected", [
+        (None, "json"),
+        ("*/*", "json"),
+        ("application/msgpack", "msgpack"),
+        ("application/x-msgpack", "msgpack"),
+        ("application/json;q=0.5, application/msgpack", "msgpack"),
+        ("application/json, application/msgpack;q=0.5", "json"),
+        ("application/vnd.apache.arrow.stream", "json"),
+        ("text/html", "json"),
+    ])
+    def test_negotiate_format(self, accept, expected, monkeypatch):
+        """
+        Binary formats are sent to clients preferring them, Arrow only for
+        tables.
+        """
+        monkeypatch.setattr(serialization, "msgpack", object())
+        monkeypatch.setattr(serialization, "pyarrow", object())
+
+        assert serialization.negotiate_format(accept) == expected
+
+    def test_negotiate_uninstalled(self, monkeypatch):
+        """
+        Formats whose module is not installed are not offered.
+        """
+        monkeypatch.setattr(serialization, "msgpack", None)
+        monkeypatch.setattr(serialization, "pyarrow", object())
+        accept = "application/msgpack, application/vnd.apache.arrow.stream"
+
+        assert serialization.negotiate_format(accept) == "json"
+        assert serialization.negotiate_format(accept, tabular=True) == \
+            "arrow"
+
+    def test_msgpack(self):
+        """
+        MessagePack bodies decode to the same values as JSON bodies.
+        """
+        msgpack = pytest.importorskip("msgpack")
+        if serialization.msgpack is None:
+            pytest.skip("serialization was imported without msgpack")
+
+        body = serialization.dumps(DOCUMENT, "msgpack")
+
+        assert msgpack.unpackb(body) == EXPECTED
+
+    def test_table(self):
+        """
+        Tables are sent as columns next to the metadata, or as Arrow.
+        """
+        columns = {"Day": np.arange(3), "Date": ["a", "b", "c"]}
+        metadata = {"length": 10, "days": [0, 1, 2]}
+
+        body = serialization.dumps_table(columns, "json", metadata)
+        assert json.loads(body) == {"length": 10, "days": [0, 1, 2],
+                                    "columns": {"Day": [0, 1, 2],
+                                                "Date": ["a", "b", "c"]}}
+
+        pyarrow = pytest.importorskip("pyarrow")
+        if serialization.pyarrow is None:
+            pytest.skip("serialization was imported without pyarrow")
+        body = serialization.dumps_table(columns, "arrow", metadata)
+        table = pyarrow.ipc.open_stream(body).read_all()
+        assert table.to_pydict() == {"Day": [0, 1, 2],
+                                     "Date": ["a", "b", "c"]}
+        assert json.loads(table.schema.metadata[b"days"]) == [0, 1, 2]
@@ -0,0 +1,67 @@
+from pathlib import Path
+import sys
+import pytest
+
+# add backend directory to PYTHONPATH
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND))
+
+from controller import sweep  # noqa: E402
+
+
+class TestSweep:
+    """
+    This class contains unit tests for the expansion of parameter sweeps.
+    """
+
+    SIMSETTING = {"_id": "1",
+                  "name": "default",
+                  "move_rules": {"conflict_weight": 0.25,
+                                 "camp_weight": 1,
+                                 "max_move_speed": 360},
+                  "optimisations": {"hasten": 1}}
+
+    def test_expand_values(self):
+        """
+        Ranges include their stop value despite floating point errors.
+        """
+        assert sweep.expand_values([3, 1]) == [3, 1]
+        assert sweep.expand_values({"start": 100, "stop": 400,
+                                    "step": 150}) == [100, 250, 400]
+        assert sweep.expand_values({"start": 0.1, "stop": 0.3,
+                                    "step": 0.1}) == [0.1, 0.2, 0.3]
+        with pytest.raises(ValueError):
+            sweep.expand_values({"start": 1, "stop": 0, "step": 1})
+        with pytest.raises(ValueError):
+            sweep.expand_values({"start": 0, "stop": 1, "step": 0})
+
+    def test_expand_sweep(self):
+        """
+        Every combination is run once per replicate with its own seed.
+        """
+        runs = sweep.expand_sweep({"conflict_weight": [0.5, 1.0],
+                                   "camp_weight": [1, 2, 3]},
+                                  replicates=2,
+                                  seed=10)
+        assert len(runs) == 12
+        assert runs[0] == {"values": {"conflict_weight": 0.5,
+                                      "camp_weight": 1},
+                           "seed": 10}
+        assert runs[1]["seed"] == 11
+        assert len({(tuple(run["values"].items()), run["seed"])
+                    for run in runs}) == 12
+
+    def test_apply_values(self):
+        """
+        Bare names refer to the move rules, others use dotted paths.
+        """
+        variant = sweep.apply_values(self.SIMSETTING,
+                                     {"camp_weight": 4,
+                                      "optimisations.hasten": 2})
+        assert variant["move_rules"]["camp_weight"] == 4
+        assert variant["optimisations"]["hasten"] == 2
+        assert self.SIMSETTING["move_rules"]["camp_weight"] == 1
+        with pytest.raises(ValueError):
+            sweep.apply_values(self.SIMSETTING, {"camp_wieght": 4})
+        with pytest.raises(ValueError):
+            sweep.apply_values(self.SIMSETTING, {"name.first": 4})
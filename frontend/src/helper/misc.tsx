@@ -1,4 +1,4 @@
-import { SimLocation, LocationType } from "../types";
+import { SimLocation, LocationType, Conflicts } from "../types";
 import { LatLngExpression } from "leaflet";
 import { Colors } from "../helper/constants/DesignConstants";
 
@@ -58,6 +58,28 @@ function prettifyLocationTypeName(locationName: string): string {
   }
 }
 
+function getConflictValue(
+  conflicts: Conflicts,
+  day: number,
+  zone: string
+): number | null | undefined {
+  // value of the conflict matrix, also for conflicts stored as intervals
+  if (Array.isArray(conflicts)) {
+    return conflicts[day]?.[zone];
+  }
+
+  const intervals = conflicts.zones[zone];
+  if (!intervals) {
+    return undefined;
+  }
+  for (const interval of intervals) {
+    if (interval[0] <= day && day < interval[1]) {
+      return interval.length > 2 ? interval[2] : 1;
+    }
+  }
+  return 0;
+}
+
 function getLocationTypeColor(locationType: LocationType) {
   // get the color of the node based on the location type
   switch (locationType) {
@@ -79,5 +101,6 @@ export {
   formatDate,
   prettifyLocationTypeName,
   getLocationTypeColor,
+  getConflictValue,
   sliceName,
 };
@@ -26,5 +26,10 @@ export function useAPI() {
     return new Promise((resolve) => setTimeout(resolve, time));
   }
 
-  return { sendRequest, delay };
+  // open a stream of server-sent events
+  function openEventStream(route: string) {
+    return new EventSource(new URL(API_URL + route).toString());
+  }
+
+  return { sendRequest, delay, openEventStream };
 }
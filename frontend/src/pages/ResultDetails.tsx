@@ -10,6 +10,8 @@ import {
   LocationType,
   validationDataByDate,
   validationData,
+  SimulationProgress,
+  SimulationStatus,
 } from "../types";
 import { LatLngExpression } from "leaflet";
 import Slider from "@mui/material/Slider";
@@ -21,15 +23,19 @@ import {
   faMapLocationDot,
 } from "@fortawesome/free-solid-svg-icons";
 import { Colors } from "../helper/constants/DesignConstants";
+import { getConflictValue } from "../helper/misc";
 import DataSourceModal from "../components/DataSourceModal";
 import MapLegendModal from "../components/MapLegendModal";
 
 // Page for showing details of a result
 function ResultDetails() {
-  const { sendRequest } = useAPI();
+  const { sendRequest, openEventStream } = useAPI();
   const { id } = useParams<{ id: string }>();
   const [input, setInput] = useState<Input | undefined>(undefined);
   const [result, setResult] = useState<Result | undefined>(undefined);
+  const [progress, setProgress] = useState<SimulationProgress | undefined>(
+    undefined
+  );
   const [mapCenter, _] = useState<LatLngExpression>([12.6, 37.4667]); // [lat, lng]
   const [playSimulationIndex, setPlaySimulationIndex] = useState<number>(0);
   const [playingSimulation, setPlayingSimulation] = useState(false);
@@ -61,6 +67,28 @@ function ResultDetails() {
     );
   }, []);
 
+  // follow the progress of a running simulation, pushed by the server
+  useEffect(() => {
+    if (result?.status !== SimulationStatus.running) {
+      return;
+    }
+    const events = openEventStream(`/simulation_results/${id}/events`);
+    events.addEventListener("progress", (event) => {
+      setProgress(JSON.parse((event as MessageEvent).data));
+    });
+    // fetch the result once the simulation is finished
+    events.addEventListener("status", () => {
+      events.close();
+      setProgress(undefined);
+      sendRequest(`/simulation_results/${id}`, "GET").then(
+        (resultData: Result) => {
+          setResult(resultData);
+        }
+      );
+    });
+    return () => events.close();
+  }, [result?.status]);
+
   function formatValidationData(input: Input) {
     // organize data by date
     const dataByDate = organizeDataByDate(input);
@@ -150,7 +178,12 @@ function ResultDetails() {
     function getLocationType(location: SimLocation): LocationType {
       if (location.location_type === LocationType.conflict_zone) {
         // check if conflict has started in input
-        return input?.conflicts[playSimulationIndex][location.name] === 1
+        return input &&
+          getConflictValue(
+            input.conflicts,
+            playSimulationIndex,
+            location.name
+          ) === 1
           ? LocationType.conflict_zone
           : LocationType.town;
       } else {
@@ -207,6 +240,13 @@ function ResultDetails() {
       </h1>
 
       <div className="result-map-container">
+        {progress && (
+          <p className="day-label">
+            Simulating day {progress.day + 1}
+            {progress.total_days ? ` of ${progress.total_days}` : ""} (
+            {progress.agents} agents)
+          </p>
+        )}
         {result?.data && input && (
           <p className="day-label">
             Day {playSimulationIndex}:{" "}
@@ -20,6 +20,9 @@ enum SimulationStatus {
   running = "running",
   done = "done",
   error = "error",
+  cancelled = "cancelled",
+  timeout = "timeout",
+  killed = "killed",
 }
 
 interface SimLocation {
@@ -42,6 +45,23 @@ interface Route {
   forced_redirection?: number;
 }
 
+// conflicts are stored as intervals per zone: [start, stop] is a conflict
+// from day start (inclusive) to day stop (exclusive), [start, stop, value]
+// has another value than 1; older inputs have one object per day
+interface ConflictIntervals {
+  day_column: string;
+  days: number;
+  zones: {
+    [key: string]: Array<[number, number] | [number, number, number | null]>;
+  };
+}
+
+type Conflicts =
+  | ConflictIntervals
+  | Array<{
+      [key: string]: number;
+    }>;
+
 interface validationData {
   camp_name: string;
   refugee_numbers: string;
@@ -61,9 +81,7 @@ interface Input {
     date: string;
     length: number;
   };
-  conflicts: Array<{
-    [key: string]: number;
-  }>;
+  conflicts: Conflicts;
   data_sources: {
     acled: {
       url: string;
@@ -99,11 +117,20 @@ interface Result {
   _id: string;
   name: string;
   simulation_id: string;
+  status: SimulationStatus;
   data: Array<{
     [key: string]: number;
   }>;
 }
 
+// progress event of a running simulation (pushed by the server)
+interface SimulationProgress {
+  day: number;
+  total_days: number | null;
+  agents: number;
+  elapsed: number;
+}
+
 interface Result {
   _id: string;
   name: string;
@@ -153,6 +180,8 @@ export type {
   SimSettings,
   ResultPreview,
   Result,
+  SimulationProgress,
+  Conflicts,
   validationDataByDate,
   validationData,
 };